@@ -0,0 +1,29 @@
+"""
+Gunicorn configuration, used with `gunicorn wsgi -c gunicorn.conf.py`.
+
+Gevent workers serve many requests concurrently, so slow uploads and copies of
+files on S3 don't block whole workers. Set `GUNICORN_WORKER_CLASS=sync` to
+run the previous synchronous workers.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:{}'.format(os.getenv('PORT', 8000)))
+workers = int(os.getenv('GUNICORN_WORKERS', os.getenv('WEB_CONCURRENCY', 5)))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+# Concurrent requests of one gevent worker, queries of all of them share
+# DATABASE_POOL_SIZE connections of the worker.
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+
+if worker_class == 'gevent':
+    # Read by the settings imported by workers, other processes such as
+    # management commands and tests don't pool connections.
+    os.environ.setdefault('DATABASE_POOL_SIZE', '10')
+
+
+def post_worker_init(worker):
+    # Called after the gevent worker patched the standard library.
+    if worker_class == 'gevent':
+        from kidviz.green import patch_psycopg
+
+        patch_psycopg()
@@ -1,10 +1,12 @@
 from django import forms
 from django.contrib import admin, messages
+from django.urls import reverse
+from django.utils.html import format_html
 from import_export import resources, fields
 from import_export.admin import ImportExportActionModelAdmin
 
 from kidviz.resources import ACCEPTED_FILE_FORMATS, ClassRoster
-from .models import Course, LearningConstruct, LearningConstructLevel, LearningConstructSublevel, \
+from .models import Course, Job, LearningConstruct, LearningConstructLevel, LearningConstructSublevel, \
     LearningConstructSublevelExample, Observation, Student, StudentGroup, StudentGrouping, ContextTag, \
     Setup
 
@@ -15,12 +17,12 @@ admin.site.index_title = 'Settings'
 
 
 def advance_grade(modeladmin, request, queryset):
-    processed = 0
-    for row in queryset:
-        row.advance_grade_level()
-        processed += 1
-    msg = '{} students updated'.format(processed)
-    modeladmin.message_user(request, message=msg.strip(), level=messages.INFO)
+    # Selecting all students of a district takes longer than a request may.
+    student_ids = list(queryset.values_list('id', flat=True))
+    job = Job.submit(Job.ADVANCE_GRADE, owner=request.user, student_ids=student_ids)
+    msg = format_html('Advancing grade of {} students in the background, see <a href="{}">{}</a>.',
+                      len(student_ids), reverse('admin:kidviz_job_change', args=[job.pk]), job)
+    modeladmin.message_user(request, message=msg, level=messages.INFO)
 
 
 advance_grade.short_description = 'Advance Grade'
@@ -140,13 +142,37 @@ class ObservationAdminForm(forms.ModelForm):
         self.fields['constructs'].queryset = construct_sublevel_qs
 
 
+class OfferedConstructListFilter(admin.SimpleListFilter):
+    title = 'construct offered by setup'
+    parameter_name = 'offered_construct'
+
+    def lookups(self, request, model_admin):
+        return [(construct.id, construct.abbreviation) for construct in LearningConstruct.objects.order_by('abbreviation')]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return Observation.filter_offered_constructs(queryset, [self.value()])
+
+
+class OfferedTagListFilter(admin.SimpleListFilter):
+    title = 'tag offered by setup'
+    parameter_name = 'offered_tag'
+
+    def lookups(self, request, model_admin):
+        return [(tag.id, tag.text) for tag in ContextTag.objects.order_by('text')]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return Observation.filter_offered_tags(queryset, [self.value()])
+
+
 @admin.register(Observation)
 class ObservationAdmin(admin.ModelAdmin):
     form = ObservationAdminForm
     preserve_filters = True
     filter_horizontal = ('students', 'constructs', 'tags',)
     list_display = ('id', 'name', 'owner', 'course', 'created', 'is_draft')
-    list_filter = ('course', 'owner',)
+    list_filter = ('course', 'owner', OfferedConstructListFilter, OfferedTagListFilter)
     raw_id_fields = ('owner', 'course', 'parent', 'grouping',)
     search_fields = ('name', 'notes')
     ordering = ('name',)
@@ -238,4 +264,18 @@ class ContextTagAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'owner', 'status', 'progress', 'total', 'created', 'finished')
+    list_filter = ('kind', 'status')
+    # Arguments of large jobs list thousands of students, they aren't shown.
+    fields = ('kind', 'status', 'owner', 'progress', 'total', 'message', 'created', 'started', 'finished', 'worker',
+              'lease_expires')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        # Jobs are submitted by the actions which run them.
+        return False
+
+
 admin.site.register(Setup)
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class KidvizConfig(AppConfig):
+    name = 'kidviz'
+
+    def ready(self):
+        # Connect signal handlers invalidating cached reports.
+        import kidviz.signals  # noqa: F401
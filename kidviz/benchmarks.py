@@ -0,0 +1,203 @@
+import io
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from kidviz.jobs import import_class_roster
+from kidviz.models import Course, Job, Observation, Student
+from kidviz.resources import ClassRoster
+from kidviz.synthetic import EMAIL_DOMAIN
+from kidviz.views import ObservationAdminView
+from users.models import User
+
+
+class QueryCounter(object):
+    """
+    Database execute wrapper counting executed queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class BenchmarkRunner(object):
+    """
+    Measures wall time, number of SQL queries and peak Python memory of report
+    views and roster import/export.
+
+    Requests go through the test client so URL routing, middleware and template
+    rendering are included. Report cache is cleared before every request and
+    requests changing data run in a transaction which is rolled back.
+    """
+
+    def __init__(self, repeat=3, course_count=5):
+        self.repeat = repeat
+        self.course_count = course_count
+        self.client = Client()
+        self.user = self.get_user()
+        self.client.force_login(self.user)
+
+    def get_user(self):
+        user, created = User.objects.get_or_create(
+            email='benchmark@{}'.format(EMAIL_DOMAIN),
+            defaults={'is_superuser': True, 'is_staff': True, 'is_active': True, 'is_pending': False},
+        )
+        return user
+
+    def get_benchmarks(self):
+        """
+        Returns list of `(name, callable)` tuples, callable returns the response.
+        """
+        # Courses with the most observations are the slowest ones to report on.
+        courses = list(
+            Course.objects.annotate(observation_count=Count('observation'))
+            .filter(observation_count__gt=0)
+            .order_by('-observation_count', 'id')[:self.course_count]
+        )
+
+        if not courses:
+            raise ValueError('There are no courses with observations, generate data with generate_synthetic_data.')
+
+        course = max(courses, key=lambda course: course.students.count())
+        course_ids = [str(course.id) for course in courses]
+        students = [str(student_id) for student_id in course.students.values_list('id', flat=True)]
+        benchmarks = []
+
+        for chart in ObservationAdminView.CHART_KEYS:
+            benchmarks.append(('observations_{}'.format(chart), self.get(
+                reverse('observations_all'), {chart: '', 'courses': course_ids})))
+
+        benchmarks.extend([
+            ('students_timeline', self.get(
+                reverse('students-timeline'), {'course': str(course.id), 'students': students})),
+            ('teacher_observations', self.get(
+                reverse('observations_teachers_specific', kwargs={'course_id': course.id}), {})),
+            ('roster_export', self.get(
+                reverse('export_class_roster'), {'user_id': [str(course.owner_id) for course in courses]})),
+            ('roster_export_csv', self.get(
+                reverse('export_class_roster'),
+                {'user_id': [str(course.owner_id) for course in courses], 'fmt': 'csv'})),
+            ('roster_import', self.roster_import(courses)),
+        ])
+
+        return benchmarks
+
+    def get(self, path, data):
+        def run():
+            response = self.client.get(path, data)
+
+            if response.streaming:
+                # Streamed content is produced while it's read, which is part of the request.
+                for chunk in response.streaming_content:
+                    pass
+
+            return response
+
+        return run
+
+    def roster_import(self, courses):
+        """
+        Uploads roster of `courses` with a few new students and processes it.
+        The import is queued as a job, which is run right away like a worker would.
+        """
+        dataset = ClassRoster(user=self.user).empty_dataset()
+
+        for course in courses:
+            for student in course.students.all():
+                dataset.append([course.id, course.name, course.grade_level, student.student_id or '',
+                                student.last_name, student.first_name, student.nickname])
+
+            for index in range(5):
+                dataset.append([course.id, course.name, course.grade_level, 'benchmark-{}-{}'.format(course.id, index),
+                                'Benchmark', 'Student {}'.format(index), ''])
+
+        content = dataset.export('csv').encode('utf-8')
+
+        def run():
+            upload = io.BytesIO(content)
+            upload.name = 'roster.csv'
+            self.client.post(reverse('import_class_roster'), {'uploadedFile': upload})
+            response = self.client.get(reverse('process_import_class_roster'))
+            import_class_roster(Job.objects.filter(owner=self.user, kind=Job.ROSTER_IMPORT).latest('id'))
+            return response
+
+        return run
+
+    def measure(self, benchmark):
+        """
+        Runs `benchmark` `repeat` times for wall time and query count and once
+        more with `tracemalloc` for peak memory, which slows the code down.
+        """
+        durations = []
+        queries = []
+
+        for _ in range(self.repeat):
+            response, duration, query_count = self.run_once(benchmark)
+            durations.append(duration)
+            queries.append(query_count)
+
+        tracemalloc.start()
+        self.run_once(benchmark)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'status_code': response.status_code,
+            'wall_time': {
+                'min': min(durations),
+                'median': statistics.median(durations),
+                'max': max(durations),
+            },
+            'queries': max(queries),
+            'peak_memory': peak_memory,
+        }
+
+    def run_once(self, benchmark):
+        """
+        Returns tuple with response, wall time in seconds and number of queries.
+        """
+        caches[settings.REPORT_CACHE_ALIAS].clear()
+
+        counter = QueryCounter()
+
+        with transaction.atomic():
+            started = time.perf_counter()
+
+            with connection.execute_wrapper(counter):
+                response = benchmark()
+
+            duration = time.perf_counter() - started
+            transaction.set_rollback(True)
+
+        return response, duration, counter.count
+
+    def run(self, only=None):
+        results = {}
+
+        for name, benchmark in self.get_benchmarks():
+            if only and name not in only:
+                continue
+
+            results[name] = self.measure(benchmark)
+
+        return results
+
+    @staticmethod
+    def dataset():
+        return {
+            'courses': Course.objects.count(),
+            'students': Student.objects.count(),
+            'observations': Observation.objects.count(),
+            'observation_students': Observation.students.through.objects.count(),
+        }
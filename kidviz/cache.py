@@ -0,0 +1,93 @@
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from kidviz.models import Course
+from kidviz.taxonomy import Taxonomy
+
+logger = logging.getLogger(__name__)
+
+
+class ReportCache(object):
+    """
+    Cache of rendered report charts.
+
+    Keys are built from the chart name, the filters, current `data_version`
+    of every course shown in the report and the taxonomy version. Changing
+    observations or rosters bumps `data_version` of affected courses (see
+    `kidviz.signals`), so stale entries are never read again and are evicted
+    by the cache backend.
+    """
+    HITS_KEY = 'reports:hits'
+    MISSES_KEY = 'reports:misses'
+
+    def __init__(self, alias=None):
+        self.alias = alias or settings.REPORT_CACHE_ALIAS
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, name, course_ids, **filters):
+        """
+        Returns cache key for report `name` of courses with `course_ids`.
+        Filters must be JSON serializable, dates are serialized as strings.
+        """
+        payload = json.dumps({
+            'name': name,
+            'courses': Course.get_data_versions(course_ids),
+            'taxonomy': Taxonomy.get().version,
+            'filters': filters,
+        }, sort_keys=True, default=str)
+
+        return 'reports:{}:{}'.format(name, hashlib.md5(payload.encode('utf-8')).hexdigest())
+
+    def get_or_render(self, key, render):
+        """
+        Returns cached value for `key`. On a miss `render` is called and its
+        result is cached unless it's larger than `REPORT_CACHE_MAX_SIZE`.
+        """
+        value = self.cache.get(key)
+
+        if value is not None:
+            self._increment(self.HITS_KEY)
+            logger.debug('Report cache hit: %s', key)
+            return value
+
+        self._increment(self.MISSES_KEY)
+        logger.debug('Report cache miss: %s', key)
+        value = render()
+
+        if len(value) <= settings.REPORT_CACHE_MAX_SIZE:
+            self.cache.set(key, value)
+        else:
+            logger.info('Report %s is too large to be cached (%s bytes).', key, len(value))
+
+        return value
+
+    def stats(self):
+        """
+        Returns dict with number of hits and misses and the hit ratio.
+        """
+        hits = self.cache.get(self.HITS_KEY, 0)
+        misses = self.cache.get(self.MISSES_KEY, 0)
+
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else 0,
+        }
+
+    def _increment(self, key):
+        if not self.cache.add(key, 1, timeout=None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                # Counter was evicted between `add` and `incr`.
+                self.cache.set(key, 1, timeout=None)
+
+
+report_cache = ReportCache()
@@ -1,2 +1,6 @@
 class InvalidFileFormatError(Exception):
     """Invalid file format."""
+
+
+class JobError(Exception):
+    """Background job failed, the message is shown to the user."""
@@ -3,6 +3,7 @@ from collections import defaultdict
 import logging
 
 from django import forms
+from django.db import transaction
 from django.db.models import Q
 from django.forms.utils import ErrorList
 from django.forms.widgets import Select, SelectMultiple
@@ -12,6 +13,7 @@ from threadlocals.threadlocals import get_current_request
 
 from kidviz.models import (Course, LearningConstruct, LearningConstructSublevel, ContextTag,
     Observation, Setup, Student)
+from kidviz.taxonomy import Taxonomy
 from kidviz.widgets import CustomCheckboxWidget
 
 from users.models import User
@@ -45,18 +47,23 @@ class ConstructModelMultipleChoiceField(forms.ModelMultipleChoiceField):
         super(ConstructModelMultipleChoiceField, self).__init__(queryset, **kwargs)
         self.queryset = queryset.select_related()
         self.to_field_name = None
+        # Choices are built from the taxonomy snapshot every time they are rendered.
+        self.choices = self.get_grouped_choices
 
-        self.choices = []
-        _choices = defaultdict(list)
+    def get_grouped_choices(self):
+        choices = defaultdict(list)
+        # Sublevels come from the snapshot, a filtered queryset only limits which of them are choices.
+        if self.queryset.query.has_filters():
+            sublevel_ids = set(self.queryset.values_list('pk', flat=True))
+        else:
+            sublevel_ids = None
 
-        for construct_sublevel in queryset:
-            group = construct_sublevel.level.construct
-            _choices[group.abbreviation].append((construct_sublevel.id, self.label_from_instance(construct_sublevel)))
+        for construct in Taxonomy.get().constructs:
+            for sublevel in construct.sublevels:
+                if sublevel_ids is None or sublevel.id in sublevel_ids:
+                    choices[construct.abbreviation].append((sublevel.id, self.label_from_instance(sublevel)))
 
-        try:
-            self.choices = [(cat_name, data) for cat_name, data in _choices.items()]
-        except:
-            pass
+        return list(choices.items())
 
     def label_from_instance(self, obj):
         return '{} - {}'.format(obj.name, obj.description[:60])
@@ -167,6 +174,12 @@ class ObservationForm(forms.ModelForm):
 
         return self.cleaned_data
 
+    @transaction.atomic
+    def save(self, commit=True):
+        # The observation and its links are saved in one transaction, so data
+        # versions of their courses are bumped once.
+        return super().save(commit=commit)
+
 
 class GroupingForm(forms.Form):
     pass
@@ -231,15 +244,7 @@ class DateFilteringForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        constructs = LearningConstruct.objects.all()
-
-        constructs_sorted = []
-
-        for construct in constructs:
-            if construct.abbreviation == 'ToML':
-                constructs_sorted.insert(0, construct)
-            else:
-                constructs_sorted.append(construct)
+        constructs_sorted = Taxonomy.get().constructs
 
         choices = [('', '--------')]
         choices.extend([(construct.id, construct.name) for construct in constructs_sorted])
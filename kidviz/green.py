@@ -0,0 +1,39 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def gevent_wait_callback(connection, timeout=None):
+    """
+    Waits for psycopg2 connection by yielding to other greenlets instead of
+    blocking the whole worker process.
+    """
+    import psycopg2.extensions
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        state = connection.poll()
+
+        if state == psycopg2.extensions.POLL_OK:
+            break
+        elif state == psycopg2.extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == psycopg2.extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError('Bad result from poll: {}'.format(state))
+
+
+def patch_psycopg():
+    """
+    Makes psycopg2 cooperative with gevent, so a worker serves other requests
+    while one waits for the database. Must be called after gevent patched the
+    standard library, which the gevent worker of gunicorn does on start.
+    """
+    import psycopg2.extensions
+
+    if not hasattr(psycopg2.extensions, 'set_wait_callback'):
+        raise ImportError('Support for coroutines is available only from psycopg2 2.2.')
+
+    psycopg2.extensions.set_wait_callback(gevent_wait_callback)
+    logger.info('psycopg2 patched to wait for the database cooperatively.')
@@ -0,0 +1,117 @@
+"""
+Handlers of background jobs, run by the `run_job_worker` command.
+
+A handler receives the claimed `Job`, reads its `arguments`, reports progress
+with `job.report_progress` and returns the message shown to the user. Raise
+`JobError` to fail the job with a message for the user, other exceptions are
+logged and the user gets a generic one.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from kidviz.exceptions import JobError
+from kidviz.models import Course, Job, StagedImport, Student
+from kidviz.resources import ClassRoster
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+# Students whose grade is advanced in one transaction.
+ADVANCE_GRADE_BATCH_SIZE = 500
+
+
+def handler(kind):
+    """
+    Registers the decorated function as the handler of jobs of the `kind`.
+    """
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+
+    return register
+
+
+def run_job(job):
+    """
+    Runs claimed job and records its result.
+    """
+    try:
+        status, message = Job.SUCCEEDED, HANDLERS[job.kind](job) or ''
+    except JobError as err:
+        status, message = Job.FAILED, str(err)
+    except Exception as err:
+        logger.exception('Job %s failed: %s', job.pk, err)
+        status, message = Job.FAILED, 'An error occurred running the job.'
+
+    if not job.finish(status, message):
+        logger.warning('Job %s lost its lease before it finished, its result %s was dropped.', job.pk, status)
+
+
+def run_next_job(worker):
+    """
+    Runs the oldest pending job leased to the `worker`, returns it or `None`
+    when there isn't any.
+    """
+    job = Job.claim(worker)
+
+    if job:
+        run_job(job)
+
+    return job
+
+
+@handler(Job.ROSTER_IMPORT)
+def import_class_roster(job):
+    staged_import = StagedImport.active().filter(token=job.arguments['token'], owner=job.owner).first()
+
+    if not staged_import:
+        raise JobError('The preview has expired, please upload the file again.')
+
+    counts = ClassRoster(user=job.owner).process_rows(staged_import.rows, progress=job.report_progress)
+    staged_import.delete()
+
+    summary = ' '.join(
+        '{}: {} new, {} matched, {} skipped students.'.format(course.name, *course_counts)
+        for course, course_counts in counts.items())
+    return 'File imported successfully. {}'.format(summary)
+
+
+@handler(Job.ADVANCE_GRADE)
+def advance_grade(job):
+    student_ids = job.arguments['student_ids']
+    processed = 0
+
+    for start in range(0, len(student_ids), ADVANCE_GRADE_BATCH_SIZE):
+        batch = student_ids[start:start + ADVANCE_GRADE_BATCH_SIZE]
+
+        with transaction.atomic():
+            # Same change as `Student.advance_grade_level` for the whole batch,
+            # without signals, so reports of their courses are marked stale here.
+            processed += Student.objects.filter(pk__in=batch) \
+                .update(grade_level=F('grade_level') + 1, modified=timezone.now())
+            Course.bump_data_version(Q(students__in=batch))
+
+        job.report_progress(start + len(batch), len(student_ids))
+
+    return '{} students updated'.format(processed)
+
+
+@handler(Job.MERGE_STUDENTS)
+def merge_students(job):
+    # Every group lists the student the others are merged into first.
+    groups = job.arguments['groups']
+
+    for index, student_ids in enumerate(groups):
+        students = Student.objects.in_bulk(student_ids)
+
+        if student_ids[0] in students:
+            selected = students.pop(student_ids[0])
+            selected.merge(students.values())
+
+        job.report_progress(index + 1, len(groups))
+
+    return 'Students have been merged'
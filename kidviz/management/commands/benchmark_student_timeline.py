@@ -0,0 +1,81 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from kidviz.models import (
+    Course, LearningConstruct, LearningConstructLevel, LearningConstructSublevel, Observation, Student
+)
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures Observation.create_student_timeline for growing numbers of observation-student links. '
+        'Synthetic data is created in a transaction which is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[500, 1000, 2000, 4000],
+                            help='Numbers of observations to measure.')
+        parser.add_argument('--students', type=int, default=30, help='Number of students in the class.')
+        parser.add_argument('--students-per-observation', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=3, help='Best of N runs is reported.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        owner = User.objects.create(email='benchmark-student-timeline@kidviz.local')
+        course = Course.objects.create(name='Benchmark', owner=owner)
+        students = [
+            Student.objects.create(first_name='Student', last_name=str(index)) for index in range(options['students'])
+        ]
+        course.students.set(students)
+
+        construct = LearningConstruct.objects.create(name='Benchmark', abbreviation='BENCH')
+        sublevels = []
+
+        for level_index in range(3):
+            level = LearningConstructLevel.objects.create(
+                construct=construct, level=level_index + 1, description='')
+
+            for sublevel_index in 'ABC':
+                sublevels.append(LearningConstructSublevel.objects.create(
+                    level=level, name='BENCH {}{}'.format(level_index + 1, sublevel_index), description=''))
+
+        constructs = LearningConstruct.objects.prefetch_related('levels', 'levels__sublevels').filter(pk=construct.pk)
+        start = datetime.date.today() - datetime.timedelta(days=365)
+        created = 0
+
+        self.stdout.write('{:>12} {:>8} {:>12} {:>12}'.format('observations', 'links', 'seconds', 'us/link'))
+
+        for size in sorted(options['sizes']):
+            for index in range(created, size):
+                observation = Observation.objects.create(
+                    owner=owner, course=course, observation_date=start + datetime.timedelta(days=index % 365))
+                observation.students.set(random.sample(students, options['students_per_observation']))
+                observation.constructs.set(random.sample(sublevels, 2))
+
+            created = size
+
+            queryset = Observation.objects.filter(course=course) \
+                .prefetch_related('students', 'constructs', 'constructs__level', 'constructs__level__construct')
+            links = Observation.students.through.objects.filter(observation__course=course).count()
+            elapsed = []
+
+            for _ in range(options['repeat']):
+                observations = list(queryset)
+                started = time.perf_counter()
+                Observation.create_student_timeline(observations, students, constructs, start + datetime.timedelta(days=180))
+                elapsed.append(time.perf_counter() - started)
+
+            self.stdout.write('{:>12} {:>8} {:>12.4f} {:>12.2f}'.format(
+                size, links, min(elapsed), min(elapsed) / links * 10 ** 6))
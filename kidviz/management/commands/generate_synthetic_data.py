@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from kidviz.synthetic import SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Generates reproducible synthetic teachers, courses, students and observations for benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=10)
+        parser.add_argument('--courses', type=int, default=40)
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--observations', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=300, help='Observations are spread over this many days.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Same seed and sizes generate the same data. Seed must be unique in the database.')
+
+    def handle(self, *args, **options):
+        generator = SyntheticDataGenerator(
+            teachers=options['teachers'],
+            courses=options['courses'],
+            students=options['students'],
+            observations=options['observations'],
+            seed=options['seed'],
+            days=options['days'],
+        )
+        counts = generator.generate()
+
+        self.stdout.write(self.style.SUCCESS('Generated {}.'.format(
+            ', '.join('{} {}'.format(count, name) for name, count in counts.items()))))
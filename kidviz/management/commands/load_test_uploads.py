@@ -0,0 +1,169 @@
+import http.client
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends concurrent file uploads to a running server and reports throughput and latency, '
+        'so sync and gevent workers can be compared. Run it against a server using the same database.'
+    )
+
+    CHUNK_SIZE = 64 * 1024
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000', help='Address of the running server.')
+        parser.add_argument('--path', default=reverse('import_class_roster'), help='Path receiving the uploads.')
+        parser.add_argument('--field', default='uploadedFile', help='Name of the file field.')
+        parser.add_argument('--email', required=True, help='E-mail of the user sending the uploads.')
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--size', type=int, default=2 ** 20, help='Size of uploaded files in bytes.')
+        parser.add_argument('--upload-rate', type=int, default=0,
+                            help='Bytes per second sent by every client, simulates slow networks. 0 is unlimited.')
+        parser.add_argument('--output', help='Path of a JSON file the results are written to.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError('User {} does not exist.'.format(options['email']))
+
+        url = urlsplit(options['url'])
+        self.host, self.port = url.hostname, url.port or 80
+        self.upload_rate = options['upload_rate']
+
+        cookies = self.get_cookies(user, options['path'])
+        body, content_type = self.get_body(options['field'], options['size'], cookies['csrftoken'])
+        headers = {
+            'Content-Type': content_type,
+            'Content-Length': str(len(body)),
+            'Cookie': '; '.join('{}={}'.format(name, value) for name, value in cookies.items()),
+            'Referer': options['url'] + options['path'],
+        }
+
+        statuses = []
+        lock = threading.Lock()
+
+        def upload(index):
+            status, duration = self.upload(options['path'], headers, body)
+
+            with lock:
+                statuses.append(status)
+
+            return duration
+
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            durations = sorted(executor.map(upload, range(options['requests'])))
+
+        elapsed = time.monotonic() - started
+        results = {
+            'url': options['url'] + options['path'],
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'size': options['size'],
+            'upload_rate': self.upload_rate,
+            'elapsed': elapsed,
+            'throughput': len(durations) / elapsed,
+            'latency': {
+                'median': statistics.median(durations),
+                'p95': durations[int(len(durations) * 0.95) - 1],
+                'max': durations[-1],
+            },
+            'statuses': {str(status): statuses.count(status) for status in set(statuses)},
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+
+        self.stdout.write('{} uploads of {} KB in {:.2f}s: {:.2f} requests/s, median {:.3f}s, p95 {:.3f}s'.format(
+            results['requests'], options['size'] // 1024, elapsed, results['throughput'],
+            results['latency']['median'], results['latency']['p95']))
+        self.stdout.write('Response statuses: {}'.format(results['statuses']))
+
+        if set(statuses) - {200, 302}:
+            raise CommandError('Some uploads failed.')
+
+    def get_cookies(self, user, path):
+        """
+        Returns session cookie of the user and CSRF cookie set by the upload page.
+        """
+        client = Client()
+        client.force_login(user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+
+        connection = http.client.HTTPConnection(self.host, self.port)
+        connection.request('GET', path, headers={'Cookie': '{}={}'.format(settings.SESSION_COOKIE_NAME, session)})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+
+        cookie = SimpleCookie()
+
+        for header in response.msg.get_all('Set-Cookie') or []:
+            cookie.load(header)
+
+        if settings.CSRF_COOKIE_NAME not in cookie:
+            raise CommandError('Page {} returned {} without CSRF cookie.'.format(path, response.status))
+
+        return {
+            settings.SESSION_COOKIE_NAME: session,
+            settings.CSRF_COOKIE_NAME: cookie[settings.CSRF_COOKIE_NAME].value,
+        }
+
+    @staticmethod
+    def get_body(field, size, csrf_token):
+        boundary = uuid.uuid4().hex
+        body = (
+            '--{boundary}\r\n'
+            'Content-Disposition: form-data; name="csrfmiddlewaretoken"\r\n\r\n'
+            '{token}\r\n'
+            '--{boundary}\r\n'
+            'Content-Disposition: form-data; name="{field}"; filename="load-test.bin"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+        ).format(boundary=boundary, token=csrf_token, field=field).encode()
+        body += os.urandom(size) + '\r\n--{}--\r\n'.format(boundary).encode()
+
+        return body, 'multipart/form-data; boundary={}'.format(boundary)
+
+    def upload(self, path, headers, body):
+        """
+        Sends the body in chunks at the upload rate, returns response status and duration.
+        """
+        started = time.monotonic()
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=300)
+        connection.putrequest('POST', path)
+
+        for name, value in headers.items():
+            connection.putheader(name, value)
+
+        connection.endheaders()
+
+        for offset in range(0, len(body), self.CHUNK_SIZE):
+            connection.send(body[offset:offset + self.CHUNK_SIZE])
+
+            if self.upload_rate:
+                time.sleep(self.CHUNK_SIZE / self.upload_rate)
+
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+
+        return response.status, time.monotonic() - started
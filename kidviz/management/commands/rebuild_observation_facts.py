@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from kidviz.models import ObservationFact
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds observation facts from observations, their students, constructs and tags, or verifies them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only compare facts with the source tables, exits with an error when they differ.')
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            count = ObservationFact.rebuild()
+            self.stdout.write(self.style.SUCCESS('Rebuilt {} observation facts.'.format(count)))
+            return
+
+        missing, stale = ObservationFact.verify()
+
+        if missing or stale:
+            raise CommandError(
+                'Observation facts differ from the source tables. Observations with missing facts: {}. '
+                'Observations with stale facts: {}. Run the command without --verify to rebuild them.'.format(
+                    self.format_ids(missing), self.format_ids(stale)))
+
+        self.stdout.write(self.style.SUCCESS('Observation facts match the source tables.'))
+
+    @staticmethod
+    def format_ids(ids, limit=20):
+        ids = sorted(ids)
+        formatted = ', '.join(str(observation_id) for observation_id in ids[:limit]) or 'none'
+
+        if len(ids) > limit:
+            formatted += ' and {} more'.format(len(ids) - limit)
+
+        return formatted
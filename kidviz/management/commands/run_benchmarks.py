@@ -0,0 +1,56 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from kidviz.benchmarks import BenchmarkRunner
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures wall time, SQL query count and peak memory of report views and roster import/export '
+        'and writes results to a JSON file so runs can be compared.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='benchmark-results.json', help='Path of the JSON results file.')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--courses', type=int, default=5, help='Number of courses shown in reports.')
+        parser.add_argument('--only', nargs='+', help='Names of benchmarks to run.')
+
+    def handle(self, *args, **options):
+        runner = BenchmarkRunner(repeat=options['repeat'], course_count=options['courses'])
+        results = runner.run(only=options['only'])
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'commit': self.get_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'dataset': runner.dataset(),
+            'results': results,
+        }
+
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+        for name, result in results.items():
+            self.stdout.write('{:<32} {:>9.3f}s {:>7} queries {:>9.1f} MB'.format(
+                name, result['wall_time']['median'], result['queries'], result['peak_memory'] / 2 ** 20))
+
+        self.stdout.write(self.style.SUCCESS('Results written to {}.'.format(options['output'])))
+
+    @staticmethod
+    def get_commit():
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,85 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connections
+
+from kidviz.jobs import run_next_job
+from kidviz.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs background jobs submitted by the web application, such as class roster imports, '
+        'polling the database for new ones. Several workers can run at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sleep', type=float, default=2,
+                            help='Seconds to wait before polling again when there are no pending jobs.')
+        parser.add_argument('--once', action='store_true', help='Exit when there are no pending jobs.')
+
+    def handle(self, *args, **options):
+        self.running = True
+        # Finish the current job before exiting on restarts and deploys.
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        # Containers of different hosts can run workers with the same process id.
+        worker = '{}:{}:{}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        stopped = threading.Event()
+        # Handlers block the loop, so leases of their jobs are renewed by another thread.
+        renewer = threading.Thread(target=self.renew_leases, args=(worker, stopped), daemon=True)
+        renewer.start()
+        expired_checked = 0
+
+        try:
+            while self.running:
+                # Like at the end of a request, broken connections aren't reused.
+                close_old_connections()
+
+                if time.monotonic() - expired_checked >= Job.LEASE_RENEW_INTERVAL.total_seconds():
+                    self.fail_expired()
+                    expired_checked = time.monotonic()
+
+                job = run_next_job(worker)
+
+                if job:
+                    self.stdout.write('{} {}.'.format(job, job.status))
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['sleep'])
+        finally:
+            stopped.set()
+            renewer.join()
+            close_old_connections()
+
+    def fail_expired(self):
+        expired = Job.fail_expired()
+        if expired:
+            self.stdout.write('{} interrupted jobs marked as failed.'.format(expired))
+
+    @staticmethod
+    def renew_leases(worker, stopped):
+        while not stopped.wait(Job.LEASE_RENEW_INTERVAL.total_seconds()):
+            try:
+                Job.renew_leases(worker)
+            except DatabaseError:
+                logger.exception('Leases of jobs of worker %s were not renewed.', worker)
+                # Connect again on the next attempt.
+                connections[settings.JOB_DATABASE_ALIAS].close()
+
+        connections[settings.JOB_DATABASE_ALIAS].close()
+
+    def stop(self, signum, frame):
+        self.stdout.write('Stopping after the current job.')
+        self.running = False
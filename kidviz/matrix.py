@@ -0,0 +1,150 @@
+from array import array
+from collections import namedtuple
+
+# Row of a matrix aggregating all its other rows, `id` doesn't collide with ids of real rows.
+MergedRow = namedtuple('MergedRow', ['id', 'name'])
+
+
+class CellMatrix(object):
+    """
+    Compact storage of observation ids per (row, column) cell of a star chart.
+
+    Rows are students or courses and columns are sublevels of a single
+    construct. Cells are addressed with dense integer indexes
+    (`row_index * len(columns) + column_index`). Number of observations per
+    cell is kept in `counts` and observation ids of all cells are kept in a
+    single `observation_ids` array, where ids of cell `i` are
+    `observation_ids[offsets[i]:offsets[i + 1]]` (CSR layout).
+
+    `observations` maps observation ids to `Observation` instances, it is
+    shared by all matrices of a report and used only when cell's observations
+    are iterated in templates.
+    """
+
+    def __init__(self, rows, columns, counts, offsets, observation_ids, observations=None):
+        self.rows = rows
+        self.columns = columns
+        self.counts = counts
+        self.offsets = offsets
+        self.observation_ids = observation_ids
+        self.observations = observations or {}
+        self.row_index = {row: index for index, row in enumerate(rows)}
+        self.column_index = {column: index for index, column in enumerate(columns)}
+
+    @classmethod
+    def build(cls, rows, columns, entries, observations=None):
+        """
+        Creates matrix from `entries` iterable of `(row_index, column_index, observation_id)`
+        tuples. Order of ids inside a cell follows order of `entries`.
+        """
+        width = len(columns)
+        size = len(rows) * width
+        cells = array('I', (row * width + column for row, column, _ in entries))
+        ids = [observation_id for _, _, observation_id in entries]
+
+        counts = array('I', [0]) * size
+        for cell in cells:
+            counts[cell] += 1
+
+        offsets = array('I', [0])
+        total = 0
+        for count in counts:
+            total += count
+            offsets.append(total)
+
+        # Counting sort of ids by cell index.
+        position = offsets[:-1]
+        observation_ids = array('I', [0]) * len(ids)
+        for cell, observation_id in zip(cells, ids):
+            observation_ids[position[cell]] = observation_id
+            position[cell] += 1
+
+        return cls(rows, columns, counts, offsets, observation_ids, observations)
+
+    def cell(self, row, column):
+        return MatrixCell(self, self.row_index[row] * len(self.columns) + self.column_index[column])
+
+    def items(self):
+        for index, row in enumerate(self.rows):
+            yield row, MatrixRow(self, index)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __contains__(self, row):
+        return row in self.row_index
+
+
+class MatrixRow(object):
+    """
+    Read-only view of a single row of `CellMatrix`, iterated in templates
+    the same way as `{sublevel: [observations]}` dict.
+    """
+
+    def __init__(self, matrix, index):
+        self.matrix = matrix
+        self.index = index
+
+    def items(self):
+        start = self.index * len(self.matrix.columns)
+
+        for column_index, column in enumerate(self.matrix.columns):
+            yield column, MatrixCell(self.matrix, start + column_index)
+
+    def __getitem__(self, column):
+        return MatrixCell(self.matrix, self.index * len(self.matrix.columns) + self.matrix.column_index[column])
+
+
+class MatrixCell(object):
+    """
+    Read-only view of a single cell of `CellMatrix`. `len()` reads the count
+    directly, iterating yields `Observation` instances.
+    """
+
+    def __init__(self, matrix, index):
+        self.matrix = matrix
+        self.index = index
+
+    @property
+    def ids(self):
+        return self.matrix.observation_ids[self.matrix.offsets[self.index]:self.matrix.offsets[self.index + 1]]
+
+    def __len__(self):
+        return self.matrix.counts[self.index]
+
+    def __bool__(self):
+        return self.matrix.counts[self.index] > 0
+
+    def __iter__(self):
+        observations = self.matrix.observations
+        return (observations[observation_id] for observation_id in self.ids)
+
+
+def encode_daily_counts(days):
+    """
+    Encodes cumulative number of items per day for timeline sliders.
+
+    `days` is an iterable of day indexes of items (days since the slider's
+    start date), in any order. Returns flat list `[day, count, day, count, ...]`
+    with only the days having items, where `day` is the number of days since
+    the previous listed day (since day 0 for the first one) and `count` is the
+    number of items on that day. Cumulative count up to a day is the sum of
+    counts of all listed days up to it. Size of the list depends on number of
+    distinct days with items, not on the length of the whole period.
+    """
+    counts = {}
+
+    for day in days:
+        counts[day] = counts.get(day, 0) + 1
+
+    encoded = []
+    previous = 0
+
+    for day in sorted(counts):
+        encoded.extend((day - previous, counts[day]))
+        previous = day
+
+    return encoded
@@ -1,10 +1,21 @@
+import json
 import logging
 import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
 
 from botocore.exceptions import ClientError
+from django.conf import settings
 from django.core.files.storage import default_storage
+from django.db import connections
+from django.template.base import Template
+
+from kidviz.routers import ReplicaRouter
 
 logger = logging.getLogger('s3file')
+timing_logger = logging.getLogger('kidviz.timing')
 
 
 class S3FileMiddleware:
@@ -75,3 +86,172 @@ class S3FileMiddleware:
                 yield f
             except ClientError:
                 logger.exception("File not found: %s", path)
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Sets a cookie after a request which wrote to the database, so following
+    requests of the user read from the primary until the replica catches up
+    (see `kidviz.routers.replica_view`).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        ReplicaRouter.reset()
+        response = self.get_response(request)
+
+        if ReplicaRouter.has_written():
+            response.set_cookie(settings.REPLICA_STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+
+        return response
+
+
+class RequestMetrics(object):
+    """
+    SQL and template rendering metrics collected while a request is handled.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_sql_time = 0.0
+        self.template_depth = 0
+        self.statements = Counter()
+        self.statement_time = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper, see `connection.execute_wrapper`.
+        """
+        started = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += duration
+            self.statements[sql] += 1
+            self.statement_time[sql] += duration
+
+            if self.template_depth:
+                self.template_sql_time += duration
+
+    def summary(self):
+        """
+        Returns dict with durations in milliseconds. Template time doesn't
+        include queries run by templates, they are part of the SQL time.
+        """
+        total = time.perf_counter() - self.started
+        template = self.template_time - self.template_sql_time
+
+        return {
+            'queries': self.queries,
+            'sql': self.sql_time * 1000,
+            'template': template * 1000,
+            'python': (total - self.sql_time - template) * 1000,
+            'total': total * 1000,
+        }
+
+    def repeated_statements(self, limit):
+        return [
+            (count, self.statement_time[sql] * 1000, sql)
+            for sql, count in self.statements.most_common(limit)
+            if count > 1
+        ]
+
+
+class RequestTimingMiddleware:
+    """
+    Records number of SQL queries, SQL time, template rendering time and the
+    remaining Python time of every request.
+
+    Metrics are logged as a JSON line to the `kidviz.timing` logger and
+    returned in the `Server-Timing` header, so they show up in browser dev
+    tools. Requests slower than `REQUEST_TIMING_SLOW_THRESHOLD` milliseconds
+    additionally log the most repeated SQL statements, which makes N+1 query
+    patterns easy to spot.
+    """
+    local = threading.local()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.patch_template_render()
+
+    def __call__(self, request):
+        metrics = self.local.metrics = RequestMetrics()
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+
+                response = self.get_response(request)
+        finally:
+            self.local.metrics = None
+
+        summary = metrics.summary()
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+
+        if settings.REQUEST_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                'sql;dur={:.1f};desc="{} queries"'.format(summary['sql'], summary['queries']),
+                'template;dur={:.1f}'.format(summary['template']),
+                'python;dur={:.1f}'.format(summary['python']),
+                'total;dur={:.1f}'.format(summary['total']),
+            ])
+
+        timing_logger.info(json.dumps(dict(
+            summary,
+            view=view_name,
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+        ), sort_keys=True))
+
+        if summary['total'] >= settings.REQUEST_TIMING_SLOW_THRESHOLD:
+            statements = metrics.repeated_statements(settings.REQUEST_TIMING_TOP_STATEMENTS)
+            timing_logger.warning('Slow request %s %s (%s) took %.0f ms with %s queries.%s',
+                                  request.method, request.path, view_name, summary['total'], summary['queries'],
+                                  ''.join('\n  {} x {:.1f} ms: {}'.format(count, duration, sql[:500])
+                                          for count, duration, sql in statements))
+
+        return response
+
+    @classmethod
+    def patch_template_render(cls):
+        """
+        Wraps `Template.render` to measure time spent rendering templates.
+        Only the outermost template is measured, included templates are
+        rendered inside it.
+        """
+        if getattr(Template.render, 'timed', False):
+            return
+
+        render = Template.render
+        local = cls.local
+
+        def timed_render(self, context):
+            metrics = getattr(local, 'metrics', None)
+
+            if metrics is None:
+                return render(self, context)
+
+            metrics.template_depth += 1
+            started = time.perf_counter()
+
+            try:
+                return render(self, context)
+            finally:
+                metrics.template_depth -= 1
+
+                if not metrics.template_depth:
+                    metrics.template_time += time.perf_counter() - started
+
+        timed_render.timed = True
+        Template.render = timed_render
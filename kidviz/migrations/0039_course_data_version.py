@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kidviz', '0038_observation_is_imported'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
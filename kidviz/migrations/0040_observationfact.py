@@ -0,0 +1,73 @@
+# Generated by Django 2.2.13 on 2026-10-18 09:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FIELDS = (
+    'observation_id', 'student_id', 'sublevel_id', 'construct_id', 'course_id', 'owner_id',
+    'observation_date', 'is_imported', 'is_draft', 'is_formative_assessment',
+)
+
+
+def create_facts(apps, schema_editor):
+    Observation = apps.get_model('kidviz', 'Observation')
+    ObservationFact = apps.get_model('kidviz', 'ObservationFact')
+
+    rows = Observation.students.through.objects.annotate(
+        is_formative_assessment=models.Exists(
+            Observation.tags.through.objects.filter(
+                observation_id=models.OuterRef('observation_id'),
+                contexttag__text='Formative Assessment',
+            )
+        ),
+    ).values_list(
+        'observation_id',
+        'student_id',
+        'observation__constructs',
+        'observation__constructs__level__construct_id',
+        'observation__course_id',
+        'observation__owner_id',
+        'observation__observation_date',
+        'observation__is_imported',
+        'observation__is_draft',
+        'is_formative_assessment',
+    )
+    batch = []
+
+    for row in rows.iterator():
+        batch.append(ObservationFact(**dict(zip(FIELDS, row))))
+
+        if len(batch) == 5000:
+            ObservationFact.objects.bulk_create(batch)
+            batch = []
+
+    ObservationFact.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('kidviz', '0039_course_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObservationFact',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('observation_date', models.DateField()),
+                ('is_imported', models.BooleanField()),
+                ('is_draft', models.BooleanField()),
+                ('is_formative_assessment', models.BooleanField()),
+                ('construct', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='kidviz.LearningConstruct')),
+                ('course', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='kidviz.Course')),
+                ('observation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facts', to='kidviz.Observation')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='kidviz.Student')),
+                ('sublevel', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='kidviz.LearningConstructSublevel')),
+            ],
+        ),
+        migrations.RunPython(create_facts, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.13 on 2026-10-18 09:35
+
+from django.db import migrations, models
+
+# Through tables of many to many fields are created by Django with a unique
+# index starting with `observation_id`. Reports also join them the other way
+# around, from a student, sublevel or tag to its observations.
+THROUGH_TABLE_INDEXES = (
+    ('kidviz_observation_students', 'student_id'),
+    ('kidviz_observation_constructs', 'learningconstructsublevel_id'),
+    ('kidviz_observation_tags', 'contexttag_id'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kidviz', '0040_observationfact'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='observation',
+            index=models.Index(fields=['course', 'observation_date'], name='observation_course_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='observation',
+            index=models.Index(condition=models.Q(is_draft=True), fields=['owner', '-id'], name='observation_owner_draft_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='observation',
+            index=models.Index(fields=['owner', '-created'], name='observation_owner_created_idx'),
+        ),
+    ] + [
+        migrations.RunSQL(
+            'CREATE INDEX {table}_reverse_idx ON {table} ({column}, observation_id)'.format(table=table, column=column),
+            reverse_sql='DROP INDEX {table}_reverse_idx'.format(table=table),
+        )
+        for table, column in THROUGH_TABLE_INDEXES
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.13 on 2026-10-18 09:36
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kidviz', '0041_report_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='observation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['construct_choices'], name='observation_constructs_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='observation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_choices'], name='observation_tags_gin'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.13 on 2026-10-18 10:05
+
+from django.db import migrations
+
+# Roster import matches courses and students by case-insensitive names, the
+# lookups compare `lower()` of the columns so they need expression indexes,
+# which Django can't declare in model's Meta.
+NAME_INDEXES = (
+    ('kidviz_course_lower_name_idx', 'kidviz_course', 'lower(name), grade_level', ''),
+    ('kidviz_student_lower_name_idx', 'kidviz_student', 'lower(last_name), lower(first_name)',
+     "WHERE status = 'active'"),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kidviz', '0042_observation_choices_gin'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX {name} ON {table} ({columns}) {condition}'.format(
+                name=name, table=table, columns=columns, condition=condition),
+            reverse_sql='DROP INDEX {}'.format(name),
+        )
+        for name, table, columns, condition in NAME_INDEXES
+    ]
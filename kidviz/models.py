@@ -1,9 +1,16 @@
 import datetime
 import json
+import operator
 import os
+import zlib
+from collections import Counter
+from functools import lru_cache, reduce
 from uuid import uuid4
 
-from django.contrib.postgres.fields import ArrayField
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models, transaction
 from django.utils import timezone
 from django.utils.deconstruct import deconstructible
@@ -11,6 +18,7 @@ from django.utils.timezone import now
 from django_extensions.db.models import TimeStampedModel
 from tinymce.models import HTMLField
 
+from kidviz.matrix import CellMatrix, MergedRow, encode_daily_counts
 from utils.ownership import OwnerMixin, OptionalOwnerMixin
 
 from users.models import User
@@ -35,6 +43,10 @@ class Course(TimeStampedModel, OwnerMixin):
     students = models.ManyToManyField('kidviz.Student', blank=True)
     grade_level = models.PositiveSmallIntegerField(default=0)
 
+    # incremented whenever observations or the roster of the course change, used to
+    # invalidate cached reports
+    data_version = models.PositiveIntegerField(default=0, editable=False)
+
     def __str__(self):
         return self.name
 
@@ -50,6 +62,59 @@ class Course(TimeStampedModel, OwnerMixin):
             return Course.objects.prefetch_related('students') \
                 .filter(id__in=course_ids).order_by('id')
 
+    @classmethod
+    def get_data_versions(cls, course_ids):
+        """
+        Returns list of `(id, data_version)` tuples for courses with given ids.
+        """
+        return list(Course.objects.filter(id__in=course_ids).order_by('id').values_list('id', 'data_version'))
+
+    @classmethod
+    def bump_data_version(cls, *filters):
+        """
+        Increments `data_version` of courses matching any of given `Q` filters
+        which marks cached reports of those courses as stale.
+
+        Courses are looked up right away, so filters match the current state
+        of the database, but inside a transaction their versions are
+        incremented once when it commits, however many changes of the
+        transaction affected them.
+        """
+        # Every filter is a separate subquery so each of them can use its own index
+        # instead of OR-ing conditions across several joins.
+        query = reduce(operator.or_, (models.Q(id__in=Course.objects.filter(f).values('id')) for f in filters))
+        course_ids = set(Course.objects.filter(query).values_list('id', flat=True))
+
+        if course_ids:
+            DataVersionBump.schedule(course_ids)
+
+
+class DataVersionBump(object):
+    """
+    Increments `data_version` of collected courses when the transaction of the
+    connection commits, or immediately outside of a transaction.
+    """
+
+    def __init__(self, course_ids):
+        self.course_ids = set(course_ids)
+
+    def __call__(self):
+        Course.objects.filter(id__in=self.course_ids).update(data_version=models.F('data_version') + 1)
+
+    @classmethod
+    def schedule(cls, course_ids):
+        connection = transaction.get_connection()
+
+        if connection.in_atomic_block:
+            # Bump of the current transaction, callbacks of rolled back
+            # savepoints are removed from the list by Django.
+            for savepoint_ids, callback in connection.run_on_commit:
+                if isinstance(callback, cls):
+                    callback.course_ids.update(course_ids)
+                    return
+
+        transaction.on_commit(cls(course_ids))
+
 
 class Student(TimeStampedModel):
     """
@@ -104,6 +169,28 @@ class Student(TimeStampedModel):
                 if not self in entry.students.all():
                     entry.students.add(self)
 
+    @classmethod
+    def get_merge_target(cls, students):
+        """
+        Returns the student with the highest grade level, other students with
+        the same name are merged into it.
+        """
+        selected = students[0]
+        for student in students:
+            if student.grade_level > selected.grade_level:
+                selected = student
+        return selected
+
+    @transaction.atomic
+    def merge(self, others):
+        """
+        Reassigns related entries of other students to self and deletes them.
+        """
+        for other in others:
+            if other != self:
+                self.reassign(other)
+                other.delete()
+
     @transaction.atomic
     def split_to_new(self, course):
         # Create copy of student, but don't copy nickname and student_id.
@@ -212,17 +299,50 @@ class Observation(TimeStampedModel, OwnerMixin):
 
     image_width = models.CharField(null=True, blank=True, max_length=255)
 
+    # observations with this tag are displayed the same way as imported ones
+    FORMATIVE_ASSESSMENT_TAG = 'Formative Assessment'
+
+    # row of star chart v4 with merged observations of all courses
+    ALL_COURSES = MergedRow(id=0, name='All courses')
+
     @property
     def allowed_students(self):
-        if not self.grouping:
+        if not self.grouping_id:
             return []
 
-        groups = self.grouping.groups.all()
-        students = set()
-        for group in groups:
-            students.update(list(group.students.all()))
+        if not hasattr(self, '_allowed_students'):
+            Observation.resolve_allowed_students([self])
+
+        return self._allowed_students
+
+    @classmethod
+    def resolve_allowed_students(cls, observations):
+        """
+        Loads students of all groups of observations' groupings with two
+        queries and sets them as `allowed_students`. Observations with the
+        same grouping share the same list. Returns list of observations.
+        """
+        observations = list(observations)
+        grouping_ids = {observation.grouping_id for observation in observations if observation.grouping_id}
+        allowed_students = {grouping_id: [] for grouping_id in grouping_ids}
+
+        if grouping_ids:
+            links = list(
+                StudentGroup.students.through.objects
+                .filter(studentgroup__studentgrouping__in=grouping_ids)
+                .order_by('student_id')
+                .values_list('studentgroup__studentgrouping', 'student_id')
+                .distinct()
+            )
+            students = Student.objects.in_bulk({student_id for _, student_id in links})
+
+            for grouping_id, student_id in links:
+                allowed_students[grouping_id].append(students[student_id])
 
-        return list(students)
+        for observation in observations:
+            observation._allowed_students = allowed_students.get(observation.grouping_id, [])
+
+        return observations
 
     def update_draft_media(self, image, video):
         """Updates media for `Observation`.
@@ -252,7 +372,41 @@ class Observation(TimeStampedModel, OwnerMixin):
         rendered as blue. Those are observations with is_imported=True
         or belonging to the Formative Assessment tag.
         """
-        return self.is_imported or self.tags.filter(text='Formative Assessment').exists()
+        if hasattr(self, 'is_formative_assessment'):
+            return self.is_imported or self.is_formative_assessment
+
+        return self.is_imported or any(tag.text == self.FORMATIVE_ASSESSMENT_TAG for tag in self.tags.all())
+
+    @classmethod
+    def annotate_formative_assessment(cls, observations):
+        """
+        Annotates `observations` with `is_formative_assessment` flag used by
+        `should_be_blue`, so it doesn't need a query per observation.
+        """
+        return observations.annotate(is_formative_assessment=models.Exists(
+            Observation.tags.through.objects.filter(
+                observation_id=models.OuterRef('pk'),
+                contexttag__text=cls.FORMATIVE_ASSESSMENT_TAG,
+            )
+        ))
+
+    @classmethod
+    def filter_offered_constructs(cls, observations, constructs):
+        """
+        Filters `observations` to ones whose setup offered any sublevel of any of
+        `constructs`. Uses GIN index of `construct_choices` instead of joining
+        the constructs through table.
+        """
+        sublevels = LearningConstructSublevel.objects.filter(level__construct__in=constructs)
+        return observations.filter(construct_choices__overlap=list(sublevels.values_list('id', flat=True)))
+
+    @classmethod
+    def filter_offered_tags(cls, observations, tags):
+        """
+        Filters `observations` to ones whose setup offered any of `tags`. Uses
+        GIN index of `tag_choices` instead of joining the tags through table.
+        """
+        return observations.filter(tag_choices__overlap=[getattr(tag, 'pk', tag) for tag in tags])
 
     @classmethod
     def get_observations(
@@ -292,138 +446,394 @@ class Observation(TimeStampedModel, OwnerMixin):
         if tags:
             observations = observations.filter(tags__in=tags)
 
-        return (observations, all_observations_for_chart_4)
-
-    @classmethod
-    def initialize_star_matrix_by_class(cls, constructs, courses):
-        star_matrix_by_class = {}
-
-        for construct in constructs:
-            star_matrix_by_class[construct] = {}
-
-            for course in courses:
-                star_matrix_by_class[construct][course] = {}
-
-                for student in course.students.all():
-                    star_matrix_by_class[construct][course][student] = {}
-
-                    for level in construct.levels.all():
-                        for sublevel in level.sublevels.all():
-                            star_matrix_by_class[construct][course][student][sublevel] = []
-
-        return star_matrix_by_class
-
-    @classmethod
-    def initialize_dot_matrix_by_class(cls, constructs, courses):
-        dot_matrix = {}
-
-        for construct in constructs:
-            dot_matrix[construct] = {}
-
-            for course in courses:
-                dot_matrix[construct][course] = {}
-
-                for level in construct.levels.all():
-                    for sublevel in level.sublevels.all():
-                        dot_matrix[construct][course][sublevel] = []
-
-        return dot_matrix
+        return (cls.annotate_formative_assessment(observations), all_observations_for_chart_4)
 
     @classmethod
     def create_star_chart_4(cls, observations, constructs, courses, min_date):
-        star_chart_4 = {}
+        """
+        Returns tuple with dict where key is a construct and value is `CellMatrix`
+        with courses and `ALL_COURSES` as rows and sublevels each followed by
+        their level as columns, and dict with daily observation counts since
+        `min_date` per construct, row and column ids encoded with `encode_daily_counts`.
+
+        Cells of `ALL_COURSES` row and level columns hold pre-merged aggregates:
+        observations of all courses and of all level's sublevels. They are filled
+        in the same pass as sublevel cells, so merging courses or sublevels in the
+        chart only swaps which cells are displayed. Level columns are keyed with
+        `get_level_key` in daily counts.
+        """
+        courses = list(courses)
+        rows = courses + [cls.ALL_COURSES]
+        merged_row = len(courses)
+        course_index = {course.id: index for index, course in enumerate(courses)}
+        columns = {}
+        # Sublevel id: (column index, merged level column index, merged level key).
+        column_index = {}
+        entries = {}
         star_chart_4_dates = {}
 
         for construct in constructs:
-            star_chart_4[construct] = {}
-            star_chart_4_dates[construct.id] = {}
-
-            for course in courses:
-                star_chart_4[construct][course] = {}
-                star_chart_4_dates[construct.id][course.id] = {}
-
-                for level in construct.levels.all():
-                    for sublevel in level.sublevels.all():
-                        star_chart_4[construct][course][sublevel] = []
-                        star_chart_4_dates[construct.id][course.id][sublevel.id] = []
+            columns[construct] = []
+            entries[construct] = []
+
+            for level in construct.levels.all():
+                level_column = len(columns[construct]) + len(level.sublevels.all())
+                level_key = cls.get_level_key(level)
+
+                for sublevel in level.sublevels.all():
+                    column_index[sublevel.id] = (len(columns[construct]), level_column, level_key)
+                    columns[construct].append(sublevel)
+
+                columns[construct].append(level)
+
+            star_chart_4_dates[construct.id] = {
+                row.id: {
+                    column.id if isinstance(column, LearningConstructSublevel) else cls.get_level_key(column): []
+                    for column in columns[construct]
+                }
+                for row in rows
+            }
+
+        def add_entry(construct, row, sublevel_id, observation_id):
+            column, level_column, _ = column_index[sublevel_id]
+            entries[construct].extend((
+                (row, column, observation_id),
+                (row, level_column, observation_id),
+                (merged_row, column, observation_id),
+                (merged_row, level_column, observation_id),
+            ))
+
+        def add_day(construct, course_id, sublevel_id, day):
+            _, _, level_key = column_index[sublevel_id]
+
+            for row_dates in (star_chart_4_dates[construct.id][course_id],
+                              star_chart_4_dates[construct.id][cls.ALL_COURSES.id]):
+                row_dates[sublevel_id].append(day)
+                row_dates[level_key].append(day)
+
+        # Observations are duplicated from one construct sublevel to another according
+        # to LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS. Duplicates are added
+        # after all observations so they don't chain.
+        duplication_targets = LearningConstructSublevel.get_duplication_targets()
+        sublevel_constructs = {
+            sublevel.id: construct
+            for construct in constructs
+            for sublevel in columns[construct]
+            if isinstance(sublevel, LearningConstructSublevel)
+        }
+        duplicate_entries = []
+        duplicate_dates = []
+        observations_by_id = {}
+        days = cls.get_day_indexes((observation.observation_date for observation in observations), min_date)
 
         for observation in observations:
             if observation.course:
+                observations_by_id[observation.id] = observation
                 sublevels = observation.constructs.all()
+                day = days[observation.observation_date]
 
                 for sublevel in sublevels:
                     construct = sublevel.level.construct
+                    targets = [
+                        (sublevel_constructs[target], target)
+                        for target in duplication_targets.get(sublevel.id, [])
+                        if target in sublevel_constructs
+                    ]
 
                     if observation.observation_date <= min_date:
-                        star_chart_4[construct][observation.course][sublevel].append(observation)
+                        add_entry(construct, course_index[observation.course_id], sublevel.id, observation.id)
+
+                        duplicate_entries.extend(
+                            (target_construct, course_index[observation.course_id], target, observation.id)
+                            for target_construct, target in targets
+                        )
+
+                    add_day(construct, observation.course_id, sublevel.id, day)
+
+                    duplicate_dates.extend(
+                        (target_construct, observation.course_id, target, day)
+                        for target_construct, target in targets
+                    )
+
+        for construct, row, sublevel_id, observation_id in duplicate_entries:
+            add_entry(construct, row, sublevel_id, observation_id)
 
-                    star_chart_4_dates[construct.id][observation.course.id][sublevel.id].append(
-                        datetime.datetime \
-                            .combine(observation.observation_date, datetime.datetime.min.time()) \
-                            .timestamp())
+        for construct, course_id, sublevel_id, day in duplicate_dates:
+            add_day(construct, course_id, sublevel_id, day)
 
-        return (star_chart_4, star_chart_4_dates)
+        star_chart_4 = {
+            construct: CellMatrix.build(rows, columns[construct], entries[construct], observations_by_id)
+            for construct in constructs
+        }
+
+        return (star_chart_4, cls.encode_dates(star_chart_4_dates))
+
+    @staticmethod
+    def get_level_key(level):
+        """
+        Returns key of level's merged column in star chart v4 daily counts.
+        """
+        return 'level-{}'.format(level.id)
 
     @classmethod
     def create_student_timeline(cls, observations, students, constructs, start_date):
-        star_chart = {}
+        """
+        Returns tuple with dict where key is a construct and value is `CellMatrix`
+        with students as rows and sublevels as columns, and dict with daily
+        observation counts since `start_date` per construct, student and
+        sublevel ids encoded with `encode_daily_counts`.
+        """
+        students = list(students)
+        columns = {}
+        column_index = {}
+        entries = {}
         star_chart_dates = {}
 
         for construct in constructs:
-            star_chart[construct] = {}
+            columns[construct] = [sublevel for level in construct.levels.all() for sublevel in level.sublevels.all()]
+            column_index[construct] = {sublevel.id: index for index, sublevel in enumerate(columns[construct])}
+            entries[construct] = []
             star_chart_dates[construct.id] = {}
 
             for student in students:
-                star_chart[construct][student] = {}
                 star_chart_dates[construct.id][student.id] = {}
 
-                for level in construct.levels.all():
-                    for sublevel in level.sublevels.all():
-                        star_chart[construct][student][sublevel] = []
-                        star_chart_dates[construct.id][student.id][sublevel.id] = []
+                for sublevel in columns[construct]:
+                    star_chart_dates[construct.id][student.id][sublevel.id] = []
+
+        row_index = {student.id: row for row, student in enumerate(students)}
+        observations_by_id = {observation.id: observation for observation in observations}
+        days = cls.get_day_indexes(
+            (observation.observation_date for observation in observations_by_id.values()), start_date)
+
+        # Walk observation -> student links once instead of scanning all
+        # observations for every student.
+        for observation in observations_by_id.values():
+            rows = [
+                (row_index[student.id], student.id)
+                for student in observation.students.all()
+                if student.id in row_index
+            ]
 
-        for student in students:
-            for observation in observations:
-                if student not in observation.students.all():
-                    continue
+            if not rows:
+                continue
 
-                sublevels = observation.constructs.all()
+            day = days[observation.observation_date]
+            counted = observation.observation_date <= start_date
 
-                for sublevel in sublevels:
-                    construct = sublevel.level.construct
+            for sublevel in observation.constructs.all():
+                construct = sublevel.level.construct
+                column = column_index[construct][sublevel.id]
+                dates = star_chart_dates[construct.id]
 
-                    if observation.observation_date <= start_date:
-                        star_chart[construct][student][sublevel].append(observation)
+                for row, student_id in rows:
+                    if counted:
+                        entries[construct].append((row, column, observation.id))
 
-                    star_chart_dates[construct.id][student.id][sublevel.id].append(
-                        datetime.datetime \
-                            .combine(observation.observation_date, datetime.datetime.min.time()) \
-                            .timestamp())
+                    dates[student_id][sublevel.id].append(day)
 
-        return (star_chart, star_chart_dates)
+        star_chart = {
+            construct: CellMatrix.build(students, columns[construct], entries[construct], observations_by_id)
+            for construct in constructs
+        }
 
-    @classmethod
-    def get_min_date_from_observation(cls, observations):
-        min_date = observations.aggregate(models.Min('observation_date'))['observation_date__min']
+        return (star_chart, cls.encode_dates(star_chart_dates))
+
+    @staticmethod
+    def get_day_indexes(dates, start_date):
+        """
+        Returns dict where key is a date and value is number of days since
+        `start_date`, computed once for every distinct date.
+        """
+        return {date: (date - start_date).days for date in set(dates)}
 
-        if min_date:
-            min_date -= datetime.timedelta(days=1)
+    @staticmethod
+    def encode_dates(dates):
+        """
+        Replaces lists of day indexes in `{construct_id: {row_id: {sublevel_id: [days]}}}`
+        dict with their `encode_daily_counts` encoding. Returns the dict.
+        """
+        for construct_dates in dates.values():
+            for row_dates in construct_dates.values():
+                for sublevel_id, days in row_dates.items():
+                    row_dates[sublevel_id] = encode_daily_counts(days)
 
-        return min_date
+        return dates
 
     @classmethod
-    def get_max_date_from_observations(cls, observations):
-        max_date = observations.aggregate(models.Max('observation_date'))['observation_date__max']
+    def summarize(cls, observations):
+        """
+        Returns dict with `min_date` and `max_date` of observations widened by
+        a day for the timeline slider, and `observations_count` with the number
+        of observation's constructs, in one pass over already fetched
+        `observations` with prefetched constructs.
+        """
+        min_date = None
+        max_date = None
+        observations_count = 0
+
+        for observation in observations:
+            if min_date is None or observation.observation_date < min_date:
+                min_date = observation.observation_date
 
-        if max_date:
-            max_date += datetime.timedelta(days=1)
+            if max_date is None or observation.observation_date > max_date:
+                max_date = observation.observation_date
 
-        return max_date
+            observations_count += len(observation.constructs.all())
+
+        return {
+            'min_date': min_date - datetime.timedelta(days=1) if min_date else None,
+            'max_date': max_date + datetime.timedelta(days=1) if max_date else None,
+            'observations_count': observations_count,
+        }
 
     def __str__(self):
         _display = self.name or 'Observation at {}'.format(self.created)
         return _display
 
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            # reports of courses limited to a date range
+            models.Index(fields=['course', 'observation_date'], name='observation_course_date_idx'),
+            # the latest draft of a user, drafts are a small part of all observations
+            models.Index(fields=['owner', '-id'], name='observation_owner_draft_idx', condition=models.Q(is_draft=True)),
+            # recent observations of a user
+            models.Index(fields=['owner', '-created'], name='observation_owner_created_idx'),
+            # containment and overlap lookups on choices offered by the setup
+            GinIndex(fields=['construct_choices'], name='observation_constructs_gin'),
+            GinIndex(fields=['tag_choices'], name='observation_tags_gin'),
+        ]
+
+
+class ObservationFact(models.Model):
+    """
+    Denormalized row for every observed student and sublevel of an observation
+    with the observation's attributes used by reports, so reports read a single
+    table instead of joining observations with their students, constructs and tags.
+
+    Observations without constructs have one row per student with `sublevel`
+    and `construct` set to `None`. Observations without students don't have any rows.
+
+    Rows are derived from the source tables with `derive` and replaced with
+    `refresh` by signal handlers whenever an observation, its students,
+    constructs or tags change. Code changing the source tables without sending
+    signals, like `bulk_create`, has to call `refresh` itself. Rows of deleted
+    observations and students are deleted by cascade. `rebuild_observation_facts`
+    command rebuilds or verifies the whole table.
+    """
+    observation = models.ForeignKey('kidviz.Observation', on_delete=models.CASCADE, related_name='facts')
+    student = models.ForeignKey('kidviz.Student', on_delete=models.CASCADE, related_name='+')
+    sublevel = models.ForeignKey(
+        'kidviz.LearningConstructSublevel', null=True, on_delete=models.CASCADE, related_name='+')
+    construct = models.ForeignKey('kidviz.LearningConstruct', null=True, on_delete=models.CASCADE, related_name='+')
+    course = models.ForeignKey('kidviz.Course', null=True, on_delete=models.CASCADE, related_name='+')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    observation_date = models.DateField()
+    is_imported = models.BooleanField()
+    is_draft = models.BooleanField()
+    is_formative_assessment = models.BooleanField()
+
+    # Order of fields in tuples returned by `derive_rows`.
+    FIELDS = (
+        'observation_id', 'student_id', 'sublevel_id', 'construct_id', 'course_id', 'owner_id',
+        'observation_date', 'is_imported', 'is_draft', 'is_formative_assessment',
+    )
+    BATCH_SIZE = 5000
+
+    @classmethod
+    def derive_rows(cls, observations=None):
+        """
+        Returns queryset of tuples with values of `FIELDS` derived from the source
+        tables for observations with ids in `observations`, for all observations
+        when it's `None`. Students through table is joined with constructs
+        through table with left outer join so observations without constructs are kept.
+        """
+        links = Observation.students.through.objects.all()
+
+        if observations is not None:
+            links = links.filter(observation__in=observations)
+
+        return links.annotate(
+            is_formative_assessment=models.Exists(
+                Observation.tags.through.objects.filter(
+                    observation_id=models.OuterRef('observation_id'),
+                    contexttag__text=Observation.FORMATIVE_ASSESSMENT_TAG,
+                )
+            ),
+        ).values_list(
+            'observation_id',
+            'student_id',
+            'observation__constructs',
+            'observation__constructs__level__construct_id',
+            'observation__course_id',
+            'observation__owner_id',
+            'observation__observation_date',
+            'observation__is_imported',
+            'observation__is_draft',
+            'is_formative_assessment',
+        )
+
+    @classmethod
+    def create_from_rows(cls, rows):
+        """
+        Inserts facts for `rows` iterable of `FIELDS` tuples in batches.
+        Returns number of inserted facts.
+        """
+        count = 0
+        batch = []
+
+        for row in rows:
+            batch.append(cls(**dict(zip(cls.FIELDS, row))))
+
+            if len(batch) == cls.BATCH_SIZE:
+                cls.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+
+        cls.objects.bulk_create(batch)
+
+        return count + len(batch)
+
+    @classmethod
+    @transaction.atomic
+    def refresh(cls, observations):
+        """
+        Replaces facts of observations with ids in `observations` with ones
+        derived from the source tables.
+        """
+        observations = list(observations)
+
+        if not observations:
+            return
+
+        cls.objects.filter(observation__in=observations).delete()
+        cls.create_from_rows(cls.derive_rows(observations))
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls):
+        """
+        Replaces all facts with ones derived from the source tables. Returns number of facts.
+        """
+        cls.objects.all().delete()
+
+        return cls.create_from_rows(cls.derive_rows().iterator())
+
+    @classmethod
+    def verify(cls):
+        """
+        Compares facts with ones derived from the source tables. Returns tuple
+        with sets of ids of observations which have missing facts and which
+        have facts that shouldn't exist.
+        """
+        expected = Counter(cls.derive_rows().iterator())
+        stored = Counter(cls.objects.values_list(*cls.FIELDS).iterator())
+
+        missing = {row[0] for row in expected - stored}
+        stale = {row[0] for row in stored - expected}
+
+        return missing, stale
+
 
 class LearningConstruct(TimeStampedModel):
     """
@@ -434,11 +844,17 @@ class LearningConstruct(TimeStampedModel):
 
     NO_CONSTRUCT = 'NO_CONSTRUCT'
 
+    # Sublevels loaded by the taxonomy snapshot, see `kidviz.taxonomy.Taxonomy`.
+    _sublevels = None
+
     def __str__(self):
         return '{} ({})'.format(self.name, self.abbreviation)
 
     @property
     def sublevels(self):
+        if self._sublevels is not None:
+            return self._sublevels
+
         return LearningConstructSublevel.objects.filter(
             level__construct_id=self.id
         )
@@ -492,6 +908,28 @@ class LearningConstructSublevel(TimeStampedModel):
         "10": "#000000" # == 100%
     }
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_duplication_mappings():
+        """
+        Returns `LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS` setting parsed
+        to a dict where key is source sublevel name and value is target sublevel name.
+        """
+        return json.loads(settings.LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS or '{}') or {}
+
+    @classmethod
+    def get_duplication_targets(cls):
+        """
+        Returns dict where key is source sublevel's `id` and value is list of `id`s
+        of sublevels its observations are duplicated to.
+
+        Names from the mappings are resolved with the taxonomy snapshot, so only
+        when sublevels are added, changed (e.g. renamed) or removed.
+        """
+        from kidviz.taxonomy import Taxonomy
+
+        return Taxonomy.get().duplication_targets
+
     def short_name(self):
         try:
             return '{}'.format(self.name.split()[1])
@@ -514,7 +952,8 @@ class LearningConstructSublevel(TimeStampedModel):
         else:
             return self.COLORS["TEN_AND_MORE"]
 
-    def get_color_dark(self, observation_count, all_observations):
+    @classmethod
+    def get_color_dark(cls, observation_count, all_observations):
         """
         Calculates new color for merged level. To get new color for level
         new percent value is calculated. When `observation_count` is 0 color for 0% is used.
@@ -525,17 +964,17 @@ class LearningConstructSublevel(TimeStampedModel):
         is 73% the first digit is 7 and `7` key is used to get value from `COLORS_DARK` dict.
         """
         if not observation_count:
-            return self.COLORS_DARK['0']
+            return cls.COLORS_DARK['0']
 
         if observation_count == all_observations:
-            return self.COLORS_DARK['10']
+            return cls.COLORS_DARK['10']
 
         percent_usage = 100 * observation_count / all_observations
 
         if percent_usage < 10:
-            return self.COLORS_DARK["LESS_THEN_10"]
+            return cls.COLORS_DARK["LESS_THEN_10"]
         else:
-            return self.COLORS_DARK[str(percent_usage)[:1]]
+            return cls.COLORS_DARK[str(percent_usage)[:1]]
 
     def __str__(self):
         return '{}'.format(self.name)
@@ -599,3 +1038,245 @@ class Setup(models.Model):
     grouping = models.ForeignKey(StudentGrouping, on_delete=models.SET_NULL, null=True, blank=True)
     context_tags = models.ManyToManyField(ContextTag, blank=True)
     constructs = models.ManyToManyField(LearningConstructSublevel, blank=True)
+
+
+class StagedImport(models.Model):
+    """
+    Rows of an uploaded class roster waiting for the user to confirm the
+    import. Only the `token` is kept in the session, so large files don't
+    make every request of the session rewrite its row.
+
+    Rows are stored in `StagedImportChunk` rows as compressed JSON. Staged
+    imports expire after `EXPIRES_AFTER`, expired ones are deleted whenever a
+    new file is staged.
+    """
+    token = models.UUIDField(default=uuid4, unique=True, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    row_count = models.PositiveIntegerField(default=0)
+
+    EXPIRES_AFTER = datetime.timedelta(hours=2)
+    CHUNK_SIZE = 1000
+
+    @classmethod
+    def active(cls):
+        return cls.objects.filter(created__gte=timezone.now() - cls.EXPIRES_AFTER)
+
+    @classmethod
+    @transaction.atomic
+    def stage(cls, owner, rows):
+        """
+        Stores rows, list of dicts, and returns the new staged import.
+        """
+        cls.objects.filter(created__lt=timezone.now() - cls.EXPIRES_AFTER).delete()
+
+        staged_import = cls.objects.create(owner=owner, row_count=len(rows))
+        StagedImportChunk.objects.bulk_create(
+            StagedImportChunk(
+                staged_import=staged_import,
+                index=index,
+                data=zlib.compress(json.dumps(rows[start:start + cls.CHUNK_SIZE], cls=DjangoJSONEncoder).encode()),
+            )
+            for index, start in enumerate(range(0, len(rows), cls.CHUNK_SIZE))
+        )
+
+        return staged_import
+
+    @property
+    def rows(self):
+        return StagedImportRows(self)
+
+
+class StagedImportChunk(models.Model):
+    staged_import = models.ForeignKey(StagedImport, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        unique_together = ('staged_import', 'index')
+
+
+class StagedImportRows(object):
+    """
+    Rows of a staged import which can be iterated repeatedly, every iteration
+    reads and decompresses one chunk at a time.
+    """
+
+    def __init__(self, staged_import):
+        self.staged_import = staged_import
+
+    def __len__(self):
+        return self.staged_import.row_count
+
+    def __iter__(self):
+        chunks = self.staged_import.chunks.order_by('index').values_list('data', flat=True)
+
+        for data in chunks.iterator(chunk_size=1):
+            yield from json.loads(zlib.decompress(data).decode())
+
+
+class Job(models.Model):
+    """
+    Task run in the background by the `run_job_worker` command instead of a web
+    request, so long imports and merges don't hit the request timeout.
+
+    The worker claims pending jobs in the order they were submitted, runs the
+    handler of their `kind` registered in `kidviz.jobs` and records the result
+    in `status` and `message`. Handlers report `progress` out of `total`, which
+    pages poll through the `job_status` view.
+
+    A claimed job is leased to its `worker` until `lease_expires`. Workers
+    renew leases of their jobs while they run them, so a running job whose
+    lease expired was left behind by a worker which was killed.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'pending'),
+        (RUNNING, 'running'),
+        (SUCCEEDED, 'succeeded'),
+        (FAILED, 'failed'),
+    )
+
+    ROSTER_IMPORT = 'roster_import'
+    ADVANCE_GRADE = 'advance_grade'
+    MERGE_STUDENTS = 'merge_students'
+    KINDS = (
+        (ROSTER_IMPORT, 'class roster import'),
+        (ADVANCE_GRADE, 'advance grade'),
+        (MERGE_STUDENTS, 'merge students'),
+    )
+
+    kind = models.CharField(max_length=30, choices=KINDS)
+    status = models.CharField(max_length=30, choices=STATUSES, default=PENDING)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    arguments = JSONField(default=dict)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+    worker = models.CharField(max_length=255, blank=True, default='')
+    lease_expires = models.DateTimeField(null=True, blank=True)
+
+    # Workers renew leases of their running jobs every `LEASE_RENEW_INTERVAL`.
+    LEASE_DURATION = datetime.timedelta(minutes=2)
+    LEASE_RENEW_INTERVAL = datetime.timedelta(seconds=30)
+
+    class Meta:
+        indexes = [
+            # Workers poll for pending jobs, which are a small part of the table.
+            models.Index(fields=['id'], name='kidviz_job_pending_idx', condition=models.Q(status='pending')),
+            # Workers look for running jobs with expired leases regularly.
+            models.Index(fields=['lease_expires'], name='kidviz_job_running_idx', condition=models.Q(status='running')),
+        ]
+
+    def __str__(self):
+        return '{} #{}'.format(self.get_kind_display(), self.pk)
+
+    @classmethod
+    def submit(cls, kind, owner, **arguments):
+        """
+        Queues job of the `kind`, `arguments` are passed to its handler and
+        must be serializable to JSON.
+        """
+        return cls.objects.create(kind=kind, owner=owner, arguments=arguments)
+
+    @classmethod
+    def claim(cls, worker):
+        """
+        Marks the oldest pending job as running, leased to the `worker`, and
+        returns it, or `None` when there isn't any. Rows locked by other
+        workers are skipped, so several workers never claim the same job.
+        """
+        with transaction.atomic():
+            job = cls.objects.select_for_update(skip_locked=True) \
+                .filter(status=cls.PENDING) \
+                .order_by('id') \
+                .first()
+
+            if job:
+                job.status = cls.RUNNING
+                job.started = timezone.now()
+                job.worker = worker
+                job.lease_expires = job.started + cls.LEASE_DURATION
+                job.save(update_fields=['status', 'started', 'worker', 'lease_expires', 'updated'])
+
+        return job
+
+    @classmethod
+    def renew_leases(cls, worker):
+        """
+        Extends leases of running jobs of the `worker` and returns their number.
+        The separate connection doesn't wait for the transaction of the handler.
+        """
+        return cls.objects.using(settings.JOB_DATABASE_ALIAS) \
+            .filter(status=cls.RUNNING, worker=worker) \
+            .update(lease_expires=timezone.now() + cls.LEASE_DURATION)
+
+    @classmethod
+    def fail_expired(cls):
+        """
+        Fails running jobs whose lease expired, their workers were killed in
+        the middle of them, and returns their number. They aren't run again,
+        because their handlers may have committed part of their changes.
+        """
+        return cls.objects.filter(status=cls.RUNNING, lease_expires__lt=timezone.now()).update(
+            status=cls.FAILED,
+            message='The job was interrupted, please submit it again.',
+            finished=timezone.now(),
+        )
+
+    def report_progress(self, progress, total=None):
+        """
+        Saves progress through a separate connection, so it's visible while the
+        transaction of the handler is still open. Renews the lease of the job.
+        """
+        self.progress = progress
+        if total is not None:
+            self.total = total
+
+        now = timezone.now()
+        self.lease_expires = now + self.LEASE_DURATION
+        Job.objects.using(settings.JOB_DATABASE_ALIAS) \
+            .filter(pk=self.pk) \
+            .update(progress=self.progress, total=self.total, lease_expires=self.lease_expires, updated=now)
+
+    def finish(self, status, message=''):
+        """
+        Records the result while the job is still leased to its worker and
+        returns whether it was recorded. A job whose lease expired meanwhile
+        was failed by `fail_expired` already, and is left failed.
+        """
+        now = timezone.now()
+        recorded = Job.objects \
+            .filter(pk=self.pk, status=self.RUNNING, worker=self.worker) \
+            .update(status=status, message=message, finished=now, updated=now)
+
+        if recorded:
+            self.status = status
+            self.message = message
+            self.finished = now
+        else:
+            self.refresh_from_db(fields=['status', 'message', 'finished', 'updated'])
+
+        return bool(recorded)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def to_json(self):
+        return {
+            'id': self.pk,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'message': self.message,
+            'finished': self.is_finished,
+        }
@@ -0,0 +1,195 @@
+"""
+PostgreSQL backend sharing a bounded pool of connections between the threads
+(greenlets with gevent workers) of a process.
+
+Django keeps one connection per thread. With gevent every request runs in its
+own greenlet, so persistent connections would be opened for every concurrent
+request and never reused. This backend is used with `CONN_MAX_AGE` of 0,
+connections closed at the end of a request are returned to the pool instead,
+and at most `POOL['SIZE']` connections are opened by a process. Requests
+above the limit wait for a free connection.
+
+`connections.close_all()` also closes idle connections of the pools, so they
+don't keep the database in use, e.g. when the test database is destroyed.
+"""
+import logging
+import threading
+import time
+
+from django.db import connections
+from django.db.backends.postgresql import base, creation
+from django.db.utils import ConnectionHandler, OperationalError
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool(object):
+    """
+    Bounded pool of idle psycopg2 connections.
+    """
+
+    def __init__(self, size, timeout, max_age):
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        # Both are patched by gevent, waiting for them yields to other greenlets.
+        self.semaphore = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        # Idle connections, the most recently used last.
+        self.idle = []
+        # Times when connections of the pool were opened.
+        self.opened = {}
+
+    def acquire(self, connect):
+        """
+        Returns an idle connection or a new one created by `connect` while
+        there are less than `size` connections in use.
+        """
+        if not self.semaphore.acquire(timeout=self.timeout):
+            raise OperationalError(
+                'No database connection was released within {} seconds, all {} connections of the pool '
+                'are in use.'.format(self.timeout, self.size))
+
+        try:
+            while True:
+                with self.lock:
+                    if not self.idle:
+                        break
+                    connection = self.idle.pop()
+
+                if self.is_obsolete(connection):
+                    self.discard(connection)
+                    continue
+
+                return connection
+
+            connection = connect()
+
+            with self.lock:
+                self.opened[connection] = time.monotonic()
+
+            return connection
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+    def release(self, connection):
+        """
+        Returns connection to the pool, it's closed when it's broken or too old.
+        """
+        try:
+            if self.is_obsolete(connection) or \
+                    connection.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+                self.discard(connection)
+                return
+
+            if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+
+            with self.lock:
+                self.idle.append(connection)
+        except Exception:
+            logger.warning('Database connection could not be returned to the pool.', exc_info=True)
+            self.discard(connection)
+        finally:
+            self.semaphore.release()
+
+    def drain(self):
+        """
+        Closes idle connections, connections in use are returned to the pool
+        when they are released.
+        """
+        with self.lock:
+            idle, self.idle = self.idle, []
+
+        for connection in idle:
+            self.discard(connection)
+
+    def is_obsolete(self, connection):
+        return connection.closed or time.monotonic() - self.opened.get(connection, 0) > self.max_age
+
+    def discard(self, connection):
+        with self.lock:
+            self.opened.pop(connection, None)
+
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    """
+    Returns the pool of database, created for every process on first use.
+    """
+    with pools_lock:
+        if alias not in pools:
+            options = settings_dict.get('POOL', {})
+            pools[alias] = ConnectionPool(
+                size=options.get('SIZE', 10),
+                timeout=options.get('TIMEOUT', 30),
+                max_age=options.get('MAX_AGE', 600),
+            )
+
+        return pools[alias]
+
+
+def drain_pools():
+    with pools_lock:
+        all_pools = list(pools.values())
+
+    for pool in all_pools:
+        pool.drain()
+
+
+def patch_close_all():
+    """
+    Wraps `ConnectionHandler.close_all` to drain the pools after connections
+    of the thread were returned to them.
+    """
+    if getattr(ConnectionHandler.close_all, 'drains_pools', False):
+        return
+
+    close_all = ConnectionHandler.close_all
+
+    def close_all_and_drain_pools(self):
+        close_all(self)
+        drain_pools()
+
+    close_all_and_drain_pools.drains_pools = True
+    ConnectionHandler.close_all = close_all_and_drain_pools
+
+
+patch_close_all()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections to the test database would prevent dropping it.
+        connections.close_all()
+        super(DatabaseCreation, self)._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.acquire(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # Set by the parent only for newly opened connections, reused ones keep their session's level.
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
@@ -0,0 +1,209 @@
+from kidviz.matrix import CellMatrix
+from kidviz.models import LearningConstructSublevel, ObservationFact
+
+
+class StarMatrixReport(object):
+    """
+    Builds the star chart matrices used by `ObservationAdminView` from a flat
+    list of observation links instead of walking every observation's related
+    students and constructs.
+
+    Each link is a `(student_id, sublevel_id, course_id, observation_id, is_imported)`
+    tuple read from `ObservationFact` table. Observations without constructs
+    produce links with `sublevel_id` set to `None`.
+
+    Observations are duplicated from one construct sublevel to another according
+    to `LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS` while the matrices are
+    filled: every link of a mapped sublevel is also added to the target sublevel.
+    Duplicates are added after all links so they don't chain.
+    """
+    STUDENT, SUBLEVEL, COURSE, OBSERVATION, IS_IMPORTED = range(5)
+
+    def __init__(self, observations):
+        self.observations = {observation.id: observation for observation in observations}
+        self.links = self.fetch_links(observations)
+        self.duplication_targets = LearningConstructSublevel.get_duplication_targets()
+
+    @classmethod
+    def fetch_links(cls, observations):
+        """
+        Returns links for all observations in `observations` queryset.
+        """
+        return list(
+            ObservationFact.objects
+            .filter(observation__in=observations.values('pk'))
+            .order_by('observation_id', 'student_id')
+            .values_list('student_id', 'sublevel_id', 'course_id', 'observation_id', 'is_imported')
+        )
+
+    @staticmethod
+    def get_columns(construct):
+        """
+        Returns list of construct's sublevels in the order they are displayed in charts.
+        """
+        return [sublevel for level in construct.levels.all() for sublevel in level.sublevels.all()]
+
+    @classmethod
+    def get_sublevels_by_id(cls, constructs):
+        """
+        Creates and returns dict where key is sublevel's `id` and value is
+        a tuple with `LearningConstruct` instance and sublevel's column index.
+        """
+        sublevels = {}
+
+        for construct in constructs:
+            for index, sublevel in enumerate(cls.get_columns(construct)):
+                sublevels[sublevel.id] = (construct, index)
+
+        return sublevels
+
+    def star_matrix(self, constructs, students):
+        """
+        Returns dict where key is a construct and value is `CellMatrix` with
+        students as rows and construct's sublevels as columns.
+        """
+        students = list(students)
+        student_index = {student.id: index for index, student in enumerate(students)}
+        sublevels = self.get_sublevels_by_id(constructs)
+        entries = {construct: [] for construct in constructs}
+
+        for link in self.links:
+            row = student_index.get(link[self.STUDENT])
+            construct_column = sublevels.get(link[self.SUBLEVEL])
+
+            if row is None or construct_column is None:
+                continue
+
+            construct, column = construct_column
+            entries[construct].append((row, column, link[self.OBSERVATION]))
+
+        return {
+            construct: CellMatrix.build(students, self.get_columns(construct), entries[construct], self.observations)
+            for construct in constructs
+        }
+
+    def dot_matrix(self, all_constructs, constructs, courses, students):
+        """
+        Returns dict where key is a construct and value is `CellMatrix` with
+        courses as rows and construct's sublevels as columns. Matrices are
+        created for all constructs but filled only with observations for
+        `constructs` and their duplicates. Observation is added once for every
+        observed student in `students`.
+        """
+        courses = list(courses)
+        course_index = {course.id: index for index, course in enumerate(courses)}
+        students = {student.id for student in students}
+        sublevels = self.get_sublevels_by_id(constructs)
+        all_sublevels = self.get_sublevels_by_id(all_constructs)
+        entries = {construct: [] for construct in all_constructs}
+        duplicates = []
+
+        for link in self.links:
+            row = course_index.get(link[self.COURSE])
+            construct_column = sublevels.get(link[self.SUBLEVEL])
+
+            if link[self.STUDENT] not in students or row is None or construct_column is None:
+                continue
+
+            construct, column = construct_column
+            entries[construct].append((row, column, link[self.OBSERVATION]))
+
+            for target in self.duplication_targets.get(link[self.SUBLEVEL], []):
+                if target in all_sublevels:
+                    duplicates.append((all_sublevels[target], row, link[self.OBSERVATION]))
+
+        for (construct, column), row, observation_id in duplicates:
+            entries[construct].append((row, column, observation_id))
+
+        return {
+            construct: CellMatrix.build(courses, self.get_columns(construct), entries[construct], self.observations)
+            for construct in all_constructs
+        }
+
+    def star_matrix_by_class(self, constructs, courses, students):
+        """
+        Returns dict where key is a construct and value is a dict with course
+        as a key and `CellMatrix` with course's students as rows and construct's
+        sublevels as columns. Only observations of students from `students` are added.
+
+        Duplicated observations are added to the student's row of the target
+        sublevel in every course where the student has a row.
+        """
+        students = {student.id: student for student in students}
+        courses = {course.id: course for course in courses}
+        sublevels = self.get_sublevels_by_id(constructs)
+        rows = {}
+        row_index = {}
+        entries = {}
+        duplicates = {}
+
+        for construct in constructs:
+            for course in courses.values():
+                rows[construct, course] = list(course.students.all())
+                row_index[construct, course] = {
+                    student.id: index for index, student in enumerate(rows[construct, course])
+                }
+                entries[construct, course] = []
+
+        for link in self.links:
+            student = students.get(link[self.STUDENT])
+            course = courses.get(link[self.COURSE])
+            construct_column = sublevels.get(link[self.SUBLEVEL])
+
+            if student is None or course is None or construct_column is None:
+                continue
+
+            construct, column = construct_column
+            key = (construct, course)
+            row = row_index[key].get(student.id)
+
+            # If course's rows do not contain the student add it. This can happen
+            # when user changed student's course and observation stayed with old one.
+            if row is None:
+                row = row_index[key][student.id] = len(rows[key])
+                rows[key].append(student)
+
+            entries[key].append((row, column, link[self.OBSERVATION]))
+
+            for target in self.duplication_targets.get(link[self.SUBLEVEL], []):
+                if target in sublevels:
+                    duplicates.setdefault((student.id, target), []).append(link[self.OBSERVATION])
+
+        for (student_id, target), observation_ids in duplicates.items():
+            construct, column = sublevels[target]
+
+            for course in courses.values():
+                row = row_index[construct, course].get(student_id)
+
+                if row is not None:
+                    entries[construct, course].extend((row, column, observation_id) for observation_id in observation_ids)
+
+        star_matrix_by_class = {}
+
+        for construct in constructs:
+            columns = self.get_columns(construct)
+            star_matrix_by_class[construct] = {
+                course: CellMatrix.build(
+                    rows[construct, course], columns, entries[construct, course], self.observations)
+                for course in courses.values()
+            }
+
+        return star_matrix_by_class
+
+    def observation_without_construct(self, students):
+        """
+        Returns dict where key is a student and value is a list of observations
+        of the student without any construct.
+        """
+        observation_without_construct = {student: [] for student in students}
+        students = {student.id: student for student in students}
+
+        for link in self.links:
+            student = students.get(link[self.STUDENT])
+
+            if student is None or link[self.SUBLEVEL] is not None:
+                continue
+
+            observation_without_construct[student].append(self.observations[link[self.OBSERVATION]])
+
+        return observation_without_construct
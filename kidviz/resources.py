@@ -1,5 +1,12 @@
+import csv
+import tempfile
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
 from import_export.formats import base_formats
+from openpyxl import Workbook
 from tablib import Dataset
 
 from kidviz.models import Course, Student
@@ -13,6 +20,10 @@ FILE_FORMAT_MAP = {
 ACCEPTED_FILE_EXTENSIONS = FILE_FORMAT_MAP.keys()
 ACCEPTED_FILE_FORMATS = FILE_FORMAT_MAP.values()
 
+# Numbers of roster rows which created a new student, matched an existing one or
+# were skipped because they have no student or repeat one already in the course.
+ImportCounts = namedtuple('ImportCounts', ['inserted', 'matched', 'skipped'])
+
 
 def do_data_clean(table):
     def clean_string(cell):
@@ -38,6 +49,11 @@ class ClassRoster(object):
         'Student Nickname',
     )
 
+    # Maximum number of values in one `IN` lookup.
+    BATCH_SIZE = 2000
+    # Rows fetched from the server-side cursor at once by exports.
+    EXPORT_CHUNK_SIZE = 2000
+
     def __init__(self, user):
         self.owner = user
 
@@ -47,24 +63,30 @@ class ClassRoster(object):
         return dataset
 
     def preview_rows(self, dataset):
+        """
+        Fills missing course and student IDs of rows from existing courses and
+        active students, matched by case-insensitive names. Matches are looked
+        up for the whole file at once, so the preview takes time proportional
+        to the size of the file.
+        """
         imported_data = do_data_clean(dataset.dict)
         try:
+            # todo: should owner be part of filter?  should owner be a file column?
+            courses = self.get_courses_by_name([row for row in imported_data if not row.get('Course ID')])
+            students = self.get_students_by_name([row for row in imported_data if not row.get('Student ID')])
+
             for row in imported_data:
                 if not row.get('Course ID'):
-                    # todo: should owner be part of filter?  should owner be a file column?
-                    course = Course.objects.filter(name__iexact=row.get('Course Name'),
-                                                   grade_level=row.get('Grade Level', 0)).order_by('-created').first()
+                    course = courses.get(self.get_course_key(row))
                     if course:
                         row['Course ID'] = course.id
                     else:
                         row['Course ID'] = 'NEW'
 
                 if not row.get('Student ID'):
-                    student = Student.objects.filter(last_name__iexact=row['Student Last Name'],
-                                                     first_name__iexact=row['Student First Name'],
-                                                     status=Student.ACTIVE).first()
-                    if student:
-                        row['Student ID'] = student.student_id
+                    matches = students.get(self.get_name_key(row['Student Last Name'], row['Student First Name']))
+                    if matches:
+                        row['Student ID'] = matches[0].student_id
                     else:
                         raise AttributeError('Student ID is required for new students')
 
@@ -75,87 +97,332 @@ class ClassRoster(object):
         except KeyError as err:
             raise KeyError('The file is missing a required column. {}'.format(err))
 
-    def process_rows(self, dataset):
-        imported_data = dataset.dict
-        course_name = ''
-        course = None
-        students = []
+    @transaction.atomic
+    def process_rows(self, rows, progress=None):
+        """
+        Imports rows confirmed in the preview, creates missing courses and
+        students and sets students of every course in the file.
 
-        for row in imported_data:
-            if not course_name or course_name != row['Course Name']:
-                if students and course:
-                    course.students.set(students)
-                    course.save()
-                students = []
-                course_name = row['Course Name']
-                if row['Course ID'] == 'NEW':
-                    course, created = Course.objects.get_or_create(name=row['Course Name'],
-                                                                   grade_level=int(row.get('Grade Level', 0)),
-                                                                   defaults={'owner': self.owner})
-                else:
-                    course, created = Course.objects.get(id=int(row['Course ID'])), False
+        Consecutive rows with the same course name belong to the course of the
+        first of them. A student is matched by student ID, or by case-insensitive
+        name when the row has none, among active students and students created
+        by earlier rows, unmatched students are created. All rows are resolved
+        from a few queries, so large district rosters import within a request.
+
+        `rows` are iterated several times and never held in memory at once, so
+        they can be read from a `StagedImport` chunk by chunk.
+
+        `progress` is called with the number of courses written so far and the
+        number of all courses.
+
+        Returns dict with `ImportCounts` of every imported course.
+        """
+        first_rows = []
+
+        for run, row in self.iter_course_runs(rows):
+            if run == len(first_rows):
+                first_rows.append(row)
 
-            row['Course ID'] = course.id
+        courses = self.get_import_courses(first_rows)
+        by_student_id, by_name = self.get_import_students(rows)
+
+        course_students = OrderedDict()
+        counts = OrderedDict()
+        new_students = []
+
+        for run, row in self.iter_course_runs(rows):
+            course = courses[run]
+            students = course_students.setdefault(course, OrderedDict())
+            course_counts = counts.setdefault(course, Counter())
 
             student_id = row['Student ID']
-            try:
-                if student_id:
-                    student = Student.objects.get(
-                        student_id=student_id,
-                        status=Student.ACTIVE
-                    )
-                else:
-                    student = Student.objects.get(
-                        last_name__iexact=row['Student Last Name'],
-                        first_name__iexact=row['Student First Name'],
-                        status=Student.ACTIVE
-                    )
-            except Student.DoesNotExist:
-                student = Student.objects.create(
+
+            if not student_id and not row['Student Last Name'] and not row['Student First Name']:
+                # Exported courses without students have rows without a student.
+                course_counts['skipped'] += 1
+                continue
+
+            if student_id:
+                matches = by_student_id[str(student_id)]
+            else:
+                matches = by_name[self.get_name_key(row['Student Last Name'], row['Student First Name'])]
+
+            if len(matches) > 1:
+                raise Student.MultipleObjectsReturned(
+                    'More than one active student matches {} {}.'.format(
+                        row['Student First Name'], row['Student Last Name']))
+
+            if matches:
+                student = matches[0]
+                course_counts['matched'] += 1
+            else:
+                student = Student(
                     last_name=row['Student Last Name'],
                     first_name=row['Student First Name'],
                     grade_level=int(row.get('Grade Level', 0)),
-                    student_id=row['Student ID'],
-                    nickname=row['Student Nickname']
+                    student_id=student_id or None,
+                    nickname=row['Student Nickname'] or '',
                 )
+                new_students.append(student)
+                course_counts['inserted'] += 1
+
+                if student_id:
+                    by_student_id[str(student_id)].append(student)
+                by_name[self.get_name_key(student.last_name, student.first_name)].append(student)
+
+            if id(student) in students:
+                # Student is listed in the course more than once.
+                course_counts['matched' if matches else 'inserted'] -= 1
+                course_counts['skipped'] += 1
+
+            students[id(student)] = student
+
+        self.create_students(new_students)
+
+        for index, (course, students) in enumerate(course_students.items()):
+            if students:
+                course.students.set([student.pk for student in students.values()])
+
+            if progress:
+                progress(index + 1, len(course_students))
+
+        # Touch only the timestamp, saving whole courses would overwrite data
+        # versions just incremented by the roster change.
+        Course.objects.filter(pk__in=[course.pk for course, students in course_students.items() if students]) \
+            .update(modified=timezone.now())
+
+        return OrderedDict(
+            (course, ImportCounts(c['inserted'], c['matched'], c['skipped'])) for course, c in counts.items())
+
+    def create_students(self, students):
+        """
+        Inserts new students with one query and sets their primary keys.
+
+        `bulk_create` sets primary keys only on PostgreSQL, elsewhere they are
+        looked up by student IDs. Students without a student ID can't be found
+        again, so they are saved one by one. The preview requires student IDs
+        of new students, so there are rarely any.
+        """
+        with_ids = [student for student in students if student.student_id]
+        Student.objects.bulk_create(with_ids)
+
+        for student in students:
+            if not student.student_id:
+                student.save()
+
+        missing = [student for student in with_ids if student.pk is None]
+
+        if missing:
+            pks = {}
+
+            for chunk in self.chunks(sorted({str(student.student_id) for student in missing})):
+                pks.update(Student.objects.filter(student_id__in=chunk).values_list('student_id', 'pk'))
+
+            for student in missing:
+                student.pk = pks[str(student.student_id)]
+
+    @staticmethod
+    def iter_course_runs(rows):
+        """
+        Yields rows with index of their run of consecutive rows with the same course name.
+        """
+        run = -1
+        course_name = ''
+
+        for row in rows:
+            if not course_name or course_name != row['Course Name']:
+                course_name = row['Course Name']
+                run += 1
+
+            yield run, row
+
+    def get_import_courses(self, rows):
+        """
+        Returns courses of given rows, creating new courses which don't exist yet.
+        """
+        course_ids = {int(row['Course ID']) for row in rows if row['Course ID'] != 'NEW'}
+        existing = Course.objects.in_bulk(course_ids)
+        missing = course_ids - set(existing)
 
-            row['Student ID'] = student.student_id
-            students.append(student.id)
+        if missing:
+            raise Course.DoesNotExist('Courses {} do not exist.'.format(', '.join(map(str, sorted(missing)))))
 
-        if students and course:
-            course.students.set(students)
-            course.save()
+        new_keys = [(row['Course Name'], int(row.get('Grade Level', 0))) for row in rows if row['Course ID'] == 'NEW']
+        by_key = defaultdict(list)
+
+        for course in Course.objects.filter(name__in={name for name, grade_level in new_keys}):
+            by_key[(course.name, course.grade_level)].append(course)
+
+        courses = []
+
+        for row in rows:
+            if row['Course ID'] != 'NEW':
+                courses.append(existing[int(row['Course ID'])])
+                continue
+
+            key = (row['Course Name'], int(row.get('Grade Level', 0)))
+
+            if len(by_key[key]) > 1:
+                raise Course.MultipleObjectsReturned('More than one course {} exists.'.format(row['Course Name']))
+
+            if not by_key[key]:
+                by_key[key].append(Course.objects.create(name=key[0], grade_level=key[1], owner=self.owner))
+
+            courses.append(by_key[key][0])
+
+        return courses
+
+    def get_import_students(self, rows):
+        """
+        Returns active students which can match rows indexed by student ID and by name key.
+        """
+        student_ids = {str(row['Student ID']) for row in rows if row['Student ID']}
+        by_student_id = defaultdict(list)
+
+        # The same student can be found by both lookups, it must be one instance.
+        students = {}
+
+        for chunk in self.chunks(sorted(student_ids)):
+            for student in Student.objects.filter(status=Student.ACTIVE, student_id__in=chunk):
+                by_student_id[student.student_id].append(students.setdefault(student.pk, student))
+
+        by_name = self.get_students_by_name((row for row in rows if not row['Student ID']), students)
+
+        return by_student_id, by_name
+
+    def get_students_by_name(self, rows, students=None):
+        """
+        Returns lists of active students with names of given rows in the default
+        order of students, indexed by name key. Lookups use `lower()` index of
+        student names.
+        """
+        students = {} if students is None else students
+        last_names = {self.get_name_key(row['Student Last Name'], '')[0] for row in rows}
+        by_name = defaultdict(list)
+
+        name_students = Student.objects.filter(status=Student.ACTIVE) \
+            .annotate(last_name_key=Lower('last_name'), first_name_key=Lower('first_name'))
+
+        for chunk in self.chunks(sorted(last_names)):
+            for student in name_students.filter(last_name_key__in=chunk):
+                key = (student.last_name_key, student.first_name_key)
+                by_name[key].append(students.setdefault(student.pk, student))
+
+        return by_name
+
+    def get_courses_by_name(self, rows):
+        """
+        Returns the newest course with name and grade level of every row
+        indexed by course key. Lookups use `lower()` index of course names.
+        """
+        names = {self.get_course_key(row)[0] for row in rows}
+        by_name = {}
+
+        courses = Course.objects.annotate(name_key=Lower('name')).order_by('created', 'pk')
+
+        for chunk in self.chunks(sorted(names)):
+            for course in courses.filter(name_key__in=chunk):
+                by_name[(course.name_key, course.grade_level)] = course
+
+        return by_name
+
+    @staticmethod
+    def get_course_key(row):
+        grade_level = row.get('Grade Level', 0)
+        return str(row.get('Course Name') or '').lower(), None if grade_level is None else int(grade_level)
+
+    @staticmethod
+    def get_name_key(last_name, first_name):
+        return str(last_name or '').lower(), str(first_name or '').lower()
+
+    @classmethod
+    def chunks(cls, values):
+        for start in range(0, len(values), cls.BATCH_SIZE):
+            yield values[start:start + cls.BATCH_SIZE]
+
+    def iter_rows(self, queryset):
+        """
+        Yields roster rows of courses in `queryset`, courses without students
+        have one row without a student.
+
+        Rows are read from one server-side cursor over courses joined with
+        their students, so memory doesn't grow with the size of the roster.
+        """
+        ordering = queryset.query.order_by or Course._meta.ordering
+        rows = queryset.values_list(
+            # field order matters and must match COLUMN_ORDER constant
+            'id', 'name', 'grade_level',
+            'students__student_id', 'students__last_name', 'students__first_name', 'students__nickname',
+        ).order_by(*ordering, 'id', 'students__last_name', 'students__first_name', 'students__id')
+
+        for row in rows.iterator(chunk_size=self.EXPORT_CHUNK_SIZE):
+            yield ['' if value is None else value for value in row]
 
     def build_rows(self, queryset):
         dataset = self.empty_dataset()
-        for course in queryset:
-            course_id = course.id
-            course_name = course.name
-            grade_level = course.grade_level
-            students = course.students.all()
-            if students:
-                for student in students:
-                    # field order matters and must match COLUMN_ORDER constant
-                    row = [course_id, course_name, grade_level,
-                           student.id, student.last_name, student.first_name, student.nickname]
-                    dataset.append(row)
-            else:
-                # field order matters and must match COLUMN_ORDER constant
-                # this will output a course that has no students
-                row = [course_id, course_name, grade_level,
-                       '', '', '', '', ]
-                dataset.append(row)
+
+        for row in self.iter_rows(queryset):
+            dataset.append(row)
 
         return dataset
 
+    def iter_csv(self, queryset):
+        """
+        Yields lines of CSV file with the roster.
+        """
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.COLUMN_ORDER)
+
+        for row in self.iter_rows(queryset):
+            yield writer.writerow(row)
+
+    def write_xlsx(self, queryset, file):
+        """
+        Writes workbook with the roster to `file`. Write-only worksheets keep
+        their rows in temporary files instead of memory.
+        """
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(title='Class Roster')
+        worksheet.append(self.COLUMN_ORDER)
+
+        for row in self.iter_rows(queryset):
+            worksheet.append(row)
+
+        workbook.save(file)
+
     @classmethod
     def export(cls, user, queryset, fmt='csv'):
-        from django.http import HttpResponse
-
-        dataset = cls(user=user).build_rows(queryset)
-        dataset.title = 'Class Roster'
-        file_name = 'KidViz Class Roster {}'.format(timezone.now().strftime('%Y%m%d'))
-        exported_data = dataset.export(format=fmt)
-        response = HttpResponse(exported_data)
-        response['Content-Disposition'] = 'attachment; filename={}.{}'.format(file_name, fmt)
+        from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+        roster = cls(user=user)
+        file_name = 'KidViz Class Roster {}.{}'.format(timezone.now().strftime('%Y%m%d'), fmt)
+
+        # Streamed rows are read after the view returned, when the database it
+        # chose for reading (the replica in `replica_view`) isn't active anymore.
+        queryset = queryset.using(queryset.db)
+
+        if fmt == 'csv':
+            response = StreamingHttpResponse(roster.iter_csv(queryset), content_type='text/csv')
+        elif fmt == 'xlsx':
+            file = tempfile.TemporaryFile()
+            roster.write_xlsx(queryset, file)
+            file.seek(0)
+            # File is closed, and so deleted, when the response is closed.
+            return FileResponse(file, as_attachment=True, filename=file_name)
+        else:
+            dataset = roster.build_rows(queryset)
+            dataset.title = 'Class Roster'
+            response = HttpResponse(dataset.export(format=fmt))
+
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(file_name)
         return response
+
+
+class Echo(object):
+    """
+    File-like object returning what is written to it, lets `csv.writer` produce
+    lines for streaming responses.
+    """
+
+    def write(self, value):
+        return value
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter(object):
+    """
+    Routes reads of read-only views to the replica database.
+
+    Only code running inside `ReplicaRouter.use_replica` reads from the replica,
+    which is entered by views decorated with `replica_view`. Everything else,
+    and all writes, use the primary. Once a write happens, the rest of the
+    request reads from the primary as well, so it sees its own writes.
+
+    The state is kept per thread (per greenlet with gevent workers).
+    """
+    local = threading.local()
+
+    # Unavailable replica isn't connected to again for this many seconds.
+    RETRY_SECONDS = 30
+    unavailable_until = 0
+
+    # Sessions are written by every request, a lagging replica would return stale ones.
+    PRIMARY_APPS = {'sessions'}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in self.PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+
+        if getattr(self.local, 'alias', None) and not getattr(self.local, 'wrote', False):
+            return self.local.alias
+
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        self.local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replica holds the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Other aliases connect to the primary or to its replica.
+        return db not in (settings.REPLICA_DATABASE_ALIAS, settings.JOB_DATABASE_ALIAS)
+
+    @classmethod
+    def reset(cls):
+        """
+        Clears the write marker, called at the start of every request.
+        """
+        cls.local.wrote = False
+
+    @classmethod
+    def has_written(cls):
+        return getattr(cls.local, 'wrote', False)
+
+    @classmethod
+    def get_replica_alias(cls):
+        """
+        Returns alias of the replica database or `None` when it isn't
+        configured or can't be connected to.
+        """
+        alias = settings.REPLICA_DATABASE_ALIAS
+
+        if alias not in settings.DATABASES or time.monotonic() < cls.unavailable_until:
+            return None
+
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            logger.warning('Replica database %s is not available, reading from the primary.', alias, exc_info=True)
+            cls.unavailable_until = time.monotonic() + cls.RETRY_SECONDS
+            return None
+
+        return alias
+
+    @classmethod
+    @contextmanager
+    def use_replica(cls):
+        previous = getattr(cls.local, 'alias', None)
+        cls.local.alias = cls.get_replica_alias()
+
+        try:
+            yield
+        finally:
+            cls.local.alias = previous
+
+
+def is_sticky(request):
+    """
+    Returns `True` when the user wrote to the database recently and must
+    read from the primary to see their writes.
+    """
+    return settings.REPLICA_STICKY_COOKIE in request.COOKIES
+
+
+def replica_view(view):
+    """
+    Decorator of read-only views, their queries go to the replica unless the
+    user is sticky to the primary. Template responses are rendered inside
+    the view so queries of lazy querysets in templates use the replica too.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if is_sticky(request):
+            return view(request, *args, **kwargs)
+
+        with ReplicaRouter.use_replica():
+            response = view(request, *args, **kwargs)
+
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+
+        return response
+
+    return wrapper
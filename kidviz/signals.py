@@ -0,0 +1,160 @@
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from kidviz.models import (
+    ContextTag, Course, LearningConstructLevel, LearningConstructSublevel, Observation, ObservationFact, Student,
+)
+
+# Name of the `Observation` field for each of its many to many through tables.
+OBSERVATION_M2M_FIELDS = {
+    Observation.students.through: 'students',
+    Observation.constructs.through: 'constructs',
+    Observation.tags.through: 'tags',
+}
+
+
+def observations_filters(observations):
+    """
+    Returns filters matching courses of `observations` and all courses of
+    their students.
+    """
+    return Q(observation__in=observations), Q(students__observation__in=observations)
+
+
+@receiver(pre_save, sender=Observation)
+@receiver(pre_delete, sender=Observation)
+def observation_pre_change(sender, instance, **kwargs):
+    # Course or students may change, stale reports are the ones for the
+    # state stored in the database.
+    if instance.pk:
+        Course.bump_data_version(*observations_filters([instance.pk]))
+
+
+@receiver(post_save, sender=Observation)
+def observation_saved(sender, instance, **kwargs):
+    Course.bump_data_version(Q(pk=instance.course_id), *observations_filters([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Observation.students.through)
+@receiver(m2m_changed, sender=Observation.constructs.through)
+@receiver(m2m_changed, sender=Observation.tags.through)
+def observation_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    field = OBSERVATION_M2M_FIELDS[sender]
+
+    if not reverse:
+        observations = [instance.pk]
+    elif pk_set is not None:
+        observations = list(pk_set)
+    else:
+        observations = list(Observation.objects.filter(**{field: instance}).values_list('pk', flat=True))
+
+    filters = list(observations_filters(observations))
+
+    # Removed students are no longer linked to the observation.
+    if field == 'students':
+        if reverse:
+            filters.append(Q(students=instance.pk))
+        elif pk_set:
+            filters.append(Q(students__in=pk_set))
+
+    Course.bump_data_version(*filters)
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def course_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        Course.bump_data_version(Q(pk=instance.pk))
+    elif pk_set is not None:
+        Course.bump_data_version(Q(pk__in=pk_set))
+    else:
+        Course.bump_data_version(Q(students=instance.pk))
+
+
+@receiver(post_save, sender=Student)
+@receiver(pre_delete, sender=Student)
+def student_changed(sender, instance, **kwargs):
+    Course.bump_data_version(Q(students=instance.pk))
+
+
+@receiver(post_save, sender=ContextTag)
+def tag_changed(sender, instance, **kwargs):
+    Course.bump_data_version(Q(observation__tags=instance.pk))
+
+
+# Facts of deleted observations and students are deleted by cascade, other
+# changes of the source tables refresh facts of affected observations.
+
+@receiver(post_save, sender=Observation)
+def observation_facts_saved(sender, instance, **kwargs):
+    ObservationFact.refresh([instance.pk])
+
+
+@receiver(m2m_changed, sender=Observation.students.through)
+@receiver(m2m_changed, sender=Observation.constructs.through)
+@receiver(m2m_changed, sender=Observation.tags.through)
+def observation_facts_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        observations = [instance.pk]
+    elif action == 'pre_clear':
+        # Cleared observations are not linked to the instance after the clear.
+        field = OBSERVATION_M2M_FIELDS[sender]
+        instance._cleared_observations = list(
+            Observation.objects.filter(**{field: instance}).values_list('pk', flat=True))
+        return
+    elif action == 'post_clear':
+        observations = instance.__dict__.pop('_cleared_observations', [])
+    else:
+        observations = pk_set
+
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        ObservationFact.refresh(observations)
+
+
+# Name of the `Observation` field linking it to tags and sublevels, whose
+# changes change facts of linked observations.
+FACT_SOURCE_FIELDS = {
+    ContextTag: 'tags',
+    LearningConstructSublevel: 'constructs',
+    LearningConstructLevel: 'constructs__level',
+}
+
+
+def linked_observations(sender, instance):
+    observations = Observation.objects.filter(**{FACT_SOURCE_FIELDS[sender]: instance.pk}).distinct()
+    return list(observations.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=ContextTag)
+@receiver(post_save, sender=LearningConstructSublevel)
+@receiver(post_save, sender=LearningConstructLevel)
+def fact_source_saved(sender, instance, created, **kwargs):
+    # Text of a tag decides whether its observations are formative assessments,
+    # a sublevel or level may be moved to another level or construct.
+    if not created:
+        ObservationFact.refresh(linked_observations(sender, instance))
+
+
+@receiver(pre_delete, sender=ContextTag)
+@receiver(pre_delete, sender=LearningConstructSublevel)
+def fact_source_pre_delete(sender, instance, **kwargs):
+    instance._linked_observations = linked_observations(sender, instance)
+
+    # Links are deleted by cascade without m2m signals, so reports filtered or
+    # labelled by the tag or sublevel are marked stale here.
+    if instance._linked_observations:
+        Course.bump_data_version(*observations_filters(instance._linked_observations))
+
+
+@receiver(post_delete, sender=ContextTag)
+@receiver(post_delete, sender=LearningConstructSublevel)
+def fact_source_deleted(sender, instance, **kwargs):
+    # Links were deleted by cascade without m2m signals, observations may have
+    # lost the formative assessment tag or their only construct.
+    ObservationFact.refresh(instance.__dict__.pop('_linked_observations', []))
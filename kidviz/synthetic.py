@@ -0,0 +1,283 @@
+import datetime
+import random
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from kidviz.models import (
+    ContextTag, Course, LearningConstruct, LearningConstructLevel, LearningConstructSublevel, Observation,
+    ObservationFact, Student, StudentGroup, StudentGrouping,
+)
+from users.models import User
+
+FIRST_NAMES = (
+    'Amelia', 'Ava', 'Benjamin', 'Charlotte', 'Daniel', 'Elijah', 'Emma', 'Ethan', 'Harper', 'Henry',
+    'Isabella', 'Jack', 'James', 'Liam', 'Lucas', 'Mason', 'Mia', 'Noah', 'Olivia', 'Sophia',
+)
+LAST_NAMES = (
+    'Anderson', 'Brown', 'Davis', 'Garcia', 'Harris', 'Jackson', 'Johnson', 'Jones', 'Lee', 'Lopez',
+    'Martin', 'Martinez', 'Miller', 'Moore', 'Smith', 'Taylor', 'Thomas', 'Thompson', 'White', 'Wilson',
+)
+TAG_TEXTS = (
+    'Whole class', 'Small group', 'Independent work', 'Partner work', 'Centers', 'Warm up', 'Exit ticket',
+    'Number talk', 'Manipulatives', 'Word problem', 'Drawing', 'Discussion',
+)
+# Shape of the taxonomy used when the database doesn't have one yet.
+CONSTRUCTS = (
+    ('Theory of Measurement - Length', 'ToML', 6),
+    ('Theory of Measurement - Area', 'ToMA', 5),
+    ('Theory of Measurement - Volume', 'ToMV', 6),
+    ('Reasoning about Number - Quantity', 'RNQ', 6),
+    ('Reasoning about Number - Operations', 'RNO', 6),
+)
+SUBLEVELS_PER_LEVEL = 'ABCD'
+
+EMAIL_DOMAIN = 'synthetic.kidviz.local'
+
+
+class SyntheticDataGenerator(object):
+    """
+    Generates reproducible synthetic data for measuring report performance.
+
+    The same `seed` and sizes always generate the same data. Objects are
+    created with `bulk_create` and fetched back by their synthetic names, so
+    generating a district-sized dataset takes a few queries per table.
+    Existing learning construct taxonomy is used when there is one.
+    """
+
+    def __init__(self, teachers=10, courses=40, students=1000, observations=20000, seed=0, days=300):
+        self.teachers = teachers
+        self.courses = courses
+        self.students = students
+        self.observations = observations
+        self.days = days
+        self.random = random.Random(seed)
+        self.prefix = 'synthetic-{}'.format(seed)
+
+    @transaction.atomic
+    def generate(self):
+        teachers = self.create_teachers()
+        courses = self.create_courses(teachers)
+        students = self.create_students(courses)
+        groupings = self.create_groupings(courses)
+        tags = self.create_tags(teachers)
+        sublevels = self.get_or_create_taxonomy()
+        observations = self.create_observations(courses, groupings, tags, sublevels)
+
+        return {
+            'teachers': len(teachers),
+            'courses': len(courses),
+            'students': len(students),
+            'groupings': sum(len(course_groupings) for course_groupings in groupings.values()),
+            'tags': len(tags),
+            'sublevels': len(sublevels),
+            'observations': observations,
+        }
+
+    def create_teachers(self):
+        User.objects.bulk_create(
+            User(
+                email='{}-teacher-{}@{}'.format(self.prefix, index, EMAIL_DOMAIN),
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                is_active=True,
+                is_pending=False,
+            )
+            for index in range(self.teachers)
+        )
+
+        return list(User.objects.filter(email__startswith='{}-teacher-'.format(self.prefix)).order_by('id'))
+
+    def create_courses(self, teachers):
+        Course.objects.bulk_create(
+            Course(
+                name='{} course {}'.format(self.prefix, index),
+                owner=teachers[index % len(teachers)],
+                grade_level=self.random.randint(0, 5),
+            )
+            for index in range(self.courses)
+        )
+
+        return list(Course.objects.filter(name__startswith='{} course '.format(self.prefix)).order_by('id'))
+
+    def create_students(self, courses):
+        Student.objects.bulk_create(
+            Student(
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                student_id='{}-{}'.format(self.prefix, index),
+                grade_level=self.random.randint(0, 5),
+                consented_to_research=self.random.random() < 0.8,
+            )
+            for index in range(self.students)
+        )
+        students = list(Student.objects.filter(student_id__startswith='{}-'.format(self.prefix)).order_by('id'))
+
+        # Every student is in one class, some of them also in another one.
+        links = []
+        self.rosters = {course.id: [] for course in courses}
+
+        for index, student in enumerate(students):
+            student_courses = {courses[index % len(courses)]}
+
+            if self.random.random() < 0.1:
+                student_courses.add(self.random.choice(courses))
+
+            for course in student_courses:
+                links.append(Course.students.through(course_id=course.id, student_id=student.id))
+                self.rosters[course.id].append(student)
+
+        Course.students.through.objects.bulk_create(links)
+
+        return students
+
+    def create_groupings(self, courses):
+        """
+        Creates pairs and groups of four for every course. Returns dict where
+        key is course `id` and value is list of `(grouping, [groups students])`.
+        """
+        groupings = {}
+
+        for course in courses:
+            groupings[course.id] = []
+
+            for name, size in (('Pairs', 2), ('Groups of four', 4)):
+                roster = list(self.rosters[course.id])
+                self.random.shuffle(roster)
+                grouping = StudentGrouping.objects.create(name=name, course=course)
+                groups = [roster[index:index + size] for index in range(0, len(roster), size)]
+                StudentGroup.objects.bulk_create(
+                    StudentGroup(name='{} {}'.format(name, index), course=course) for index in range(len(groups)))
+                student_groups = list(StudentGroup.objects.filter(course=course, name__startswith=name).order_by('id'))
+
+                StudentGroup.students.through.objects.bulk_create(
+                    StudentGroup.students.through(studentgroup_id=group.id, student_id=student.id)
+                    for group, group_students in zip(student_groups, groups)
+                    for student in group_students
+                )
+                grouping.groups.set(student_groups)
+                groupings[course.id].append((grouping, groups))
+
+        return groupings
+
+    def create_tags(self, teachers):
+        ContextTag.objects.bulk_create(
+            [ContextTag(text='{} {}'.format(self.prefix, text)) for text in TAG_TEXTS[:4]] +
+            [
+                ContextTag(
+                    text='{} {}'.format(self.prefix, text),
+                    owner=teacher,
+                    curricular_focus=self.random.random() < 0.1,
+                )
+                for teacher in teachers
+                for text in self.random.sample(TAG_TEXTS[4:], 6)
+            ]
+        )
+
+        return list(ContextTag.objects.filter(text__startswith=self.prefix).order_by('id'))
+
+    def get_or_create_taxonomy(self):
+        """
+        Returns list of all sublevels, creating constructs, levels and sublevels
+        when there aren't any.
+        """
+        if not LearningConstructSublevel.objects.exists():
+            for name, abbreviation, levels in CONSTRUCTS:
+                construct = LearningConstruct.objects.create(name=name, abbreviation=abbreviation)
+
+                for level in range(1, levels + 1):
+                    construct_level = LearningConstructLevel.objects.create(
+                        construct=construct, level=level, description='Level {}'.format(level))
+                    LearningConstructSublevel.objects.bulk_create(
+                        LearningConstructSublevel(
+                            level=construct_level,
+                            name='{} {}{}'.format(abbreviation, level, letter),
+                            description='',
+                        )
+                        for letter in SUBLEVELS_PER_LEVEL[:self.random.randint(2, len(SUBLEVELS_PER_LEVEL))]
+                    )
+
+        return list(LearningConstructSublevel.objects.select_related('level').order_by('id'))
+
+    def create_observations(self, courses, groupings, tags, sublevels):
+        """
+        Creates observations with realistic distributions: most observe one
+        student or a group, have one sublevel (lower levels are observed more
+        often) and up to three tags of the course owner.
+        """
+        sublevel_weights = [1 / sublevel.level.level for sublevel in sublevels]
+        tags_by_owner = {}
+
+        for tag in tags:
+            tags_by_owner.setdefault(tag.owner_id, []).append(tag)
+
+        today = timezone.now().date()
+        course_weights = [len(self.rosters[course.id]) or 1 for course in courses]
+        plans = []
+
+        for index in range(self.observations):
+            course = self.random.choices(courses, course_weights)[0]
+            roster = self.rosters[course.id]
+            grouping = None
+            kind = self.random.random()
+
+            if not roster:
+                students = []
+            elif kind < 0.6:
+                students = [self.random.choice(roster)]
+            elif kind < 0.9:
+                grouping, groups = self.random.choice(groupings[course.id])
+                students = self.random.choice(groups)
+            else:
+                students = self.random.sample(roster, min(len(roster), self.random.randint(5, 25)))
+
+            kind = self.random.random()
+            constructs = [] if kind < 0.05 else set(self.random.choices(
+                sublevels, sublevel_weights, k=1 if kind < 0.75 else self.random.randint(2, 3)))
+            course_tags = tags_by_owner.get(course.owner_id, []) + tags_by_owner.get(None, [])
+            observation_tags = self.random.sample(course_tags, min(len(course_tags), self.random.randint(0, 3)))
+
+            observation = Observation(
+                name='{} observation {}'.format(self.prefix, index),
+                owner_id=course.owner_id,
+                course=course,
+                grouping=grouping,
+                no_constructs=not constructs,
+                construct_choices=sorted(sublevel.id for sublevel in constructs),
+                tag_choices=sorted(tag.id for tag in observation_tags),
+                notes='Synthetic observation',
+                observation_date=today - datetime.timedelta(days=self.random.randrange(self.days)),
+                is_imported=self.random.random() < 0.1,
+            )
+            plans.append((observation, students, constructs, observation_tags))
+
+        Observation.objects.bulk_create((plan[0] for plan in plans))
+        observation_ids = Observation.objects.filter(name__startswith='{} observation '.format(self.prefix)) \
+            .order_by('id').values_list('id', flat=True)
+
+        student_links = []
+        construct_links = []
+        tag_links = []
+
+        for observation_id, (_, students, constructs, observation_tags) in zip(observation_ids, plans):
+            student_links.extend(
+                Observation.students.through(observation_id=observation_id, student_id=student.id)
+                for student in students)
+            construct_links.extend(
+                Observation.constructs.through(observation_id=observation_id, learningconstructsublevel_id=sublevel.id)
+                for sublevel in constructs)
+            tag_links.extend(
+                Observation.tags.through(observation_id=observation_id, contexttag_id=tag.id)
+                for tag in observation_tags)
+
+        Observation.students.through.objects.bulk_create(student_links)
+        Observation.constructs.through.objects.bulk_create(construct_links)
+        Observation.tags.through.objects.bulk_create(tag_links)
+
+        # Bulk inserts don't send signals, mark cached reports of the courses as stale
+        # and derive facts of the observations.
+        Course.bump_data_version(Q(pk__in=[course.id for course in courses]))
+        ObservationFact.refresh(observation_ids)
+
+        return len(plans)
@@ -0,0 +1,145 @@
+import threading
+
+from django.db.models import Count, Max, prefetch_related_objects
+from threadlocals.threadlocals import get_current_request
+
+from kidviz.models import LearningConstruct, LearningConstructSublevel
+
+
+class Taxonomy(object):
+    """
+    Read-only snapshot of the learning construct taxonomy: constructs, their
+    levels, sublevels and sublevels' examples.
+
+    The taxonomy is small and changes rarely, so one snapshot is shared by all
+    requests of the process. It's rebuilt when `version` changes. The version
+    is made of row counts and the latest modification times of the taxonomy
+    tables, so saving or deleting a construct, level, sublevel or example in
+    any process invalidates the snapshot. The version is checked once per
+    request.
+
+    Constructs are ordered with ToML first. Related managers of the snapshot's
+    objects are prefetched, so `construct.levels.all`, `level.sublevels.all`,
+    `construct.sublevels` and `sublevel.examples.all` don't query the database.
+    Every level has `span` with its number of sublevels and every construct has
+    `span` with the number of all its sublevels, used as table column spans.
+    Objects of the snapshot must not be modified.
+    """
+    FIRST_CONSTRUCT = 'ToML'
+    REQUEST_ATTRIBUTE = '_kidviz_taxonomy'
+
+    _current = None
+    _lock = threading.Lock()
+
+    def __init__(self, version, constructs):
+        self.version = version
+        self.constructs = tuple(
+            sorted(constructs, key=lambda construct: construct.abbreviation != self.FIRST_CONSTRUCT))
+        self.constructs_by_id = {construct.id: construct for construct in self.constructs}
+        self.sublevels_by_id = {}
+
+        for construct in self.constructs:
+            # Ordered by name like `construct.sublevels` fetched from the database.
+            construct._sublevels = tuple(sorted(
+                (sublevel for level in construct.levels.all() for sublevel in level.sublevels.all()),
+                key=lambda sublevel: sublevel.name,
+            ))
+            construct.span = len(construct._sublevels)
+
+            for level in construct.levels.all():
+                level.span = len(level.sublevels.all())
+
+            for sublevel in construct._sublevels:
+                self.sublevels_by_id[sublevel.id] = sublevel
+
+        # Ordered by name like sublevels fetched from the database.
+        self.sublevels = tuple(sorted(self.sublevels_by_id.values(), key=lambda sublevel: sublevel.name))
+        self.duplication_targets = self.compile_duplication_targets()
+
+    @classmethod
+    def get(cls):
+        """
+        Returns current snapshot, rebuilding it when the taxonomy changed.
+        """
+        request = get_current_request()
+        taxonomy = getattr(request, cls.REQUEST_ATTRIBUTE, None)
+
+        if taxonomy is not None:
+            return taxonomy
+
+        version = cls.get_version()
+        taxonomy = cls._current
+
+        if taxonomy is None or taxonomy.version != version:
+            with cls._lock:
+                taxonomy = cls._current
+
+                if taxonomy is None or taxonomy.version != version:
+                    taxonomy = cls._current = cls.build(version)
+
+        if request is not None:
+            setattr(request, cls.REQUEST_ATTRIBUTE, taxonomy)
+
+        return taxonomy
+
+    @staticmethod
+    def get_version():
+        """
+        Returns tuple with counts and the latest modification times of all
+        taxonomy tables. Taxonomy is small, so one query joining all of them is cheap.
+        """
+        version = LearningConstruct.objects.aggregate(
+            constructs=Count('id', distinct=True),
+            constructs_modified=Max('modified'),
+            levels=Count('levels', distinct=True),
+            levels_modified=Max('levels__modified'),
+            sublevels=Count('levels__sublevels', distinct=True),
+            sublevels_modified=Max('levels__sublevels__modified'),
+            examples=Count('levels__sublevels__examples', distinct=True),
+            examples_modified=Max('levels__sublevels__examples__modified'),
+        )
+
+        return tuple(sorted(version.items()))
+
+    @classmethod
+    def build(cls, version):
+        constructs = list(LearningConstruct.objects.all())
+        prefetch_related_objects(constructs, 'levels__sublevels__examples')
+
+        return cls(version, constructs)
+
+    def get_constructs(self, ids):
+        """
+        Returns list of constructs with `ids` in the snapshot order. Unknown ids are skipped.
+        """
+        ids = {int(construct_id) for construct_id in ids}
+
+        return [construct for construct in self.constructs if construct.id in ids]
+
+    def get_sublevels(self, ids):
+        """
+        Returns list of sublevels with `ids` ordered by name. Unknown ids are skipped.
+        """
+        ids = {int(sublevel_id) for sublevel_id in ids or []}
+
+        return [sublevel for sublevel in self.sublevels if sublevel.id in ids]
+
+    def compile_duplication_targets(self):
+        """
+        Returns dict where key is source sublevel's `id` and value is list of `id`s
+        of sublevels its observations are duplicated to.
+        """
+        mappings = LearningConstructSublevel.get_duplication_mappings()
+        ids_by_name = {}
+
+        for sublevel in sorted(self.sublevels_by_id.values(), key=lambda sublevel: sublevel.id):
+            ids_by_name.setdefault(sublevel.name, []).append(sublevel.id)
+
+        targets = {}
+
+        for source, target in mappings.items():
+            if target in ids_by_name:
+                for sublevel_id in ids_by_name.get(source, []):
+                    targets[sublevel_id] = ids_by_name[target]
+
+        return targets
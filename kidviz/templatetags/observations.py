@@ -1,6 +1,7 @@
 from django import template
 
-from ..models import Course
+from ..matrix import MatrixCell
+from ..models import Course, LearningConstructSublevel, Observation
 
 register = template.Library()
 
@@ -12,6 +13,9 @@ def contains(observations, construct):
 
 @register.filter
 def observation_pks(observations):
+    if isinstance(observations, MatrixCell):
+        return list(observations.ids)
+
     return [o.pk for o in observations]
 
 
@@ -32,5 +36,14 @@ def get_color_for_sublevel(obj, observations):
 
 
 @register.simple_tag(takes_context=True)
-def get_color_star_chart_4(context, sublevel, level_observations):
-    return sublevel.get_color_dark(len(level_observations), context['observations_count'])
+def get_color_star_chart_4(context, column, level_observations):
+    # Column is a sublevel or a level with merged sublevels, both use the same colors.
+    return LearningConstructSublevel.get_color_dark(len(level_observations), context['observations_count'])
+
+
+@register.filter
+def star_chart_4_key(column):
+    if isinstance(column, LearningConstructSublevel):
+        return column.id
+
+    return Observation.get_level_key(column)
@@ -0,0 +1,48 @@
+from django.test import TestCase
+
+from kidviz.forms import ConstructModelMultipleChoiceField
+from kidviz.models import LearningConstruct, LearningConstructLevel, LearningConstructSublevel
+from kidviz.taxonomy import Taxonomy
+
+
+class ConstructModelMultipleChoiceFieldTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sublevels = {}
+
+        for abbreviation in ('ToML', 'RNQ'):
+            construct = LearningConstruct.objects.create(name=abbreviation, abbreviation=abbreviation)
+            level = LearningConstructLevel.objects.create(construct=construct, level=1, description='')
+
+            for name in ('{} 1A'.format(abbreviation), '{} 1B'.format(abbreviation)):
+                cls.sublevels[name] = LearningConstructSublevel.objects.create(
+                    level=level, name=name, description='Description')
+
+    def setUp(self):
+        Taxonomy._current = None
+
+    def get_choices(self, queryset):
+        field = ConstructModelMultipleChoiceField(queryset=queryset)
+        return [(group, [label for _, label in choices]) for group, choices in field.choices]
+
+    def test_all_sublevels(self):
+        self.assertEqual(self.get_choices(LearningConstructSublevel.objects.all()), [
+            ('ToML', ['ToML 1A - Description', 'ToML 1B - Description']),
+            ('RNQ', ['RNQ 1A - Description', 'RNQ 1B - Description']),
+        ])
+
+    def test_filtered_queryset(self):
+        queryset = LearningConstructSublevel.objects.filter(name__in=['ToML 1B', 'RNQ 1A', 'RNQ 1B'])
+
+        self.assertEqual(self.get_choices(queryset), [
+            ('ToML', ['ToML 1B - Description']),
+            ('RNQ', ['RNQ 1A - Description', 'RNQ 1B - Description']),
+        ])
+
+    def test_construct_without_choices(self):
+        queryset = LearningConstructSublevel.objects.filter(level__construct__abbreviation='RNQ')
+
+        self.assertEqual(self.get_choices(queryset), [
+            ('RNQ', ['RNQ 1A - Description', 'RNQ 1B - Description']),
+        ])
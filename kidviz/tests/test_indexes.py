@@ -0,0 +1,101 @@
+import datetime
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from kidviz.models import (
+    ContextTag, Course, LearningConstruct, LearningConstructLevel, LearningConstructSublevel, Observation, Student)
+from kidviz.views import get_recent_observations
+from users.models import User
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Indexes of 0041_report_indexes are specific to PostgreSQL.')
+class ReportIndexesTest(TransactionTestCase):
+    """
+    Plans of report and draft queries on a seeded dataset use the indexes of
+    `0041_report_indexes`. The dataset is large enough that the queries select
+    a small part of it, like they do in production.
+
+    Through tables also have single column indexes created by Django, the
+    reverse indexes are chosen because they answer lookups with index only
+    scans. Those need tables vacuumed, which can't run in a transaction.
+    """
+    COURSES = 10
+    OBSERVATIONS_PER_COURSE = 1000
+    START_DATE = datetime.date(2020, 1, 1)
+
+    def setUp(self):
+        self.owner = User.objects.create(email='teacher@example.com')
+        other_owner = User.objects.create(email='colleague@example.com')
+        courses = Course.objects.bulk_create(
+            Course(name='Course {}'.format(number), owner=self.owner) for number in range(self.COURSES))
+        students = Student.objects.bulk_create(
+            Student(first_name='Student', last_name=str(number)) for number in range(200))
+        tags = ContextTag.objects.bulk_create(ContextTag(text='Tag {}'.format(number)) for number in range(20))
+        construct = LearningConstruct.objects.create(name='ToML', abbreviation='ToML')
+        level = LearningConstructLevel.objects.create(construct=construct, level=1, description='')
+        sublevels = LearningConstructSublevel.objects.bulk_create(
+            LearningConstructSublevel(level=level, name='ToML 1{}'.format(letter), description='')
+            for letter in 'ABCDEFGHIJ')
+
+        observations = Observation.objects.bulk_create(
+            Observation(
+                owner=self.owner if number % 2 else other_owner,
+                course=course,
+                observation_date=self.START_DATE + datetime.timedelta(days=number),
+                is_draft=number % 50 == 0,
+            )
+            for course in courses
+            for number in range(self.OBSERVATIONS_PER_COURSE)
+        )
+
+        for field, related_objects in (('students', students), ('constructs', sublevels), ('tags', tags)):
+            through = getattr(Observation, field).through
+            related_field = getattr(Observation, field).field.m2m_reverse_field_name()
+            through.objects.bulk_create(
+                through(**{'observation_id': observation.id, related_field: related_objects[index % len(related_objects)]})
+                for index, observation in enumerate(observations)
+            )
+
+        self.course = courses[0]
+        self.student = students[0]
+        self.sublevel = sublevels[0]
+        self.tag = tags[0]
+
+        with connection.cursor() as cursor:
+            # Observations were created an hour apart, newest last.
+            cursor.execute(
+                'UPDATE kidviz_observation SET created = NOW() - (%s - id) * INTERVAL \'1 hour\'',
+                [observations[-1].id])
+            cursor.execute('VACUUM ANALYZE')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan, plan)
+
+    def test_course_date_range(self):
+        queryset = Observation.objects.filter(
+            course__in=[self.course.id],
+            observation_date__gte=self.START_DATE,
+            observation_date__lte=self.START_DATE + datetime.timedelta(days=30),
+        )
+
+        self.assertUsesIndex(queryset, 'observation_course_date_idx')
+
+    def test_latest_draft(self):
+        queryset = Observation.objects.filter(is_draft=True, owner=self.owner).order_by('-id')[:1]
+
+        self.assertUsesIndex(queryset, 'observation_owner_draft_idx')
+
+    def test_recent_observations(self):
+        self.assertUsesIndex(get_recent_observations(self.owner), 'observation_owner_created_idx')
+
+    def test_reverse_through_tables(self):
+        for field, related_object in (('students', self.student), ('constructs', self.sublevel), ('tags', self.tag)):
+            with self.subTest(field=field):
+                through = getattr(Observation, field).through
+                related_field = getattr(Observation, field).field.m2m_reverse_field_name()
+                queryset = through.objects.filter(**{related_field: related_object}).values('observation_id')
+
+                self.assertUsesIndex(queryset, '{}_reverse_idx'.format(through._meta.db_table))
@@ -0,0 +1,133 @@
+import datetime
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from kidviz.jobs import HANDLERS, run_job
+from kidviz.models import Job
+from users.models import User
+
+
+class JobLeaseTest(TransactionTestCase):
+    """
+    Progress and leases are saved through the jobs connection, so these tests commit.
+    """
+    databases = {'default', 'jobs'}
+
+    def setUp(self):
+        self.owner = User.objects.create(email='teacher@example.com')
+
+    def submit(self, **fields):
+        job = Job.submit(Job.ADVANCE_GRADE, owner=self.owner, student_ids=[])
+        Job.objects.filter(pk=job.pk).update(**fields)
+        return job
+
+    def get_status(self, job):
+        return Job.objects.values_list('status', flat=True).get(pk=job.pk)
+
+    def test_claim(self):
+        job = self.submit()
+
+        claimed = Job.claim('worker-1')
+
+        self.assertEqual(claimed, job)
+        self.assertEqual((claimed.status, claimed.worker), (Job.RUNNING, 'worker-1'))
+        self.assertEqual(claimed.lease_expires, claimed.started + Job.LEASE_DURATION)
+        self.assertIsNone(Job.claim('worker-2'))
+
+    def test_renew_leases(self):
+        expires = timezone.now() + datetime.timedelta(seconds=10)
+        own = self.submit(status=Job.RUNNING, worker='worker-1', lease_expires=expires)
+        other = self.submit(status=Job.RUNNING, worker='worker-2', lease_expires=expires)
+        finished = self.submit(status=Job.SUCCEEDED, worker='worker-1', lease_expires=expires)
+
+        self.assertEqual(Job.renew_leases('worker-1'), 1)
+
+        leases = dict(Job.objects.values_list('id', 'lease_expires'))
+        self.assertGreater(leases[own.pk], expires)
+        self.assertEqual(leases[other.pk], expires)
+        self.assertEqual(leases[finished.pk], expires)
+
+    def test_fail_expired(self):
+        now = timezone.now()
+        expired = self.submit(status=Job.RUNNING, worker='worker-1', lease_expires=now - datetime.timedelta(seconds=1))
+        # Jobs running for long, or by other workers, are kept while their leases are renewed.
+        long = self.submit(status=Job.RUNNING, worker='worker-2', started=now - datetime.timedelta(hours=3),
+                           lease_expires=now + datetime.timedelta(seconds=10))
+        pending = self.submit()
+
+        self.assertEqual(Job.fail_expired(), 1)
+
+        self.assertEqual(self.get_status(expired), Job.FAILED)
+        self.assertEqual(self.get_status(long), Job.RUNNING)
+        self.assertEqual(self.get_status(pending), Job.PENDING)
+
+    def test_report_progress_renews_lease(self):
+        self.submit()
+        job = Job.claim('worker-1')
+        Job.objects.filter(pk=job.pk).update(lease_expires=timezone.now())
+
+        job.report_progress(5, 10)
+
+        job.refresh_from_db()
+        self.assertEqual((job.progress, job.total), (5, 10))
+        self.assertGreater(job.lease_expires, timezone.now() + Job.LEASE_DURATION / 2)
+
+    def test_finish(self):
+        self.submit()
+        job = Job.claim('worker-1')
+
+        self.assertTrue(job.finish(Job.SUCCEEDED, 'Done'))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message), (Job.SUCCEEDED, 'Done'))
+        self.assertIsNotNone(job.finished)
+
+    def test_finish_after_lease_expired(self):
+        self.submit()
+        job = Job.claim('worker-1')
+        Job.objects.filter(pk=job.pk).update(lease_expires=timezone.now() - datetime.timedelta(seconds=1))
+        Job.fail_expired()
+
+        with self.assertLogs('kidviz.jobs', 'WARNING'), \
+                mock.patch.dict(HANDLERS, {Job.ADVANCE_GRADE: lambda job: 'Done'}):
+            run_job(job)
+
+        self.assertEqual(job.status, Job.FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message), (Job.FAILED, 'The job was interrupted, please submit it again.'))
+
+    @mock.patch.dict(HANDLERS, {Job.ADVANCE_GRADE: lambda job: 'Done'})
+    def test_worker(self):
+        expired = self.submit(status=Job.RUNNING, worker='killed', lease_expires=timezone.now())
+        job = self.submit()
+        stdout = StringIO()
+
+        call_command('run_job_worker', '--once', stdout=stdout)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message), (Job.SUCCEEDED, 'Done'))
+        self.assertTrue(job.worker)
+        self.assertEqual(self.get_status(expired), Job.FAILED)
+        self.assertIn('1 interrupted jobs marked as failed.', stdout.getvalue())
+
+    @mock.patch.object(Job, 'LEASE_RENEW_INTERVAL', datetime.timedelta(milliseconds=10))
+    def test_worker_renews_leases_of_running_job(self):
+        leases = []
+
+        def handler(job):
+            # The worker's loop waits for the handler, leases are renewed meanwhile.
+            leases.append(Job.objects.values_list('lease_expires', flat=True).get(pk=job.pk))
+            time.sleep(0.2)
+            leases.append(Job.objects.values_list('lease_expires', flat=True).get(pk=job.pk))
+
+        self.submit()
+
+        with mock.patch.dict(HANDLERS, {Job.ADVANCE_GRADE: handler}):
+            call_command('run_job_worker', '--once', stdout=StringIO())
+
+        self.assertGreater(leases[1], leases[0])
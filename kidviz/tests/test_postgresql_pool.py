@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.db import connections
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from kidviz.postgresql_pool import base
+
+
+class FakeConnection(object):
+    closed = False
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def setUp(self):
+        self.pool = base.ConnectionPool(size=2, timeout=0, max_age=600)
+
+    def test_released_connections_are_reused(self):
+        connection = self.pool.acquire(FakeConnection)
+        self.pool.release(connection)
+
+        self.assertIs(self.pool.acquire(FakeConnection), connection)
+
+    def test_drain(self):
+        idle = self.pool.acquire(FakeConnection)
+        used = self.pool.acquire(FakeConnection)
+        self.pool.release(idle)
+
+        self.pool.drain()
+
+        self.assertTrue(idle.closed)
+        self.assertFalse(used.closed)
+        self.pool.release(used)
+        self.assertIs(self.pool.acquire(FakeConnection), used)
+
+    def test_close_all_drains_pools(self):
+        connection = self.pool.acquire(FakeConnection)
+        self.pool.release(connection)
+
+        with mock.patch.dict(base.pools, {'pooled': self.pool}):
+            connections.close_all()
+
+        self.assertTrue(connection.closed)
@@ -0,0 +1,360 @@
+import datetime
+import json
+
+from django.test import TestCase, override_settings
+
+from kidviz.models import (
+    Course, LearningConstruct, LearningConstructLevel, LearningConstructSublevel, Observation, Student,
+)
+from kidviz.reports import StarMatrixReport
+from kidviz.taxonomy import Taxonomy
+from users.models import User
+
+# Chained mapping, observations of RNQ 1A are duplicated to ToML 2A but not further to RNQ 2A.
+MAPPINGS = {'RNQ 1A': 'ToML 2A', 'ToML 2A': 'RNQ 2A'}
+
+
+def legacy_star_matrices(observations, constructs, all_constructs, all_students, courses):
+    """
+    Star chart matrices built by the nested loops `ObservationAdminView` used
+    before `StarMatrixReport`, including the duplication by mappings.
+    """
+    star_matrix = {}
+    dot_matrix = {}
+    observation_without_construct = {}
+    star_matrix_by_class = {}
+
+    for construct in all_constructs:
+        dot_matrix[construct] = {}
+
+        for course in courses:
+            dot_matrix[construct][course] = {}
+
+            for level in construct.levels.all():
+                for sublevel in level.sublevels.all():
+                    dot_matrix[construct][course][sublevel] = []
+
+    for construct in constructs:
+        star_matrix_by_class[construct] = {}
+
+        for course in courses:
+            star_matrix_by_class[construct][course] = {}
+
+            for student in course.students.all():
+                star_matrix_by_class[construct][course][student] = {}
+
+                for level in construct.levels.all():
+                    for sublevel in level.sublevels.all():
+                        star_matrix_by_class[construct][course][student][sublevel] = []
+
+    for construct in constructs:
+        star_matrix[construct] = {}
+
+        for student in all_students:
+            star_matrix[construct][student] = {}
+            observation_without_construct[student] = []
+
+            for level in construct.levels.all():
+                for sublevel in level.sublevels.all():
+                    star_matrix[construct][student][sublevel] = []
+
+    for observation in observations:
+        students = observation.students.all()
+        sublevels = observation.constructs.all()
+
+        for student in students:
+            if student not in all_students:
+                continue
+
+            if not sublevels:
+                observation_without_construct[student].append(observation)
+
+            for sublevel in sublevels:
+                construct = sublevel.level.construct
+
+                if construct not in constructs:
+                    continue
+
+                star_matrix[construct][student][sublevel].append(observation)
+
+                if observation.course:
+                    dot_matrix[construct][observation.course][sublevel].append(observation)
+
+                    try:
+                        star_matrix_by_class[construct][observation.course][student][sublevel].append(observation)
+                    except KeyError:
+                        star_matrix_by_class[construct][observation.course][student] = {}
+
+                        for level in construct.levels.all():
+                            for sub in level.sublevels.all():
+                                star_matrix_by_class[construct][observation.course][student][sub] = []
+
+                        star_matrix_by_class[construct][observation.course][student][sublevel].append(observation)
+
+    saved = {}
+    for construct, classes in star_matrix_by_class.items():
+        for course, students in classes.items():
+            for student, sublevels in students.items():
+                for sublevel, cell in sublevels.items():
+                    if sublevel.name in MAPPINGS:
+                        saved.setdefault((student, MAPPINGS[sublevel.name]), []).extend(cell)
+
+    for construct, classes in star_matrix_by_class.items():
+        for course, students in classes.items():
+            for student, sublevels in students.items():
+                for sublevel, cell in sublevels.items():
+                    cell.extend(saved.get((student, sublevel.name), []))
+
+    saved = {}
+    for construct, classes in dot_matrix.items():
+        for course, sublevels in classes.items():
+            for sublevel, cell in sublevels.items():
+                if sublevel.name in MAPPINGS:
+                    saved.setdefault((course, MAPPINGS[sublevel.name]), []).extend(cell)
+
+    for construct, classes in dot_matrix.items():
+        for course, sublevels in classes.items():
+            for sublevel, cell in sublevels.items():
+                cell.extend(saved.get((course, sublevel.name), []))
+
+    return star_matrix, dot_matrix, star_matrix_by_class, observation_without_construct
+
+
+def legacy_star_chart_4(observations, constructs, courses, min_date):
+    """
+    Star chart v4 built by the loops of `Observation.create_star_chart_4` before
+    `CellMatrix`, including the duplication by mappings. Dates are kept as dates
+    instead of timestamps, so they compare with day indexes.
+    """
+    star_chart_4 = {}
+    star_chart_4_dates = {}
+
+    for construct in constructs:
+        star_chart_4[construct] = {}
+        star_chart_4_dates[construct.id] = {}
+
+        for course in courses:
+            star_chart_4[construct][course] = {}
+            star_chart_4_dates[construct.id][course.id] = {}
+
+            for level in construct.levels.all():
+                for sublevel in level.sublevels.all():
+                    star_chart_4[construct][course][sublevel] = []
+                    star_chart_4_dates[construct.id][course.id][sublevel.id] = []
+
+    for observation in observations:
+        if observation.course:
+            for sublevel in observation.constructs.all():
+                construct = sublevel.level.construct
+
+                if observation.observation_date <= min_date:
+                    star_chart_4[construct][observation.course][sublevel].append(observation)
+
+                star_chart_4_dates[construct.id][observation.course.id][sublevel.id].append(
+                    observation.observation_date)
+
+    saved = {}
+    saved_dates = {}
+    for construct, classes in star_chart_4.items():
+        for course, sublevels in classes.items():
+            for sublevel, cell in sublevels.items():
+                if sublevel.name in MAPPINGS:
+                    key = (course, MAPPINGS[sublevel.name])
+                    saved.setdefault(key, []).extend(cell)
+                    saved_dates.setdefault(key, []).extend(star_chart_4_dates[construct.id][course.id][sublevel.id])
+
+    for construct, classes in star_chart_4.items():
+        for course, sublevels in classes.items():
+            for sublevel, cell in sublevels.items():
+                if (course, sublevel.name) in saved:
+                    cell.extend(saved[course, sublevel.name])
+                    star_chart_4_dates[construct.id][course.id][sublevel.id].extend(
+                        saved_dates[course, sublevel.name])
+
+    return star_chart_4, star_chart_4_dates
+
+
+def legacy_cells(matrix):
+    """
+    Returns `{(row_id, column_id): sorted observation ids}` of nested dicts of lists.
+    """
+    return {
+        (row.id, column.id): sorted(observation.id for observation in cell)
+        for row, columns in matrix.items()
+        for column, cell in columns.items()
+    }
+
+
+def matrix_cells(matrix):
+    """
+    Returns `{(row_id, column_id): sorted observation ids}` of `CellMatrix`.
+    """
+    return {
+        (row.id, column.id): sorted(cell.ids)
+        for row, columns in matrix.items()
+        for column, cell in columns.items()
+    }
+
+
+def decode_daily_counts(encoded):
+    """
+    Returns sorted day indexes encoded by `encode_daily_counts`.
+    """
+    days = []
+    day = 0
+
+    for delta, count in zip(encoded[::2], encoded[1::2]):
+        day += delta
+        days.extend([day] * count)
+
+    return days
+
+
+@override_settings(LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS=json.dumps(MAPPINGS))
+class StarMatrixReportTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(email='teacher@example.com')
+        sublevels = {}
+
+        for abbreviation in ('ToML', 'RNQ'):
+            construct = LearningConstruct.objects.create(name=abbreviation, abbreviation=abbreviation)
+
+            for number in (1, 2):
+                level = LearningConstructLevel.objects.create(construct=construct, level=number, description='')
+
+                for letter in ('A', 'B'):
+                    name = '{} {}{}'.format(abbreviation, number, letter)
+                    sublevels[name] = LearningConstructSublevel.objects.create(level=level, name=name, description='')
+
+        first, second = cls.courses = [
+            Course.objects.create(name='Course {}'.format(number), owner=owner) for number in (1, 2)]
+        students = [
+            Student.objects.create(first_name='Student', last_name=str(number), student_id=str(number))
+            for number in range(6)
+        ]
+        first.students.set(students[:3])
+        # The last student is in both courses.
+        second.students.set(students[2:5])
+        # Inactive students aren't rows of student matrices.
+        Student.objects.filter(pk=students[4].pk).update(status=Student.INACTIVE)
+
+        day = datetime.date(2020, 1, 1)
+        cls.min_date = day + datetime.timedelta(days=3)
+        links = [
+            (first, students[:2], ['ToML 1A', 'RNQ 1A'], 0),
+            (first, students[1:3], ['ToML 2A'], 1),
+            (first, students[:1], [], 2),
+            (second, students[2:4], ['RNQ 1A', 'RNQ 2B'], 3),
+            (second, students[3:5], ['ToML 1A', 'ToML 2A'], 3),
+            (second, students[2:3], ['ToML 1B'], 5),
+            # Student moved to another course and the observation stayed with the old one.
+            (first, students[3:4], ['RNQ 1A', 'ToML 1B'], 6),
+            (second, [], ['ToML 2B'], 7),
+        ]
+
+        for course, observed, names, days in links:
+            observation = Observation.objects.create(
+                owner=owner, course=course, observation_date=day + datetime.timedelta(days=days),
+                no_constructs=not names)
+            observation.students.set(observed)
+            observation.constructs.set([sublevels[name] for name in names])
+
+    def setUp(self):
+        # Mappings and duplication targets are cached across tests, mappings are overridden here.
+        LearningConstructSublevel.get_duplication_mappings.cache_clear()
+        self.addCleanup(LearningConstructSublevel.get_duplication_mappings.cache_clear)
+        Taxonomy._current = None
+        self.course_ids = [course.id for course in self.courses]
+        self.observations, self.star_chart_4_observations = Observation.get_observations(
+            self.course_ids, None, None, None, [])
+        self.all_constructs = list(Taxonomy.get().constructs)
+        self.students = Student.get_students_by_course(self.course_ids)
+        self.course_list = Course.get_courses(self.course_ids)
+
+    def assert_matrices_equal(self, constructs):
+        report = StarMatrixReport(self.observations)
+        star_matrix, dot_matrix, star_matrix_by_class, observation_without_construct = legacy_star_matrices(
+            self.observations, constructs, self.all_constructs, self.students, self.course_list)
+
+        new_star_matrix = report.star_matrix(constructs, self.students)
+        new_dot_matrix = report.dot_matrix(self.all_constructs, constructs, self.course_list, self.students)
+        new_star_matrix_by_class = report.star_matrix_by_class(constructs, self.course_list, self.students)
+
+        for construct in constructs:
+            self.assertEqual(matrix_cells(new_star_matrix[construct]), legacy_cells(star_matrix[construct]))
+
+            for course in self.course_list:
+                self.assertEqual(
+                    matrix_cells(new_star_matrix_by_class[construct][course]),
+                    legacy_cells(star_matrix_by_class[construct][course]))
+
+        for construct in self.all_constructs:
+            self.assertEqual(matrix_cells(new_dot_matrix[construct]), legacy_cells(dot_matrix[construct]))
+
+        self.assertEqual(
+            {student.id: sorted(o.id for o in cell)
+             for student, cell in report.observation_without_construct(self.students).items()},
+            {student.id: sorted(o.id for o in cell) for student, cell in observation_without_construct.items()})
+
+        return new_star_matrix_by_class
+
+    def test_matrices_of_all_constructs(self):
+        star_matrix_by_class = self.assert_matrices_equal(self.all_constructs)
+
+        # Duplicates are added to the moved student's row too.
+        toml = self.all_constructs[0]
+        moved = Student.objects.get(student_id='3')
+        self.assertIn(moved, star_matrix_by_class[toml][self.courses[0]])
+        self.assertTrue(star_matrix_by_class[toml][self.courses[0]].cell(
+            moved, LearningConstructSublevel.objects.get(name='ToML 2A')))
+
+    def test_matrices_of_selected_construct(self):
+        self.assert_matrices_equal(self.all_constructs[1:])
+
+    def test_star_chart_4(self):
+        observations = list(self.star_chart_4_observations)
+        star_chart_4, dates = Observation.create_star_chart_4(
+            observations, self.all_constructs, self.course_list, self.min_date)
+        legacy_chart, legacy_dates = legacy_star_chart_4(
+            observations, self.all_constructs, self.course_list, self.min_date)
+
+        for construct in self.all_constructs:
+            matrix = star_chart_4[construct]
+            expected = legacy_cells(legacy_chart[construct])
+            expected_days = {
+                (course_id, sublevel_id): sorted((date - self.min_date).days for date in cell)
+                for course_id, sublevels in legacy_dates[construct.id].items()
+                for sublevel_id, cell in sublevels.items()
+            }
+            rows = list(self.course_list) + [Observation.ALL_COURSES]
+
+            def expected_cell(row, sublevels, values):
+                # Merged row and level columns aggregate cells of all courses and sublevels.
+                courses = self.course_list if row == Observation.ALL_COURSES else [row]
+                return sorted(
+                    value for course in courses for sublevel in sublevels for value in values[course.id, sublevel.id])
+
+            self.assertEqual(len(matrix), len(rows))
+
+            for row in rows:
+                row_dates = dates[construct.id][row.id]
+
+                for level in construct.levels.all():
+                    sublevels = list(level.sublevels.all())
+
+                    for sublevel in sublevels:
+                        self.assertEqual(sorted(matrix.cell(row, sublevel).ids), expected_cell(row, [sublevel], expected))
+                        self.assertEqual(
+                            decode_daily_counts(row_dates[sublevel.id]), expected_cell(row, [sublevel], expected_days))
+
+                    self.assertEqual(sorted(matrix.cell(row, level).ids), expected_cell(row, sublevels, expected))
+                    self.assertEqual(
+                        decode_daily_counts(row_dates[Observation.get_level_key(level)]),
+                        expected_cell(row, sublevels, expected_days))
+
+        # The fixture exercises duplicated and merged cells.
+        toml = self.all_constructs[0]
+        self.assertTrue(star_chart_4[toml].cell(
+            Observation.ALL_COURSES, LearningConstructSublevel.objects.get(name='ToML 2A')))
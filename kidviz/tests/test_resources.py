@@ -0,0 +1,121 @@
+from django.test import TestCase
+from tablib import Dataset
+
+from kidviz.models import Course, Student
+from kidviz.resources import ClassRoster, ImportCounts
+from users.models import User
+
+
+def make_row(course_id, course_name, student_id, last_name, first_name, grade_level=3, nickname=''):
+    return dict(zip(ClassRoster.COLUMN_ORDER, (
+        course_id, course_name, grade_level, student_id, last_name, first_name, nickname)))
+
+
+class ClassRosterImportTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(email='teacher@example.com')
+        cls.ann = Student.objects.create(first_name='Ann', last_name='Lee', student_id='S1')
+        cls.bob = Student.objects.create(first_name='Bob', last_name='Ray', student_id='S2')
+        cls.inactive = Student.objects.create(first_name='Dan', last_name='Fox', status=Student.INACTIVE)
+
+    def setUp(self):
+        self.roster = ClassRoster(user=self.owner)
+
+    def get_students(self, course):
+        return set(course.students.values_list('first_name', 'last_name', 'student_id'))
+
+    def test_new_matched_and_skipped_students(self):
+        counts = self.roster.process_rows([
+            make_row('NEW', 'Math', 'S1', 'Other', 'Name'),
+            make_row('NEW', 'Math', '', 'RAY', 'bob'),
+            make_row('NEW', 'Math', 'S3', 'Day', 'Cat', nickname='Kitty'),
+            make_row('NEW', 'Math', '', 'Fox', 'Dan'),
+            make_row('NEW', 'Math', '', 'Fox', 'Eve'),
+            make_row('NEW', 'Math', 'S1', 'Lee', 'Ann'),
+            make_row('NEW', 'Math', '', '', ''),
+        ])
+
+        course = Course.objects.get(name='Math')
+        self.assertEqual(counts, {course: ImportCounts(inserted=3, matched=2, skipped=2)})
+        self.assertEqual((course.grade_level, course.owner), (3, self.owner))
+        # Inactive students aren't matched by name.
+        self.assertEqual(self.get_students(course), {
+            ('Ann', 'Lee', 'S1'), ('Bob', 'Ray', 'S2'), ('Cat', 'Day', 'S3'),
+            ('Dan', 'Fox', None), ('Eve', 'Fox', None),
+        })
+        self.assertEqual(Student.objects.get(student_id='S3').nickname, 'Kitty')
+        self.assertEqual(Student.objects.filter(first_name='Dan', last_name='Fox').count(), 2)
+
+    def test_students_created_by_earlier_rows(self):
+        counts = self.roster.process_rows([
+            make_row('NEW', 'Math', 'S3', 'Day', 'Cat'),
+            make_row('NEW', 'Science', 'S3', 'Day', 'Cat'),
+            make_row('NEW', 'Science', '', 'Day', 'Cat'),
+        ])
+
+        math, science = Course.objects.get(name='Math'), Course.objects.get(name='Science')
+        self.assertEqual(counts, {
+            math: ImportCounts(inserted=1, matched=0, skipped=0),
+            science: ImportCounts(inserted=0, matched=1, skipped=1),
+        })
+        self.assertEqual(self.get_students(math), {('Cat', 'Day', 'S3')})
+        self.assertEqual(self.get_students(science), {('Cat', 'Day', 'S3')})
+
+    def test_ambiguous_name(self):
+        Student.objects.create(first_name='Ann', last_name='Lee', student_id='S4')
+
+        with self.assertRaises(Student.MultipleObjectsReturned):
+            self.roster.process_rows([
+                make_row('NEW', 'Math', 'S3', 'Day', 'Cat'),
+                make_row('NEW', 'Math', '', 'Lee', 'Ann'),
+            ])
+
+        self.assertFalse(Course.objects.filter(name='Math').exists())
+        self.assertFalse(Student.objects.filter(student_id='S3').exists())
+
+    def test_existing_courses(self):
+        course = Course.objects.create(name='Math', grade_level=3, owner=self.owner)
+        course.students.add(self.bob)
+        other = Course.objects.create(name='Science', grade_level=3, owner=self.owner)
+        progress = []
+
+        counts = self.roster.process_rows([
+            make_row(str(course.id), 'Math', 'S1', 'Lee', 'Ann'),
+            make_row('NEW', 'Science', 'S2', 'Ray', 'Bob'),
+            make_row('NEW', 'Art', 'S2', 'Ray', 'Bob', grade_level=4),
+        ], progress=lambda *args: progress.append(args))
+
+        new = Course.objects.get(name='Art', grade_level=4)
+        self.assertEqual(list(counts), [course, other, new])
+        # Students of the course are replaced.
+        self.assertEqual(self.get_students(course), {('Ann', 'Lee', 'S1')})
+        self.assertEqual(self.get_students(other), {('Bob', 'Ray', 'S2')})
+        self.assertEqual(self.get_students(new), {('Bob', 'Ray', 'S2')})
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
+
+    def test_ambiguous_new_course(self):
+        Course.objects.create(name='Math', grade_level=3, owner=self.owner)
+        Course.objects.create(name='Math', grade_level=3, owner=self.owner)
+
+        with self.assertRaises(Course.MultipleObjectsReturned):
+            self.roster.process_rows([make_row('NEW', 'Math', 'S1', 'Lee', 'Ann')])
+
+    def test_preview_uses_newest_course(self):
+        Course.objects.create(name='Math', grade_level=3, owner=self.owner)
+        newest = Course.objects.create(name='Math', grade_level=3, owner=self.owner)
+        dataset = Dataset(headers=ClassRoster.COLUMN_ORDER)
+        dataset.append(('', ' math ', 3, '', 'lee', 'ANN', ''))
+        dataset.append(('', 'Math', 4, 'S2', 'Ray', 'Bob', ''))
+
+        rows = self.roster.preview_rows(dataset).dict
+
+        self.assertEqual([(row['Course ID'], row['Student ID']) for row in rows], [(newest.id, 'S1'), ('NEW', 'S2')])
+
+    def test_preview_requires_student_id_of_new_students(self):
+        dataset = Dataset(headers=ClassRoster.COLUMN_ORDER)
+        dataset.append(('NEW', 'Math', 3, '', 'Day', 'Cat', ''))
+
+        with self.assertRaises(AttributeError):
+            self.roster.preview_rows(dataset)
@@ -0,0 +1,109 @@
+import warnings
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from kidviz.middleware import ReplicaStickinessMiddleware
+from kidviz.models import Course, Job
+from kidviz.routers import ReplicaRouter, replica_view
+from users.models import User
+
+REPLICA = 'replica'
+
+
+def read_view(request):
+    return HttpResponse(Course.objects.all().db)
+
+
+def write_view(request):
+    owner = User.objects.create(email='teacher@example.com')
+    course = Course.objects.create(name='Course', owner=owner)
+
+    return HttpResponse('{} {}'.format(course._state.db, Course.objects.all().db))
+
+
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self):
+        databases = dict(settings.DATABASES, **{REPLICA: dict(connections[DEFAULT_DB_ALIAS].settings_dict)})
+        override = self.settings(
+            DATABASES=databases, DATABASE_ROUTERS=['kidviz.routers.ReplicaRouter'], REPLICA_DATABASE_ALIAS=REPLICA)
+        # Connections are configured from settings once, which Django warns about, so the replica
+        # is added to them for this test below.
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', 'Overriding setting DATABASES')
+            override.enable()
+        self.addCleanup(override.disable)
+
+        connections.databases[REPLICA] = databases[REPLICA]
+        self.addCleanup(self.remove_replica)
+
+        ReplicaRouter.unavailable_until = 0
+        ReplicaRouter.reset()
+        self.factory = RequestFactory()
+
+    def remove_replica(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    def get(self, view, cookies=None):
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies or {})
+
+        return ReplicaStickinessMiddleware(view)(request)
+
+    def test_replica_view_reads_from_replica(self):
+        response = self.get(replica_view(read_view))
+
+        self.assertEqual(response.content.decode(), REPLICA)
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_other_views_read_from_primary(self):
+        self.assertEqual(self.get(read_view).content.decode(), DEFAULT_DB_ALIAS)
+
+    def test_writes_and_reads_after_write_use_primary(self):
+        response = self.get(replica_view(write_view))
+
+        self.assertEqual(response.content.decode(), '{0} {0}'.format(DEFAULT_DB_ALIAS))
+
+    def test_sticky_cookie_pins_next_request_to_primary(self):
+        response = self.get(replica_view(write_view))
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+
+        response = self.get(replica_view(read_view), cookies={settings.REPLICA_STICKY_COOKIE: cookie.value})
+
+        self.assertEqual(response.content.decode(), DEFAULT_DB_ALIAS)
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_unavailable_replica(self):
+        self.addCleanup(setattr, ReplicaRouter, 'unavailable_until', 0)
+
+        with mock.patch.object(connections[REPLICA], 'ensure_connection', side_effect=OperationalError), \
+                self.assertLogs('kidviz.routers', 'WARNING'):
+            self.assertEqual(self.get(replica_view(read_view)).content.decode(), DEFAULT_DB_ALIAS)
+
+        # The replica isn't connected to again until it's retried.
+        self.assertEqual(self.get(replica_view(read_view)).content.decode(), DEFAULT_DB_ALIAS)
+
+    def test_sessions_use_primary(self):
+        with ReplicaRouter.use_replica():
+            self.assertEqual(router.db_for_read(Course), REPLICA)
+            self.assertEqual(router.db_for_read(Session), DEFAULT_DB_ALIAS)
+
+    def test_jobs_use_primary(self):
+        with ReplicaRouter.use_replica():
+            self.assertEqual(router.db_for_write(Job), DEFAULT_DB_ALIAS)
+
+    def test_allow_migrate(self):
+        # The replica and the jobs connection use tables of the primary.
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'kidviz'))
+        self.assertFalse(router.allow_migrate(REPLICA, 'kidviz'))
+        self.assertFalse(router.allow_migrate(settings.JOB_DATABASE_ALIAS, 'kidviz'))
+        self.assertFalse(router.allow_migrate(settings.JOB_DATABASE_ALIAS, 'sessions'))
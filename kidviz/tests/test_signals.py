@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from kidviz.models import ContextTag, Course, Observation, Student
+from users.models import User
+
+
+class DataVersionTest(TransactionTestCase):
+    """
+    Versions are bumped when transactions commit, so these tests commit.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create(email='teacher@example.com')
+        self.course = Course.objects.create(name='Course', owner=self.owner)
+        self.other_course = Course.objects.create(name='Other course', owner=self.owner)
+        self.student = Student.objects.create(first_name='Student', last_name='One')
+        self.course.students.add(self.student)
+        self.tag = ContextTag.objects.create(text='Tag')
+
+    def get_versions(self):
+        return dict(Course.objects.values_list('id', 'data_version'))
+
+    def test_one_bump_per_transaction(self):
+        versions = self.get_versions()
+
+        with transaction.atomic():
+            observation = Observation.objects.create(owner=self.owner, course=self.course)
+            observation.students.add(self.student)
+            observation.tags.add(self.tag)
+            observation.save()
+
+        self.assertEqual(self.get_versions(), {
+            self.course.id: versions[self.course.id] + 1,
+            self.other_course.id: versions[self.other_course.id],
+        })
+
+    def test_rolled_back_transaction(self):
+        versions = self.get_versions()
+
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Observation.objects.create(owner=self.owner, course=self.course)
+                raise ValueError()
+
+        self.assertEqual(self.get_versions(), versions)
+
+    def test_previous_course_of_moved_observation(self):
+        observation = Observation.objects.create(owner=self.owner, course=self.other_course)
+        versions = self.get_versions()
+
+        with transaction.atomic():
+            observation.course = self.course
+            observation.save()
+
+        self.assertEqual(self.get_versions(), {course_id: version + 1 for course_id, version in versions.items()})
+
+    def test_deleted_tag(self):
+        observation = Observation.objects.create(owner=self.owner, course=self.course)
+        observation.tags.add(self.tag)
+        versions = self.get_versions()
+
+        self.tag.delete()
+
+        self.assertEqual(self.get_versions()[self.course.id], versions[self.course.id] + 1)
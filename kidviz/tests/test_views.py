@@ -0,0 +1,48 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from kidviz.models import Course, Observation
+from kidviz.views import ObservationDetailsAjax
+from users.models import User
+
+
+class ObservationDetailsAjaxTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(email='teacher@example.com', is_active=True)
+        cls.colleague = User.objects.create(email='colleague@example.com', is_active=True)
+        course = Course.objects.create(name='Course', owner=cls.colleague)
+        cls.own = Observation.objects.create(owner=cls.teacher, course=course, name='Own')
+        cls.colleagues = Observation.objects.create(owner=cls.colleague, course=course, name='Colleague\'s')
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def get(self, ids, **params):
+        return self.client.get(reverse('observations-details'), {'ids': ids, **params})
+
+    def test_observations_of_other_users(self):
+        # Reports show every user's observations, so their details are available too.
+        response = self.get([self.colleagues.pk, self.own.pk], layout='teacher')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [observation['id'] for observation in response.json()['observations']],
+            [self.colleagues.pk, self.own.pk])
+
+    def test_unknown_ids_are_skipped(self):
+        response = self.get([self.own.pk, self.colleagues.pk + 100])
+
+        self.assertEqual([observation['id'] for observation in response.json()['observations']], [self.own.pk])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.get([]).status_code, 400)
+        self.assertEqual(self.get(['x']).status_code, 400)
+        self.assertEqual(self.get([self.own.pk], layout='unknown').status_code, 400)
+        self.assertEqual(self.get(list(range(1, ObservationDetailsAjax.MAX_IDS + 2))).status_code, 400)
+
+    def test_login_required(self):
+        self.client.logout()
+
+        self.assertEqual(self.get([self.own.pk]).status_code, 302)
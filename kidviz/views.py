@@ -15,8 +15,9 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db.models import Count, Q
-from django.http import HttpResponseRedirect, JsonResponse, HttpResponseBadRequest, HttpResponse
+from django.http import HttpResponseRedirect, JsonResponse, HttpResponseBadRequest, HttpResponse, Http404
 from django.shortcuts import render, get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
 from django.utils.decorators import method_decorator
@@ -27,6 +28,7 @@ from django.views.generic import FormView, View, TemplateView, UpdateView, \
 from related_select.views import RelatedSelectView
 from tablib import Dataset
 
+from kidviz.cache import report_cache
 from kidviz.exceptions import InvalidFileFormatError
 from kidviz.forms import (
     ObservationForm, SetupForm, GroupingForm, ContextTagForm,
@@ -34,10 +36,13 @@ from kidviz.forms import (
     ObservationByIDForm
 )
 from kidviz.models import (
-    ContextTag, Course, StudentGrouping, LearningConstructSublevel,
-    LearningConstruct, Setup, StudentGroup, Student, Observation
+    ContextTag, Course, Job, StudentGrouping, LearningConstructSublevel,
+    LearningConstruct, Setup, StagedImport, StudentGroup, Student, Observation
 )
+from kidviz.reports import StarMatrixReport
 from kidviz.resources import ClassRoster, ACCEPTED_FILE_EXTENSIONS
+from kidviz.routers import replica_view
+from kidviz.taxonomy import Taxonomy
 
 logger = logging.getLogger(__name__)
 
@@ -85,8 +90,10 @@ class SetupView(LoginRequiredMixin, FormView):
 
         if self.request.session.pop('reconfigure', None):
             tags = [tag.id for tag in tags]
-            constructs = [construct.id for construct in get_constructs(pk_list=constructs)]
+            constructs = [construct.id for construct in get_constructs(pk_list=[c.id for c in constructs])]
+            # Drafts already offering the same choices are skipped, so their GIN index entries aren't rewritten.
             draft_observation = Observation.objects.filter(is_draft=True, owner=self.request.user) \
+                .exclude(construct_choices=constructs, tag_choices=tags) \
                 .update(construct_choices=constructs, tag_choices=tags)
         else:
             self.request.session['create_new'] = True
@@ -98,16 +105,7 @@ class SetupView(LoginRequiredMixin, FormView):
         r['form'].fields['grouping'].init_bound_field(r['form'].initial.get('course'))
         r['constructs'] = []
 
-        learning_constructs = []
-
-        for lc in LearningConstruct.objects.prefetch_related('levels', 'levels__sublevels',
-                                                             'levels__sublevels__examples').all():
-            if lc.abbreviation == 'ToML':
-                learning_constructs.insert(0, lc)
-            else:
-                learning_constructs.append(lc)
-
-        for lc in learning_constructs:
+        for lc in Taxonomy.get().constructs:
             construct = {
                 'name': lc.name,
                 'levels': [],
@@ -525,146 +523,30 @@ class GroupingSubmitView(LoginRequiredMixin, JSONResponseMixin, View):
         return self.render_json_response(return_data)
 
 
+@method_decorator(replica_view, name='dispatch')
 class ObservationAdminView(LoginRequiredMixin, TemplateView):
     """
     View the matrix of stars for users
     """
     template_name = 'observations.html'
 
+    CHART_KEYS = ['student_view', 'construct_view', 'construct_heat_map', 'timeline_view']
+
+    # Construct view and construct heat map are both rendered from `dot_matrix`.
+    CHART_BUILDERS = {
+        'student_view': '_student_view_data',
+        'construct_view': '_construct_view_data',
+        'construct_heat_map': '_construct_view_data',
+        'timeline_view': '_timeline_view_data',
+    }
+
     def selected_chart(self):
         get = self.request.GET or {}
-        chart_keys = ['student_view', 'construct_view', 'construct_heat_map', 'timeline_view']
-        for key in chart_keys:
+        for key in self.CHART_KEYS:
             if key in get:
                 return key
 
-        return chart_keys[0]
-
-    def _duplicate_star_matrix_by_class_observations_by_mappings(self, mappings, star_matrix_by_class):
-        """
-        Duplicates observations from one construct sublevel to another according
-        to defined mappings. This is used by some schools where learning one construct
-        is equivalent to learning another, to reflect that in the reports.
-
-        The mappings are defined in LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS
-        settings variable as a JSON representation of a dict, i.e.
-
-        {"ToML 2A": "ToMAº 1A"}
-        """
-        if not mappings:
-            mappings = {}
-
-        saved_observations = {}
-
-        # Copy source observations
-        for construct, classes in star_matrix_by_class.items():
-            for student_class, students in classes.items():
-                for student, sublevels in students.items():
-                    for sublevel, observations in sublevels.items():
-                        if sublevel.name in mappings:
-                            if not (student, mappings[sublevel.name]) in saved_observations:
-                                saved_observations[
-                                    (student, mappings[sublevel.name])
-                                ] = []
-
-                            saved_observations[
-                                (student, mappings[sublevel.name])
-                            ].extend(observations)
-
-        # Extend second lists
-        for construct, classes in star_matrix_by_class.items():
-            for student_class, students in classes.items():
-                for student, sublevels in students.items():
-                    for sublevel, observations in sublevels.items():
-                        if (student, sublevel.name) in saved_observations:
-                            observations.extend(saved_observations[(student, sublevel.name)])
-
-    def _duplicate_dot_matrix_observations_by_mappings(self, mappings, dot_matrix):
-        """
-        Duplicates observations from one construct sublevel to another according
-        to defined mappings. This is used by some schools where learning one construct
-        is equivalent to learning another, to reflect that in the reports.
-
-        The mappings are defined in LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS
-        settings variable as a JSON representation of a dict, i.e.
-
-        {"ToML 2A": "ToMAº 1A"}
-        """
-        if not mappings:
-            mappings = {}
-
-        saved_observations = {}
-
-        # Copy source observations
-        for construct, courses in dot_matrix.items():
-            for course, sublevels in courses.items():
-                for sublevel, observations in sublevels.items():
-                    if sublevel.name in mappings:
-                        if not (course, mappings[sublevel.name]) in saved_observations:
-                            saved_observations[
-                                (course, mappings[sublevel.name])
-                            ] = []
-
-                        saved_observations[
-                            (course, mappings[sublevel.name])
-                        ].extend(observations)
-
-        # Extend second lists
-        for construct, courses in dot_matrix.items():
-            for course, sublevels in courses.items():
-                for sublevel, observations in sublevels.items():
-                    if (course, sublevel.name) in saved_observations:
-                        observations.extend(saved_observations[(course, sublevel.name)])
-
-    def _duplicate_star_chart_4_observations_by_mappings(self, mappings, start_chart_4, star_chart_4_dates):
-        """
-        Duplicates observations from one construct sublevel to another according
-        to defined mappings. This is used by some schools where learning one construct
-        is equivalent to learning another, to reflect that in the reports.
-
-        The mappings are defined in LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS
-        settings variable as a JSON representation of a dict, i.e.
-
-        {"ToML 2A": "ToMAº 1A"}
-        """
-        if not mappings:
-            mappings = {}
-
-        saved_observations = {}
-        saved_observations_dates = {}
-
-        # Copy source observations & dates
-        for construct, courses in start_chart_4.items():
-            for course, sublevels in courses.items():
-                for sublevel, observations in sublevels.items():
-                    if sublevel.name in mappings:
-                        if not (course, mappings[sublevel.name]) in saved_observations:
-                            saved_observations[
-                                (course, mappings[sublevel.name])
-                            ] = []
-
-                            saved_observations_dates[
-                                (course, mappings[sublevel.name])
-                            ] = []
-
-                        saved_observations[
-                            (course, mappings[sublevel.name])
-                        ].extend(observations)
-
-                        saved_observations_dates[
-                            (course, mappings[sublevel.name])
-                        ].extend(star_chart_4_dates[construct.id][course.id][sublevel.id])
-
-        # Extend second lists
-        for construct, courses in start_chart_4.items():
-            for course, sublevels in courses.items():
-                for sublevel, observations in sublevels.items():
-                    if (course, sublevel.name) in saved_observations:
-                        observations.extend(saved_observations[(course, sublevel.name)])
-
-                        star_chart_4_dates[construct.id][course.id][sublevel.id].extend(
-                            saved_observations_dates[(course, sublevel.name)]
-                        )
+        return self.CHART_KEYS[0]
 
     def _extend_filtered_constructs_with_mappings(self, constructs):
         """
@@ -672,7 +554,7 @@ class ObservationAdminView(LoginRequiredMixin, TemplateView):
         mappings copying observation between constructs to make sure both
         ends of the mappings are always filtered together.
         """
-        mappings = json.loads(settings.LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS)
+        mappings = LearningConstructSublevel.get_duplication_mappings()
 
         mapped_abbreviations = {}
 
@@ -685,17 +567,17 @@ class ObservationAdminView(LoginRequiredMixin, TemplateView):
 
             mapped_abbreviations[v].add(k)
 
-        abbreviations_to_add = []
+        abbreviations_to_add = set()
+        taxonomy = Taxonomy.get()
 
-        for abbreviation in LearningConstruct.objects.filter(
-            pk__in=constructs
-        ).values_list('abbreviation', flat=True):
-            if abbreviation in mapped_abbreviations:
-                abbreviations_to_add.extend(list(mapped_abbreviations[abbreviation]))
+        for construct in taxonomy.get_constructs(
+            construct for construct in constructs if construct != LearningConstruct.NO_CONSTRUCT
+        ):
+            abbreviations_to_add.update(mapped_abbreviations.get(construct.abbreviation, []))
 
-        return constructs + [str(a) for a in LearningConstruct.objects.filter(
-            abbreviation__in=abbreviations_to_add
-        ).values_list('pk', flat=True)]
+        return constructs + [
+            str(construct.id) for construct in taxonomy.constructs if construct.abbreviation in abbreviations_to_add
+        ]
 
     def get_context_data(self, **kwargs):
         self.request.session.pop('read_only', None)
@@ -731,15 +613,8 @@ class ObservationAdminView(LoginRequiredMixin, TemplateView):
         (observations, star_chart_4_obs) = Observation.get_observations(
             course_ids, date_from, date_to, tags, learning_constructs)
 
-        all_constructs = LearningConstruct.objects.prefetch_related('levels', 'levels__sublevels').all()
-
-        all_constructs_sorted = []
-
-        for construct in all_constructs:
-                if construct.abbreviation == 'ToML':
-                    all_constructs_sorted.insert(0, construct)
-                else:
-                    all_constructs_sorted.append(construct)
+        taxonomy = Taxonomy.get()
+        all_constructs_sorted = list(taxonomy.constructs)
 
         constructs_wo_no_construct = [
             construct
@@ -748,134 +623,85 @@ class ObservationAdminView(LoginRequiredMixin, TemplateView):
         ]
 
         if learning_constructs and not LearningConstruct.NO_CONSTRUCT in learning_constructs:
-            constructs = []
-
-            for construct in all_constructs.filter(id__in=learning_constructs):
-                if construct.abbreviation == 'ToML':
-                    constructs.insert(0, construct)
-                else:
-                    constructs.append(construct)
-
+            constructs = taxonomy.get_constructs(learning_constructs)
             show_no_construct = False
 
         elif LearningConstruct.NO_CONSTRUCT in learning_constructs:
-            constructs = []
-
-            for construct in all_constructs.filter(id__in=constructs_wo_no_construct):
-                if construct.abbreviation == 'ToML':
-                    constructs.insert(0, construct)
-                else:
-                    constructs.append(construct)
+            constructs = taxonomy.get_constructs(constructs_wo_no_construct)
 
         else:
             constructs = all_constructs_sorted
 
-        all_students = Student.get_students_by_course(course_ids)
-        courses = Course.get_courses(course_ids)
-
-        star_matrix = {}
-        dot_matrix = Observation.initialize_dot_matrix_by_class(all_constructs_sorted, courses)
-        observation_without_construct = {}
-        star_matrix_by_class = Observation.initialize_star_matrix_by_class(constructs, courses)
-
-        if constructs:
-            for construct in constructs:
-                star_matrix[construct] = {}
-
-                for student in all_students:
-                    star_matrix[construct][student] = {}
-                    observation_without_construct[student] = []
-
-                    for level in construct.levels.all():
-                        for sublevel in level.sublevels.all():
-                            star_matrix[construct][student][sublevel] = []
-        else:
-            for student in all_students:
-                observation_without_construct[student] = []
-
-        for observation in observations:
-            students = observation.students.all()
-            sublevels = observation.constructs.all()
-
-            for student in students:
-                if student not in all_students:
-                    continue
-
-                if not sublevels:
-                    observation_without_construct[student].append(observation)
-
-                for sublevel in sublevels:
-                    construct = sublevel.level.construct
-
-                    if construct not in constructs:
-                        continue
-
-                    star_matrix[construct][student][sublevel].append(observation)
-
-                    if observation.course:
-                        dot_matrix[construct][observation.course][sublevel].append(observation)
-
-                        # If star_matrix_by_class does not contains key with student initialize it.
-                        # This can happen when user changed student's course and observation stayed with old one.
-                        try:
-                            star_matrix_by_class[construct][observation.course][student][sublevel].append(observation)
-                        except KeyError:
-                            star_matrix_by_class[construct][observation.course][student] = {}
-
-                            for level in construct.levels.all():
-                                for sub in level.sublevels.all():
-                                    star_matrix_by_class[construct][observation.course][student][sub] = []
-
-                            star_matrix_by_class[construct][observation.course][student][sublevel].append(observation)
-
-
-        min_date = Observation.get_min_date_from_observation(star_chart_4_obs)
-        star_chart_4, star_chart_4_dates = Observation.create_star_chart_4(
-                star_chart_4_obs, all_constructs_sorted, courses, min_date)
-
-        # Manipulate star_matrix_by_class and dot_matrix to conditionally duplicate
-        # some observations for one of the schools needing this feature. To control
-        # which learning construct sublevels are duplicated, set the settings dictionary
-        # LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS.
-        self._duplicate_star_matrix_by_class_observations_by_mappings(
-            json.loads(settings.LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS),
-            star_matrix_by_class
-        )
-        self._duplicate_dot_matrix_observations_by_mappings(
-            json.loads(settings.LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS),
-            dot_matrix
-        )
-        self._duplicate_star_chart_4_observations_by_mappings(
-            json.loads(settings.LEARNING_CONSTRUCT_SUBLEVELS_DUPLICATION_MAPPINGS),
-            star_chart_4,
-            star_chart_4_dates
-        )
+        self.observations = observations
+        self.star_chart_4_obs = star_chart_4_obs
+        self.constructs = constructs
+        self.all_constructs_sorted = all_constructs_sorted
+        self.all_students = Student.get_students_by_course(course_ids)
+        self.courses = Course.get_courses(course_ids)
 
         data = super().get_context_data(**kwargs)
         data.update({
-            'star_matrix': star_matrix,
-            'dot_matrix': dot_matrix,
-            'observation_without_construct': observation_without_construct,
-            'all_observations': observations,
             'selected_constructs': selected_constructs,
             'courses': Course.objects.all(),
             'course_id': course_ids,
             'filtering_form': date_filtering_form,
             'selected_chart': self.selected_chart(),
-            'star_matrix_by_class': star_matrix_by_class,
-            'star_chart_4': star_chart_4,
-            'COLORS_DARK': json.dumps(LearningConstructSublevel.COLORS_DARK),
-            'min_date': min_date,
-            'max_date': Observation.get_max_date_from_observations(star_chart_4_obs),
-            'star_chart_4_dates': json.dumps(star_chart_4_dates),
-            'observations_count': star_chart_4_obs.filter(constructs__isnull=False).count(),
+            'chart_keys': self.CHART_KEYS,
             'show_no_construct': show_no_construct,
             'constructs_reports': True,
             'filtered_constructs': list(map(int, constructs_wo_no_construct))
         })
 
+        # Only the selected chart is computed, other tabs are loaded on demand
+        # by `ObservationChartAjax`. Rendered charts are cached until data of
+        # any of the courses changes.
+        chart = self.selected_chart()
+        cache_key = report_cache.make_key(
+            chart,
+            course_ids,
+            date_from=date_from,
+            date_to=date_to,
+            tags=sorted(tag.id for tag in tags) if tags else [],
+            learning_constructs=sorted(learning_constructs),
+            can_view_nonconsent=self.request.user.has_perm('kidviz.can_view_nonconsent_observations'),
+        )
+        data['chart_html'] = report_cache.get_or_render(cache_key, lambda: self._render_chart(chart, data))
+
         return data
 
+    def _render_chart(self, chart, data):
+        chart_builder = getattr(self, self.CHART_BUILDERS[chart])
+        context = dict(data, **chart_builder())
+
+        return render_to_string('includes/{}.html'.format(chart), context, request=self.request)
+
+    def _student_view_data(self):
+        report = StarMatrixReport(self.observations)
+        return {
+            'star_matrix_by_class': report.star_matrix_by_class(self.constructs, self.courses, self.all_students),
+            'observation_without_construct': report.observation_without_construct(self.all_students),
+        }
+
+    def _construct_view_data(self):
+        report = StarMatrixReport(self.observations)
+        return {
+            'dot_matrix': report.dot_matrix(self.all_constructs_sorted, self.constructs, self.courses, self.all_students),
+        }
+
+    def _timeline_view_data(self):
+        # Observations are fetched once, date bounds and counts are computed from them.
+        observations = list(self.star_chart_4_obs)
+        summary = Observation.summarize(observations)
+        star_chart_4, star_chart_4_dates = Observation.create_star_chart_4(
+            observations, self.all_constructs_sorted, self.courses, summary['min_date'])
+
+        return {
+            **summary,
+            'star_chart_4': star_chart_4,
+            'COLORS_DARK': json.dumps(LearningConstructSublevel.COLORS_DARK),
+            'star_chart_4_dates': json.dumps(star_chart_4_dates),
+        }
+
     def _init_filter_form(self, GET_DATA, courses):
         return DateFilteringForm(GET_DATA, initial={
             'course': GET_DATA.get('course', None),
@@ -887,6 +713,91 @@ class ObservationAdminView(LoginRequiredMixin, TemplateView):
         })
 
 
+class ObservationChartAjax(ObservationAdminView):
+    """
+    Renders a single chart of `ObservationAdminView` so tabs which weren't
+    selected on page load can be fetched when they are opened.
+    """
+
+    def selected_chart(self):
+        chart = self.request.GET.get('chart')
+
+        if chart not in self.CHART_KEYS:
+            raise Http404('Unknown chart.')
+
+        return chart
+
+    def render_to_response(self, context, **response_kwargs):
+        return HttpResponse(context['chart_html'])
+
+
+class ObservationDetailsAjax(LoginRequiredMixin, View):
+    """
+    Returns details of observations with ids from `ids` GET parameter in the
+    order they were requested. Reports open observation modals with these
+    details instead of rendering every observation into the page.
+
+    `layout` selects the modal template, `report` for the star charts and
+    `teacher` for the teachers report.
+
+    Reports show observations of all users to every logged in user, so the
+    details of any observation are available to them too.
+    """
+    # Reports request details of large cells in batches of
+    # `OBSERVATION_DETAILS_BATCH_SIZE` ids, see static/observation_details.js.
+    MAX_IDS = 500
+    TEMPLATES = {
+        'report': 'includes/observation_details.html',
+        'teacher': 'includes/teacher_observation_details.html',
+    }
+
+    def get(self, request, *args, **kwargs):
+        ids = request.GET.getlist('ids')
+        template_name = self.TEMPLATES.get(request.GET.get('layout', 'report'))
+
+        if not template_name or not ids or len(ids) > self.MAX_IDS or not all(pk.isdigit() for pk in ids):
+            return HttpResponseBadRequest()
+
+        observations = Observation.objects \
+            .filter(pk__in=ids) \
+            .select_related('course', 'owner') \
+            .prefetch_related('students', 'constructs', 'tags')
+        observations = {
+            observation.id: observation for observation in Observation.resolve_allowed_students(observations)
+        }
+
+        return JsonResponse({
+            'observations': [
+                self._observation_details(observations[int(pk)], template_name)
+                for pk in dict.fromkeys(ids) if int(pk) in observations
+            ],
+        })
+
+    def _observation_details(self, observation, template_name):
+        return {
+            'id': observation.id,
+            'name': observation.name,
+            'course': str(observation.course) if observation.course else None,
+            'owner': str(observation.owner),
+            'observation_date': observation.observation_date,
+            'created': observation.created,
+            'students': [str(student) for student in observation.students.all()],
+            'allowed_students': [str(student) for student in observation.allowed_students],
+            'constructs': [str(sublevel) for sublevel in observation.constructs.all()],
+            'tags': [tag.text for tag in observation.tags.all()],
+            'notes': observation.notes,
+            'external_video': observation.external_video,
+            'original_image': observation.original_image.url if observation.original_image else None,
+            'image_width': observation.image_width,
+            'annotation_data': observation.annotation_data,
+            'video': observation.video.url if observation.video else None,
+            'video_notes': observation.video_notes.url if observation.video_notes else None,
+            'url': reverse('observation_detail_view', kwargs={'pk': observation.id}),
+            'html': render_to_string(template_name, {'observation': observation}, request=self.request),
+        }
+
+
+@method_decorator(replica_view, name='dispatch')
 class StudentsTimelineView(LoginRequiredMixin, TemplateView):
     template_name = 'students_timeline_view.html'
 
@@ -927,43 +838,52 @@ class StudentsTimelineView(LoginRequiredMixin, TemplateView):
                 students = [Student.objects.get(id=student_id) for student_id in chosen_students
                     if int(student_id) in queryset.values_list('id', flat=True)]
 
-        observations = None
+        data.update({
+            'filter_form': filter_form,
+            'course_filter_form': course_filter_form,
+            'students': students,
+            'course_id': course.id,
+        })
 
         if students:
-            observations = Observation.objects.filter(students__in=students) \
-                .prefetch_related('students') \
-                .prefetch_related('constructs') \
-                .prefetch_related('tags') \
-                .prefetch_related('constructs__level') \
-                .prefetch_related('constructs__level__construct') \
-                .prefetch_related('course')
+            cache_key = report_cache.make_key(
+                'student_timeline', [course.id], students=sorted(student.id for student in students))
+            data['timeline_html'] = report_cache.get_or_render(
+                cache_key, lambda: self._render_timeline(students, data))
+
+        return data
+
+    def _render_timeline(self, students, data):
+        context = dict(data)
+        # Filter with a subquery so observations of several selected students aren't repeated.
+        observations = Observation.objects \
+            .filter(pk__in=Observation.students.through.objects.filter(student__in=students).values('observation_id')) \
+            .prefetch_related('students') \
+            .prefetch_related('constructs') \
+            .prefetch_related('tags') \
+            .prefetch_related('constructs__level') \
+            .prefetch_related('constructs__level__construct') \
+            .prefetch_related('course')
+        observations = list(observations)
 
         if observations:
-            constructs = LearningConstruct.objects.prefetch_related('levels', 'levels__sublevels').all()
-            min_date = Observation.get_min_date_from_observation(observations)
+            constructs = Taxonomy.get().constructs
+            summary = Observation.summarize(observations)
 
             star_chart, dates = Observation.create_student_timeline(
-                observations, students, constructs, min_date)
+                observations, students, constructs, summary['min_date'])
 
-            data.update({
+            context.update({
+                **summary,
                 'star_chart': star_chart,
                 'dates': json.dumps(dates),
-                'min_date': min_date,
-                'max_date': Observation.get_max_date_from_observations(observations),
                 'COLORS_DARK': json.dumps(LearningConstructSublevel.COLORS_DARK),
-                'observations_count': observations.filter(constructs__isnull=False).count(),
             })
 
-        data.update({
-            'filter_form': filter_form,
-            'course_filter_form': course_filter_form,
-            'students': students,
-            'course_id': course.id,
-        })
-
-        return data
+        return render_to_string('includes/student_timeline.html', context, request=self.request)
 
 
+@method_decorator(replica_view, name='dispatch')
 class TeacherObservationView(LoginRequiredMixin, TemplateView):
     """
     New matrix chart sorted by teachers
@@ -978,12 +898,9 @@ class TeacherObservationView(LoginRequiredMixin, TemplateView):
 
         if self.request.GET.get('from', None):
             if self.filtering_form.is_valid():
-                observations = self._filter_observations()
-
                 data.update({
                     **self._base_context_data,
-                    'dot_matrix': self._calculate_dot_matrix(observations),
-                    'all_observations': observations,
+                    'dot_matrix': self._calculate_dot_matrix(self._filter_observations()),
                 })
 
                 return data
@@ -1027,7 +944,6 @@ class TeacherObservationView(LoginRequiredMixin, TemplateView):
             .prefetch_related('students') \
             .prefetch_related('constructs__level__construct') \
             .prefetch_related('tags') \
-            .prefetch_related('grouping__groups__students') \
             .select_related('owner') \
             .order_by('owner', 'constructs') \
             .all()
@@ -1071,7 +987,6 @@ class TeacherObservationView(LoginRequiredMixin, TemplateView):
         return {
             **self._base_context_data,
             'dot_matrix': [],
-            'all_observations': None,
         }
 
 
@@ -1089,14 +1004,24 @@ def current_observation(request):
 
 class ImportClassRoster(LoginRequiredMixin, TemplateView):
     template_name = 'import_class_roster.html'
-    session_variable = 'class_roster_preview_data'
+    # Token of the `StagedImport` with rows of the previewed file.
+    session_variable = 'class_roster_import_token'
 
     def get(self, request, *args, **kwargs):
         # clear any residual data
         if self.session_variable in self.request.session.keys():
-            del (self.request.session[self.session_variable])
+            StagedImport.objects.filter(token=self.request.session.pop(self.session_variable),
+                                        owner=request.user).delete()
         return super().get(request, *args, **kwargs)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Import confirmed in the preview, the page shows its progress.
+        job_id = self.request.GET.get('job', '')
+        if job_id.isdigit():
+            context['job'] = Job.objects.filter(pk=job_id, owner=self.request.user).first()
+        return context
+
     def post(self, request, *args, **kwargs):
 
         file = request.FILES.get('uploadedFile')
@@ -1124,7 +1049,8 @@ class ImportClassRoster(LoginRequiredMixin, TemplateView):
             file_data = Dataset().load(file.read())
             preview_data = ClassRoster(user=request.user).preview_rows(file_data)
             context = {'preview_data': preview_data.html}
-            self.request.session[self.session_variable] = preview_data.json
+            staged_import = StagedImport.stage(owner=request.user, rows=preview_data.dict)
+            self.request.session[self.session_variable] = str(staged_import.token)
             return render(request=request, template_name=self.template_name, context=context)
 
         except Exception as err:
@@ -1140,11 +1066,19 @@ class ImportClassRoster(LoginRequiredMixin, TemplateView):
 @login_required
 def process_class_roster(request):
     try:
-        dataset = Dataset()
-        dataset.dict = json.loads(request.session[ImportClassRoster.session_variable])
-        ClassRoster(user=request.user).process_rows(dataset)
-        messages.success(request, message='File imported successfully', fail_silently=True)
-        return HttpResponseRedirect(reverse('import_class_roster'))
+        token = request.session.get(ImportClassRoster.session_variable)
+        staged_import = StagedImport.active().filter(token=token, owner=request.user).first() if token else None
+
+        if not staged_import:
+            messages.error(request, message='The preview has expired, please upload the file again.',
+                           fail_silently=True)
+            return HttpResponseRedirect(reverse('import_class_roster'))
+
+        # Large rosters take longer than a request may, the job worker imports
+        # the rows and deletes the staged import.
+        job = Job.submit(Job.ROSTER_IMPORT, owner=request.user, token=str(staged_import.token))
+        del request.session[ImportClassRoster.session_variable]
+        return HttpResponseRedirect('{}?job={}'.format(reverse('import_class_roster'), job.pk))
 
     except Exception as err:
         message = 'An error occurred loading the file'
@@ -1154,6 +1088,17 @@ def process_class_roster(request):
 
 
 @login_required
+def job_status(request, pk):
+    """
+    Returns status and progress of a background job of the user, polled by
+    pages waiting for the job to finish.
+    """
+    job = get_object_or_404(Job, pk=pk, owner=request.user)
+    return JsonResponse(job.to_json())
+
+
+@login_required
+@replica_view
 def export_class_roster(request):
     """
     Export course/student roster
@@ -1170,11 +1115,11 @@ def export_class_roster(request):
             raise InvalidFileFormatError('{} is not an acceptable export file format'.format(fmt))
 
         if course_ids:
-            courses = Course.objects.filter(id__in=int(course_ids)).order_by('name')
+            courses = Course.objects.filter(id__in=[int(course_id) for course_id in course_ids]).order_by('name')
         elif class_owners:
             courses = Course.objects.filter(owner_id__in=class_owners).order_by('name')
         else:
-            courses = []
+            courses = Course.objects.none()
 
         return ClassRoster.export(user=request.user, queryset=courses, fmt=fmt)
 
@@ -1191,8 +1136,7 @@ def export_class_roster(request):
 
 
 def get_constructs(pk_list):
-    return LearningConstructSublevel.objects.filter(pk__in=pk_list). \
-        select_related('level', 'level__construct').prefetch_related('examples')
+    return Taxonomy.get().get_sublevels(pk_list)
 
 
 def get_recent_observations(owner, age=None):
@@ -1239,6 +1183,7 @@ class ListTag(BaseTagManagement, ListView):
         return ContextTag.objects.filter(owner=self.request.user).order_by('id')
 
 
+@method_decorator(replica_view, name='dispatch')
 class FloatingStudents(ListView):
     model = Student
     template_name = 'floating_report.html'
@@ -1247,6 +1192,7 @@ class FloatingStudents(ListView):
         return Student.objects.filter(course__isnull=True).order_by('pk')
 
 
+@method_decorator(replica_view, name='dispatch')
 class DoubledStudents(ListView):
     model = Student
     template_name = 'doubled_report.html'
@@ -1256,6 +1202,7 @@ class DoubledStudents(ListView):
             .filter(count__gte=2).prefetch_related('course_set').order_by('pk')
 
 
+@method_decorator(replica_view, name='dispatch')
 class HomonymStudents(ListView):
     model = Student
     template_name = 'homonym_report.html'
@@ -1380,19 +1327,16 @@ class StudentReportAjax(View):
             is_valid, students = self.validate_homonym(student_ids, name, action)
             if is_valid and students:
                 # Select student with the higher grade level
-                selected = students[0]
-                for student in students:
-                    if student.grade_level > selected.grade_level:
-                        selected = student
-
-                for student in students:
-                    if student != selected:
-                        selected.reassign(student)
-                        student.delete()
+                selected = Student.get_merge_target(students)
+                others = [student.pk for student in students if student != selected]
+                # Students with many observations take long to reassign, the
+                # page polls the job until they are merged.
+                job = Job.submit(Job.MERGE_STUDENTS, owner=request.user, groups=[[selected.pk] + others])
 
                 return JsonResponse({
                     'success': True,
-                    'root_student_id': selected.pk
+                    'root_student_id': selected.pk,
+                    'job_status_url': reverse('job_status', args=[job.pk]),
                 })
 
         return HttpResponseBadRequest()
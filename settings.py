@@ -83,6 +83,7 @@ if DEBUG:
     INSTALLED_APPS.append('debug_toolbar')
 
 MIDDLEWARE = [
+    'kidviz.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'kidviz.middleware.S3FileMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -94,11 +95,18 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'tz_detect.middleware.TimezoneMiddleware',
     'middleware.DjangoThreadLocalMiddleware',
+    'kidviz.middleware.ReplicaStickinessMiddleware',
 ]
 
 if DEBUG:
     MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
 
+# Requests slower than this (in milliseconds) log their most repeated SQL statements.
+REQUEST_TIMING_SLOW_THRESHOLD = int(os.getenv('REQUEST_TIMING_SLOW_THRESHOLD', 1000))
+REQUEST_TIMING_TOP_STATEMENTS = int(os.getenv('REQUEST_TIMING_TOP_STATEMENTS', 5))
+# Add SQL, template and Python times to responses as `Server-Timing` header.
+REQUEST_TIMING_HEADER = os.getenv('REQUEST_TIMING_HEADER', 'True') == 'True'
+
 # DATABASES AND CACHING
 
 DATABASES = {}
@@ -108,6 +116,60 @@ DATABASES['default'] = dj_database_url.config(
     default=os.environ.get('DATABASE_URL', 'postgres://localhost:5432/lsoa')
 )
 
+# Read-only report views read from this database when it's configured and
+# available, see `kidviz.routers`.
+REPLICA_DATABASE_ALIAS = os.getenv('REPLICA_DATABASE_ALIAS', 'replica')
+
+if os.getenv('REPLICA_DATABASE_URL'):
+    DATABASES[REPLICA_DATABASE_ALIAS] = dj_database_url.parse(os.getenv('REPLICA_DATABASE_URL'), conn_max_age=600)
+    DATABASES[REPLICA_DATABASE_ALIAS]['TEST'] = {'MIRROR': 'default'}
+
+# Background jobs save their progress through a second connection to the
+# primary, outside of the transaction the job runs in, see `kidviz.models.Job`.
+JOB_DATABASE_ALIAS = 'jobs'
+DATABASES[JOB_DATABASE_ALIAS] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+
+DATABASE_ROUTERS = ['kidviz.routers.ReplicaRouter']
+
+# Connections to PostgreSQL are shared by a bounded pool of every process
+# instead of persistent connections of every thread, which gevent workers would
+# open for each concurrent request. The pool is disabled by default and
+# `gunicorn.conf.py` enables it for gevent workers.
+DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', 0))
+# Seconds a request waits for a free connection before failing.
+DATABASE_POOL_TIMEOUT = int(os.getenv('DATABASE_POOL_TIMEOUT', 30))
+
+if DATABASE_POOL_SIZE:
+    for database in DATABASES.values():
+        if database['ENGINE'] in ('django.db.backends.postgresql', 'django.db.backends.postgresql_psycopg2'):
+            database['ENGINE'] = 'kidviz.postgresql_pool'
+            database['POOL'] = {'SIZE': DATABASE_POOL_SIZE, 'TIMEOUT': DATABASE_POOL_TIMEOUT, 'MAX_AGE': 600}
+            database['CONN_MAX_AGE'] = 0
+# After a user writes to the database their requests read from the primary for
+# this many seconds, which should be longer than the replication lag.
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 30))
+REPLICA_STICKY_COOKIE = 'kidviz_primary'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered report charts. Entries are keyed by course data versions so they
+    # don't need to expire, old versions are evicted when MAX_ENTRIES is reached.
+    'reports': {
+        'BACKEND': os.getenv('REPORT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('REPORT_CACHE_LOCATION', 'reports'),
+        'TIMEOUT': int(os.getenv('REPORT_CACHE_TIMEOUT', 24 * 60 * 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('REPORT_CACHE_MAX_ENTRIES', 300)),
+        },
+    },
+}
+
+REPORT_CACHE_ALIAS = 'reports'
+# Rendered reports larger than this (in characters) are not cached.
+REPORT_CACHE_MAX_SIZE = int(os.getenv('REPORT_CACHE_MAX_SIZE', 2 * 1024 * 1024))
+
 # TEMPLATES AND STATIC FILES
 
 TEMPLATES = [
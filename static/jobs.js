@@ -0,0 +1,30 @@
+/**
+ * Polls status of a background job at `url` until it succeeds or fails.
+ *
+ * `onProgress` is called with the job status after every poll, `onFinish`
+ * once with the status of the finished job.
+ */
+function pollJob(url, onProgress, onFinish, interval) {
+    interval = interval || 1000;
+
+    var poll = function () {
+        $.getJSON(url)
+            .done(function (job) {
+                if (onProgress) {
+                    onProgress(job);
+                }
+
+                if (job.finished) {
+                    onFinish(job);
+                } else {
+                    setTimeout(poll, interval);
+                }
+            })
+            .fail(function () {
+                // Retry less often while the server is not reachable.
+                setTimeout(poll, interval * 5);
+            });
+    };
+
+    poll();
+}
@@ -0,0 +1,33 @@
+// Number of ids in one request for observation details, the view accepts at most 500.
+var OBSERVATION_DETAILS_BATCH_SIZE = 200;
+
+/**
+ * Fetches details of observations with `ids` from `url` in batches, so cells
+ * with many observations don't exceed the limit of the view.
+ *
+ * Returns a promise resolved with details of all observations, or rejected
+ * when any of the batches failed.
+ */
+function fetchObservationDetails(url, ids, layout) {
+    var requests = [];
+
+    for (var start = 0; start < ids.length; start += OBSERVATION_DETAILS_BATCH_SIZE) {
+        requests.push($.ajax({
+            url: url,
+            data: {ids: ids.slice(start, start + OBSERVATION_DETAILS_BATCH_SIZE), layout: layout},
+            traditional: true
+        }));
+    }
+
+    return $.when.apply($, requests).then(function () {
+        // Arguments are `[data, status, xhr]` of every request, or of the only one.
+        var responses = requests.length === 1 ? [arguments] : arguments;
+        var observations = [];
+
+        for (var i = 0; i < responses.length; i++) {
+            observations = observations.concat(responses[i][0].observations);
+        }
+
+        return observations;
+    });
+}
@@ -7,36 +7,23 @@
  * {
  *   constructID: {
  *     classID: {
- *         sublevelID: [Array with timestamps from `observation_date`]
+ *         sublevelID: [day, count, day, count, ...]
  *     }
  *   }
  * }
  *
- * 2. When sliding change value current displayed date.
- *
- * 3. When value in slider change, filter parsed `observation` using current
- *   date from slider comparing two timestamps. In addition calculate new quantity of
- *   filtered observations. With merge ability it's a little tricky. There is need
- *   to re-calculate and update merged data when slider's value change in order to provide
- *   correct merge ability. So right now when construct is merged, updates to `verticalStarChart`
- *   is needed otherwise wrong values are showed in table. Obviously there is a need
- *   to update also `horizontalStarChart4` which holds cells for restoring horizontal
- *   level merge.
- * 
- *   To update both of those object two functions are used `swapVerticalStarChart`
- *   and `swapHorizontalStarChart`.
+ *   Every cell holds daily numbers of observations since the slider's min date,
+ *   only days with observations are listed and `day` is number of days since the
+ *   previous listed day. Cells are decoded once to arrays of days and cumulative
+ *   counts (see `decodeSeries`).
  *
- *   First one iterates through filtered observations by course and calculates
- *   new color and number of observations for cells inside `verticalStarChart` changes their datasets
- *   color, and innerHTML value. New colors are set to `classes` array when
- *   are stored all elements for heat-map. Number of observations are changed
- *   in `quantities` array which stores cells with number of observations.
+ * 2. When sliding change value current displayed date.
  *
- *   Second one also iterates through filtered observations and calculates new color
- *   and number of observations for cells inside `horizontalStarChart4`. Cells are changed
- *   in `cells` property of `horizontalStarChart4` which is an array. `cells` contains
- *   all cells (both heat-map and number of observations cells). Color and number of observations
- *   are changed for every cell inside this array.
+ * 3. When value in slider change, look up number of observations of every cell
+ *   up to the current date from slider (see `countTo`). In addition calculate new quantity of
+ *   filtered observations. Merged rows and levels of star chart v4 have their own
+ *   series (course `0` and `level-ID` sublevel keys) prepared on the server, so
+ *   every cell is updated the same way, whether it's displayed or hidden by merging.
  *
  * 4. Use filtered observations and new quantity of observations to calculate new color for cell.
  * 
@@ -45,13 +32,12 @@
  */
 
 (() => {
-    const observations = JSON.parse(window.observations) || {};
+    const observations = decodeAll(JSON.parse(window.observations) || {});
     const COLORS_DARK = JSON.parse(window.COLORS_DARK);
     const allStarsCount = parseInt(window.allObservations);
 
     var start = new Date();
-    var elements = $('.chart-4').find('.heatmap-elem');
-    window.chartChanged = false;
+    const elements = $('.chart-4').find('.heatmap-elem');
 
     // Describes how much time have to pass between `recalculateAll` call (in milliseconds).
     const time = 100;
@@ -98,73 +84,31 @@
 
     function recalculateAll(ui) {
         var observationsFiltered = {};
-        var courseObservations = {};
-        var horizontalCourse = {};
 
-        var timestamp = new Date(ui.value);
-        timestamp = timestamp.setSeconds(timestamp.getSeconds());
+        const day = dayIndex(ui.value);
 
         // Filter observations.
         for (var construct in observations) {
             observationsFiltered[construct] = {};
-            courseObservations[construct] = {};
-            horizontalCourse[construct] = {};
 
             for (var course in observations[construct]) {
-                // Check if construct was merged or not to change values
-                // per course or all values inside table.
-                if (window.mergedConstructs.includes(construct)) {
-                    if (!observationsFiltered[construct].hasOwnProperty(0)) {
-                        observationsFiltered[construct][0] = {};
-                    }
-
-                    courseObservations[construct][course] = {};
-                    horizontalCourse[construct][course] = {};
-
-                    for (var sublevel in observations[construct][course]) {
-                        const filtered = observations[construct][course][sublevel]
-                            .filter(date => date <= timestamp);
-
-                        if (observationsFiltered[construct][0][sublevel] === undefined) {
-                            observationsFiltered[construct][0][sublevel] = [];
-                            observationsFiltered[construct][0][sublevel] = filtered;
-                        } else {
-                            observationsFiltered[construct][0][sublevel] =
-                                observationsFiltered[construct][0][sublevel]
-                                    .concat(filtered);
-                        }
-
-                        courseObservations[construct][course][sublevel] = filtered;
-                        horizontalCourse[construct][course][sublevel] = filtered;
-
-                        // Add one to change elements in table when it
-                        // should be empty (moved to min date).
-                        filtered.length === 0 ? newValue++ : newValue += filtered.length;
-                    }
-                } else {
-                    observationsFiltered[construct][course] = {};
-                    horizontalCourse[construct][course] = {};
+                observationsFiltered[construct][course] = {};
 
-                    for (var sublevel in observations[construct][course]) {
-                        const filtered = observations[construct][course][sublevel]
-                            .filter(date => date <= timestamp);
+                for (var sublevel in observations[construct][course]) {
+                    const filtered = countTo(observations[construct][course][sublevel], day);
 
-                        observationsFiltered[construct][course][sublevel] = filtered;
-                        horizontalCourse[construct][course][sublevel] = filtered;
+                    observationsFiltered[construct][course][sublevel] = filtered;
 
-                        filtered.length === 0 ? newValue++ : newValue += filtered.length;
-                    }
+                    // Add one to change elements in table when it
+                    // should be empty (moved to min date).
+                    filtered === 0 ? newValue++ : newValue += filtered;
                 }
             }
         }
 
-        // Swap verticalStarChart and horizontalStarChart content if any of construct was merged.
-        swapVerticalStarChart(courseObservations);
-        swapHorizontalStarChart(horizontalCourse);
-
         // Change elements in table when something changed.
         if (newValue !== oldValue) {
-            updateTable(observationsFiltered, joinMergedSublevels(observationsFiltered));
+            updateTable(observationsFiltered);
 
             oldValue = newValue;
         }
@@ -175,30 +119,15 @@
      * using filtered observations.
      *
      * @param {Object} observationsFiltered - Observations filtered by date.
-     * @param {Array} levels - merged Levels horizontally.
      */
-    function updateTable(observationsFiltered, levels) {
-        if (window.chartChanged) {
-            elements = $('.chart-4').find('.heatmap-elem');
-        }
-
+    function updateTable(observationsFiltered) {
         async.each(elements, function(elem, callback) {
+            // Merged levels are keyed as `level-ID`.
             const dataElem = elem.dataset.elem.split('-');
             const construct = dataElem[1];
             const course = dataElem[2];
-
-            var sublevel = dataElem[3];
-            var size = 0;
-
-            if (elem.dataset.sublevel === undefined || elem.dataset.sublevel.includes('level')) {
-                if (sublevel === 'level') {
-                    sublevel = dataElem[4];
-                }
-
-                size = levels[construct][sublevel][course].length;
-            } else {
-                size = observationsFiltered[construct][course][sublevel].length;
-            }
+            const sublevel = dataElem.slice(3).join('-');
+            const size = observationsFiltered[construct][course][sublevel];
 
             if (size !== elem.dataset.stars) {
                 const color = calculateNewColor(size);
@@ -212,8 +141,6 @@
                 }
             }
         })
-
-        window.chartChanged = false;
     }
 
     /**
@@ -257,222 +184,77 @@
     }
 
     /**
-     * Change values for cells in verticalStarChart map.
-     * @param {Object} observations
+     * Returns number of days between the slider's min date and `value`, which
+     * is the day index used in decoded series.
+     * @param {Number} value - Time in seconds.
      */
-    function swapVerticalStarChart(observations) {
-        for (var construct in observations) {
-            if (window.mergedConstructs.includes(construct)) {
-                swapData(observations, construct);
-            }
-        }
+    function dayIndex(value) {
+        const date = new Date(value * 1000);
+        const minDate = new Date($('#date-slider').slider("option", "min") * 1000);
+
+        return Math.round((
+            Date.UTC(date.getFullYear(), date.getMonth(), date.getDate())
+            - Date.UTC(minDate.getFullYear(), minDate.getMonth(), minDate.getDate())
+        ) / (24 * 60 * 60 * 1000));
     }
 
     /**
-     * Swap data in cells stored inside `window.verticalStarChart` object for specific construct.
-     * @param {Object} observations
-     * @param {String} construct
+     * Decodes series of every cell, see `decodeSeries`.
+     * @param {Object} series - Encoded series by construct, class and sublevel.
      */
-    function swapData(observations, construct) {
-        var levels = joinMergedSublevelsDelete(observations);
-
-        Object.keys(observations[construct]).forEach((course, index) => {
-            Object.keys(observations[construct][course]).forEach((sublevel, j) => {
-                if (!Array.isArray(observations[construct][course][sublevel])) {
-                    const level = observations[construct][course][sublevel];
-                    const size = levels[construct][level][course].length;
-                    const color = calculateNewColor(size);
-                    const classes = window.verticalStarChart[construct][index].classes;
-                    const quantities = window.verticalStarChart[construct][index].quantities;
-
-                    let heatElem = classes[[...Array(classes.length).keys()]
-                        .filter(i => $(classes[i]).hasClass(`heat-level-${level}`))[0]];
-                    let quantityElem = quantities[[...Array(quantities.length).keys()]
-                        .filter(i => $(quantities[i]).hasClass(`star-level-${level}`))[0]];
-
-                    heatElem.dataset.color = color;
-                    heatElem.setAttribute('bgcolor', color);
-
-                    quantityElem.dataset.stars = size;
-                    quantityElem.innerHTML = size;
-                } else {
-                    const size = observations[construct][course][sublevel].length;
-                    const color = calculateNewColor(size);
-
-                    let heatElem = window.verticalStarChart[construct][index].classes[j + 1];
-                    let quantityElem = window.verticalStarChart[construct][index].quantities[j + 1];
-
-                    if (heatElem !== undefined) {
-                        heatElem.dataset.color = color;
-                        heatElem.setAttribute('bgcolor', color);
-
-                        quantityElem.dataset.stars = size;
-                        quantityElem.innerHTML = size;
-                    }
+    function decodeAll(series) {
+        for (var construct in series) {
+            for (var course in series[construct]) {
+                for (var sublevel in series[construct][course]) {
+                    series[construct][course][sublevel] = decodeSeries(series[construct][course][sublevel]);
                 }
-            })
-        })
-    }
-
-    function swapHorizontalStarChart(observations) {
-        for (var construct in observations) {
-            swapHorizontalData(construct, observations);
-        }
-    }
-
-    /**
-     * Swap data in cells stored inside `window.horizontalStarChart4` object for specific level.
-     * @param {String} construct
-     * @param {Object} observations
-     */
-    function swapHorizontalData(construct, observations) {
-        for (level in window.mergedSublevels[construct]) {
-            var cells = window.horizontalStarChart4[level].cells
-
-            for (var i = 0; i < cells.length; i++) {
-                var sublevel = window.mergedSublevels[construct][level][i];
-
-                for (var j = 0; j < cells[i].length / 2; j++) {
-                    let heatElem = cells[i][2 * j];
-                    let starElem = cells[i][2 * j + 1];
-                    const course = $(heatElem).attr('class').split('-')[2];
-
-                    const size = observations[construct][course][sublevel].length;
-                    const color = calculateNewColor(size);
-
-                    heatElem.dataset.color = color;
-                    heatElem.setAttribute('bgcolor', color);
-
-                    starElem.dataset.stars = size;
-                    starElem.innerHTML = size;
-                }
-            }
-        }
-    }
-
-    /**
-     * Iterate through all construct in observations and when sublevels were
-     * merge into single level and change observations of sublevel to level id as String.
-     * In addition calculate number of observations for every merged level by course.
-     * This is used to check what sublevels were merged into single level.
-     * For example when sublevels 72 and 73 were merged then their keys
-     * in object which contains filtered observations instead of having timestamp
-     * will have level id.
-     *
-     * Start => 72: [1111111, 1111111], 73: [1111111, 1111111]
-     * End => 72: "18", 73: "18"
-     *
-     * This function returns object which contains quantity of observations
-     * for merged levels.
-     *
-     * @param {Object} observationsFiltered 
-     */
-    function joinMergedSublevels(observationsFiltered) {
-        var levels = {};
-
-        for (var construct in observationsFiltered) {
-            var wasMergedHorizontally = window.mergedSublevels[construct] !== undefined
-                && Object.keys(window.mergedSublevels[construct]).length !== 0;
-
-            if (wasMergedHorizontally) {
-                levels[construct] = joinSublevels(construct, observationsFiltered);
             }
         }
 
-        return levels;
+        return series;
     }
 
     /**
-     * Iterate through all construct in observations and when sublevels were
-     * merge into single level and change observations of sublevel to level id as String.
-     * In addition calculate number of observations for every merged level by course.
-     * In the end remove those sublevel's keys which id of level is repeated.
-     * This let me then iterate throught every cells without repeating those sublevels
-     * which were merged.
-     *
-     * Start => 72: [1111111, 1111111], 73: [1111111, 1111111]
-     * End => 72: "18"
-     *
-     * This is used when swapping data in `verticalStarChart`.
-     *
-     * This function returns object which contains quantity of observations
-     * for merged levels.
-     * @param {Object} observationsFiltered 
+     * Decodes `[day, count, day, count, ...]` series where `day` is number of days since
+     * previous listed day to arrays of absolute days and cumulative counts.
+     * @param {Array} series
      */
-    function joinMergedSublevelsDelete(observationsFiltered) {
-        var levels = {};
-
-        for (var construct in observationsFiltered) {
-            var wasMergedHorizontally = window.mergedSublevels[construct] !== undefined
-                && Object.keys(window.mergedSublevels[construct]).length !== 0;
-
-            if (wasMergedHorizontally) {
-                levels[construct] = joinSublevelsDelete(construct, observationsFiltered);
-            }
+    function decodeSeries(series) {
+        const days = new Int32Array(series.length / 2);
+        const counts = new Int32Array(series.length / 2);
+        var day = 0;
+        var count = 0;
+
+        for (var i = 0; i < days.length; i++) {
+            day += series[2 * i];
+            count += series[2 * i + 1];
+            days[i] = day;
+            counts[i] = count;
         }
 
-        return levels;
+        return {days: days, counts: counts};
     }
 
     /**
-     * Calculates number of observations for merged levels and swap value for sublevels in
-     * filtered observations.
-     * @param {String} construct
-     * @param {Object} observationsFiltered
+     * Returns number of observations of decoded `cell` up to and including `day`
+     * using binary search over days with observations.
+     * @param {Object} cell
+     * @param {Number} day
      */
-    function joinSublevels(construct, observationsFiltered) {
-        var levels = {};
+    function countTo(cell, day) {
+        var low = 0;
+        var high = cell.days.length;
 
-        for (var level in window.mergedSublevels[construct]) {
-            levels[level] = {};
-            var mLevel = window.mergedSublevels[construct][level];
+        while (low < high) {
+            const middle = (low + high) >> 1;
 
-            for (course in observationsFiltered[construct]) {
-                var amount = [];
-
-                for (var i = 0; i < mLevel.length; i++) {
-                    amount = amount.concat(observationsFiltered[construct][course][mLevel[i]]);
-                    observationsFiltered[construct][course][mLevel[i]] = level;
-                }
-
-                levels[level][course] = amount;
-            }
-        }
-
-        return levels;
-    }
-
-    /**
-     * Calculates number of observations for merged levels and swap value for sublevels in
-     * filtered observations.
-     * Delete sublevels keys when level was used more than one time.
-     * @param {String} construct
-     * @param {Object} observationsFiltered
-     */
-    function joinSublevelsDelete(construct, observationsFiltered) {
-        var levels = {};
-
-        for (var level in window.mergedSublevels[construct]) {
-            levels[level] = {};
-            var mLevel = window.mergedSublevels[construct][level];
-
-            for (course in observationsFiltered[construct]) {
-                var amount = [];
-
-                for (var i = 0; i < mLevel.length; i++) {
-                    amount = amount.concat(observationsFiltered[construct][course][mLevel[i]]);
-
-                    if (i === 0) {
-                        observationsFiltered[construct][course][mLevel[i]] = level;
-                    } else {
-                        delete observationsFiltered[construct][course][mLevel[i]];
-                    }
-                }
-
-                levels[level][course] = amount;
+            if (cell.days[middle] <= day) {
+                low = middle + 1;
+            } else {
+                high = middle;
             }
         }
 
-        return levels;
+        return low === 0 ? 0 : cell.counts[low - 1];
     }
 })()
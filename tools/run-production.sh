@@ -3,7 +3,7 @@
 set -e
 
 NAME="kidviz"
-NUM_WORKERS=5
+NUM_WORKERS=${GUNICORN_WORKERS:-5}
 
 #/tools/wait-for db:5432 -- echo Database ready
 
@@ -16,7 +16,9 @@ export PYTHONPATH=$DJANGODIR:$PYTHONPATH
 pipenv run ./manage.py collectstatic
 pipenv run ./manage.py migrate
 
+# Gevent workers by default, see gunicorn.conf.py.
 exec pipenv run gunicorn ${DJANGO_WSGI_MODULE}:application \
+    --config gunicorn.conf.py \
     --name $NAME \
     --workers $NUM_WORKERS \
     --bind=0.0.0.0:80 \
@@ -24,6 +24,8 @@ urlpatterns = [
     # past observations view shows the "star charts"
     url(r'^observations/$', kidviz.views.ObservationAdminView.as_view(), name='observations_all'),
     url(r'^observations-ajax/$', kidviz.views.ObservationAjax.as_view(), name='observations-ajax'),
+    url(r'^observations-chart/$', kidviz.views.ObservationChartAjax.as_view(), name='observations-chart'),
+    url(r'^observations-details/$', kidviz.views.ObservationDetailsAjax.as_view(), name='observations-details'),
     url(r'^observations-teachers/$', kidviz.views.TeacherObservationView.as_view(), name='observations_teachers'),
     url(r'^observations-teachers/(?P<course_id>\d+)/$', kidviz.views.TeacherObservationView.as_view(),
         name='observations_teachers_specific'),
@@ -58,6 +60,7 @@ urlpatterns = [
     path('class-roster/import/', kidviz.views.ImportClassRoster.as_view(), name='import_class_roster'),
     path('class-roster/process-import/', kidviz.views.process_class_roster, name='process_import_class_roster'),
     path('class-roster/export/', kidviz.views.export_class_roster, name='export_class_roster'),
+    path('jobs/<int:pk>/', kidviz.views.job_status, name='job_status'),
 
     # reports
     path('report/floating', kidviz.views.FloatingStudents.as_view(), name='floating_students'),